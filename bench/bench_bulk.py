@@ -0,0 +1,51 @@
+# bench/bench_bulk.py
+# Streaming import of unnamed CSV files into one LocationStore: rows/s and a check that a second
+# file without names (and repeated names inside a file) only adds points. Импорт не должен
+# перезаписывать сохранённые точки по имени. Запуск: python bench/bench_bulk.py [--sizes 1000,10000]
+
+import argparse, random, tempfile, time
+from pathlib import Path
+
+from common import ms, sizes, emit
+from geochange_bulk import import_file
+from geochange_store import LocationStore
+
+def _write_csv(path: Path, n, seed, name=None):
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("name,lat,lon\n" if name else "lat,lon\n")
+        for _ in range(n):
+            row = f"{rnd.uniform(-60, 70)!r},{rnd.uniform(-180, 180)!r}\n"
+            f.write(f"{name},{row}" if name else row)
+
+def bench_bulk(tmp: Path, n):
+    # три файла по n точек: a и b без имён, c — все с именем «Stop»; без дедупликации
+    for stem, seed, name in (("a", 1, None), ("b", 2, None), ("c", 3, "Stop")):
+        _write_csv(tmp / f"{stem}.csv", n, seed, name)
+    st = LocationStore(tmp / f"bulk{n}.db")
+    try:
+        t0 = time.perf_counter()
+        res = [import_file(st, tmp / f"{stem}.csv", dedupe_m=0) for stem in "abc"]
+        took = ms(t0); total = len(st)
+    finally:
+        st.close()
+    if total != 3 * n or sum(r["added"] for r in res) != 3 * n:
+        raise AssertionError(f"imported 3 x {n} points, store holds {total}: {[r['added'] for r in res]}")
+    return {"bulk_ms": took, "rows_per_s": round(3 * n / max(took, 1e-3) * 1000.0),
+            "renamed": sum(r["renamed"] for r in res)}
+
+def run(ns):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in ns:
+            rows.append(emit({"bench": "bulk", "case": f"n={n}", "n": n, **bench_bulk(Path(tmp), n)}))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    a = ap.parse_args(argv)
+    run(sizes(a.sizes))
+
+if __name__ == "__main__":
+    main()
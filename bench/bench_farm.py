@@ -0,0 +1,49 @@
+# bench/bench_farm.py
+# EmulatorFarm start/stop against fake emulator processes (fakes.py emulator): time to a live
+# console and to a clean exit. Остановка обязана пройти через `kill` консоли — terminate()
+# на этом пути считается ошибкой. Запуск: python bench/bench_farm.py [--instances 4]
+
+import argparse, subprocess, tempfile, time
+
+from common import ms, emit
+from fakes import fake_emulator
+from geochange_farm import EmulatorFarm, PortAllocator
+
+def bench_farm(n, first_port=15554, pairs=64):
+    # широкий диапазон: порты прошлого прогона ещё в TIME_WAIT, аллокатор их пропускает
+    terminated = []
+    orig = subprocess.Popen.terminate
+    def terminate(proc):
+        terminated.append(proc.pid); orig(proc)
+    subprocess.Popen.terminate = terminate
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            ports = PortAllocator(first_port, first_port + 2 * max(n, pairs) - 1)
+            farm = EmulatorFarm(fake_emulator(tmp), tmp, ports=ports, parallel=n)
+            names = [f"fake_{i + 1}" for i in range(n)]
+            t0 = time.perf_counter()
+            ok = sum(f.result(30) for f in farm.start(names, boot_timeout=20).values())
+            start = ms(t0)
+            t0 = time.perf_counter(); farm.stop_all(timeout=10); stop = ms(t0)
+            farm.shutdown()
+            states = [i["state"] for i in farm.instances()]
+    finally:
+        subprocess.Popen.terminate = orig
+    if ok != n:
+        raise AssertionError(f"only {ok} of {n} fake emulators started")
+    if terminated:
+        raise AssertionError(f"farm.stop terminated {len(terminated)} process(es) instead of a console kill")
+    return {"started": ok, "stopped": states.count("stopped"), "start_ms": start, "stop_ms": stop,
+            "terminated": len(terminated)}
+
+def run(n=4):
+    return [emit({"bench": "farm", "case": f"instances={n}", "instances": n, **bench_farm(n)})]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--instances", type=int, default=4)
+    a = ap.parse_args(argv)
+    run(a.instances)
+
+if __name__ == "__main__":
+    main()
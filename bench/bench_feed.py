@@ -0,0 +1,44 @@
+# bench/bench_feed.py
+# Bridge.itemsUpdated/itemsDelta payloads: ChangeFeed snapshot build + json.dumps
+# (как в Bridge.requestItems) и дельты одиночных правок. Запуск: python bench/bench_feed.py
+
+import argparse, json, tempfile, time
+from pathlib import Path
+
+from common import synth_rows, ms, pcts, sizes, emit
+from geochange_store import LocationStore, ChangeFeed
+
+def bench_feed(path: Path, n, edits):
+    st = LocationStore(path); st.put_many(synth_rows(n))
+    feed = ChangeFeed(st)
+    out = []
+    feed.subscribe(lambda msg: out.append(json.dumps(msg, ensure_ascii=False)))
+    t0 = time.perf_counter(); snap = feed.snapshot(); build = ms(t0)
+    t0 = time.perf_counter(); js = json.dumps(snap, ensure_ascii=False); dump = ms(t0)
+    # правка одной точки: от put до готовой строки для itemsDelta
+    lat = []
+    for k in range(edits):
+        t0 = time.perf_counter()
+        st.put(f"edit-{k}", 1.0, 2.0)
+        lat.append((time.perf_counter() - t0) * 1000.0)
+    st.close()
+    return dict(snapshot_build_ms=build, snapshot_json_ms=dump, snapshot_total_ms=round(build + dump, 3),
+                snapshot_bytes=len(js.encode("utf-8")), deltas=len(out), **pcts(lat, "delta_"))
+
+def run(ns, edits=200):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in ns:
+            rows.append(emit({"bench": "feed", "case": f"n={n}", "n": n,
+                              **bench_feed(Path(tmp) / f"f{n}.db", n, edits)}))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--edits", type=int, default=200)
+    a = ap.parse_args(argv)
+    run(sizes(a.sizes), a.edits)
+
+if __name__ == "__main__":
+    main()
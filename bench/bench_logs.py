@@ -0,0 +1,72 @@
+# bench/bench_logs.py
+# Log ingestion: sdkmanager-like output (lines + \r progress bars) through pump/LineDecoder
+# into LogBuffer, drained in batches as the GUI timer does. Запуск: python bench/bench_logs.py
+
+import argparse, io, threading, time
+
+from common import ms, sizes, emit
+from geochange_logs import LogBuffer, pump
+
+def synth_output(lines, progress_every=10):
+    # каждые progress_every строк — полоса прогресса из 100 кадров через \r
+    out = []
+    for i in range(lines):
+        out.append(f"Info: unpacking file {i:07d} of package system-images;android-34\n")
+        if i % progress_every == 0:
+            out.extend(f"\r[{'=' * (p // 3):<34}] {p}% Unzipping..." for p in range(0, 101))
+            out.append("\n")
+    return "".join(out).encode("utf-8")
+
+def bench_pump(data, chunk):
+    buf = LogBuffer(maxlen=5000)
+    t0 = time.perf_counter()
+    pump(io.BytesIO(data), buf.write, chunk=chunk)
+    wall = ms(t0)
+    items, dropped = buf.drain()
+    return wall, len(items) + dropped
+
+def bench_concurrent(lines, writers, flush_hz=10):
+    # несколько потоков пишут, «GUI» забирает пачки по таймеру
+    buf = LogBuffer(maxlen=5000); stop = threading.Event()
+    batches, drained = [], [0]
+    def drainer():
+        while not stop.wait(1.0 / flush_hz):
+            t = time.perf_counter(); items, dropped = buf.drain()
+            batches.append(ms(t)); drained[0] += len(items) + dropped
+    d = threading.Thread(target=drainer, daemon=True); d.start()
+    def writer(w):
+        for i in range(lines // writers):
+            buf.write(f"[{w}] line {i}")
+    t0 = time.perf_counter()
+    ts = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    wall = ms(t0)
+    stop.set(); d.join()
+    t = time.perf_counter(); items, dropped = buf.drain()
+    batches.append(ms(t)); drained[0] += len(items) + dropped
+    return {"writers": writers, "wall_ms": wall, "lines_per_s": round(lines / (wall / 1000.0), 1),
+            "drains": len(batches), "max_drain_ms": max(batches, default=0.0), "delivered": drained[0]}
+
+def run(ns, chunk=4096, writers=4):
+    rows = []
+    for n in ns:
+        data = synth_output(n)
+        wall, kept = bench_pump(data, chunk)
+        rows.append(emit({"bench": "logs.pump", "case": f"n={n}", "n": n, "bytes": len(data),
+                          "wall_ms": wall, "lines_per_s": round(n / (wall / 1000.0), 1),
+                          "mb_per_s": round(len(data) / 1048576 / (wall / 1000.0), 2), "kept": kept}))
+        rows.append(emit({"bench": "logs.concurrent", "case": f"n={n},writers={writers}", "n": n,
+                          **bench_concurrent(n, writers)}))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000", help="output lines")
+    ap.add_argument("--chunk", type=int, default=4096)
+    ap.add_argument("--writers", type=int, default=4)
+    a = ap.parse_args(argv)
+    run(sizes(a.sizes), a.chunk, a.writers)
+
+if __name__ == "__main__":
+    main()
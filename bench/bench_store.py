@@ -0,0 +1,61 @@
+# bench/bench_store.py
+# Micro-benchmark: legacy JSON load/save vs LocationStore for growing datasets.
+# Запуск: python bench/bench_store.py [--sizes 1000,10000,100000]
+
+import argparse, json, tempfile, time
+from pathlib import Path
+
+from common import synth, synth_rows, ms, sizes, emit
+from geochange_store import LocationStore
+
+def bench_legacy(path: Path, items, ops):
+    # прежняя схема: чтение/разбор всего файла + полная перезапись на каждую операцию
+    path.write_text(json.dumps(items, indent=2), encoding="utf-8")
+    t0 = time.perf_counter()
+    for k in range(ops):
+        cur = json.loads(path.read_text(encoding="utf-8"))
+        cur = [i for i in cur if i.get("name") != f"new-{k}"]
+        cur.append({"name": f"new-{k}", "lat": 1.0, "lon": 2.0})
+        path.write_text(json.dumps(cur, indent=2), encoding="utf-8")
+    return round(ms(t0) / ops, 4)
+
+def bench_store(path: Path, n, ops):
+    st = LocationStore(path)
+    t0 = time.perf_counter()
+    st.put_many(synth_rows(n))
+    bulk = ms(t0); st.close()
+    t0 = time.perf_counter(); st = LocationStore(path); load = ms(t0)
+    t0 = time.perf_counter()
+    for k in range(ops):
+        st.put(f"new-{k}", 1.0, 2.0)
+    save = ms(t0) / ops
+    t0 = time.perf_counter()
+    for k in range(ops):
+        st.delete(f"new-{k}")
+    delete = ms(t0) / ops
+    st.close()
+    return {"bulk_ms": bulk, "open_ms": load, "save_ms": round(save, 4), "delete_ms": round(delete, 4)}
+
+def run(ns, ops=50, legacy_max=100000):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in ns:
+            row = {"bench": "store", "case": f"n={n}", "n": n}
+            row.update(bench_store(Path(tmp) / f"s{n}.db", n, ops))
+            if n <= legacy_max:
+                row["legacy_save_ms"] = bench_legacy(Path(tmp) / f"l{n}.json", synth(n),
+                                                     max(1, min(ops, 200000 // n)))
+            rows.append(emit(row))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--ops", type=int, default=50)
+    ap.add_argument("--legacy-max", type=int, default=100000,
+                    help="skip the JSON baseline above this size")
+    a = ap.parse_args(argv)
+    run(sizes(a.sizes), a.ops, a.legacy_max)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# bench/bench_teleport.py
+# Teleport latency/throughput through geochange_core.Core against fake consoles and a fake
+# adb server: sequential fixes, unthrottled bursts (latest-wins coalescing), fan-out to N
+# devices, and track-devices propagation. Запуск: python bench/bench_teleport.py [--latency-ms 2]
+
+import argparse, tempfile, time
+from pathlib import Path
+
+from common import ms, pcts, emit
+from fakes import FakeConsole, FakeAdbServer
+from geochange_core import Core
+from geochange_devices import DeviceTracker
+
+def _core(tmp, adb):
+    core = Core(sdk_root=Path(tmp) / "sdk", store_path=Path(tmp) / "bench.db", legacy_json=None,
+                tracker=DeviceTracker(port=adb.port, reconnect=0.1))
+    core.start(); core.devices(wait=2.0)
+    return core
+
+def bench_sequential(core, serial, n):
+    # по одной точке с ожиданием ответа: задержка одного телепорта
+    lat, ok, t0 = [], 0, time.perf_counter()
+    for i in range(n):
+        r = core.teleport(serial, 50.0 + i * 1e-5, 30.0, wait=True)
+        lat.append(r["latency_ms"]); ok += r["ok"]
+    wall = ms(t0)
+    return dict(ok=ok, total=n, fixes_per_s=round(n / (wall / 1000.0), 1), **pcts(lat))
+
+def bench_burst(core, serial, n):
+    # n точек без ожидания (как перетаскивание маркера): устаревшие схлопываются
+    t0 = time.perf_counter()
+    futs = [core.teleports.submit(serial, 50.0 + i * 1e-5, 30.0) for i in range(n)]
+    res = [f.result(30) for f in futs]
+    wall = ms(t0)
+    sent = [r for r in res if not r["superseded"]]
+    return {"submitted": n, "sent": len(sent), "superseded": n - len(sent),
+            "ok": sum(r["ok"] for r in sent), "wall_ms": wall,
+            "submits_per_s": round(n / (wall / 1000.0), 1),
+            "last_ms": res[-1]["latency_ms"]}
+
+def bench_fanout(core, serials, rounds):
+    walls, ok = [], 0
+    for i in range(rounds):
+        r = core.teleport_all(50.0 + i * 1e-5, 30.0, 10.0, serials=serials, timeout=10.0)
+        walls.append(r["wall_ms"]); ok += r["ok"]
+    return dict(devices=len(serials), rounds=rounds, ok=ok, total=rounds * len(serials), **pcts(walls, "wall_"))
+
+def bench_tracker(adb, tracker, n):
+    # от изменения на adb-сервере до срабатывания Future в трекере
+    lat = []
+    for i in range(n):
+        serial = f"emulator-{60000 + 2 * (i % 500)}"
+        t0 = time.perf_counter()
+        fut = tracker.future(serial, "device")
+        adb.set_device(serial, "device")
+        fut.result(5); lat.append((time.perf_counter() - t0) * 1000.0)
+        adb.set_device(serial, None)
+        tracker.wait_for(serial, None, 5)
+    return dict(changes=n, **pcts(lat))
+
+def run(n=500, devices=4, latency_ms=1.0, jitter_ms=0.0, fail_rate=0.0, drop_rate=0.0):
+    cfg = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "fail_rate": fail_rate, "drop_rate": drop_rate}
+    case = ",".join(f"{k}={v:g}" for k, v in cfg.items())
+    rows = []
+    consoles = [FakeConsole(latency_ms, jitter_ms, fail_rate, drop_rate, seed=i + 1).start()
+                for i in range(devices)]
+    adb = FakeAdbServer().start()
+    for c in consoles:
+        adb.set_device(c.serial)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            core = _core(tmp, adb)
+            try:
+                serial = consoles[0].serial
+                rows.append(emit({"bench": "teleport.sequential", "case": case, "n": n, **cfg,
+                                  **bench_sequential(core, serial, n)}))
+                rows.append(emit({"bench": "teleport.burst", "case": case, "n": n * 10, **cfg,
+                                  **bench_burst(core, serial, n * 10)}))
+                rows.append(emit({"bench": "teleport.fanout", "case": f"{case},devices={devices}", **cfg,
+                                  **bench_fanout(core, [c.serial for c in consoles], max(1, n // 10))}))
+                rows.append(emit({"bench": "tracker.propagation", "case": "n=200",
+                                  **bench_tracker(adb, core.tracker, 200)}))
+            finally:
+                core.close()
+    finally:
+        adb.close()
+        for c in consoles:
+            c.close()
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=500, help="sequential fixes (burst = 10x)")
+    ap.add_argument("--devices", type=int, default=4)
+    ap.add_argument("--latency-ms", type=float, default=1.0, help="fake console reply delay")
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of KO replies")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="share of dropped connections")
+    a = ap.parse_args(argv)
+    run(a.n, a.devices, a.latency_ms, a.jitter_ms, a.fail_rate, a.drop_rate)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# bench/common.py
+# Shared helpers: synthetic saved-location datasets, timing and percentiles, JSON rows.
+# Данные детерминированы (seed), чтобы прогоны можно было сравнивать между собой.
+
+import json, random, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+def synth(n, seed=1):
+    rnd = random.Random(seed)
+    return [{"name": f"loc-{i:07d}", "lat": rnd.uniform(-60, 70), "lon": rnd.uniform(-180, 180)}
+            for i in range(n)]
+
+def synth_rows(n, seed=1):
+    # те же точки кортежами (name, lat, lon) для put_many — без промежуточных dict на 1M
+    rnd = random.Random(seed)
+    for i in range(n):
+        yield f"loc-{i:07d}", rnd.uniform(-60, 70), rnd.uniform(-180, 180)
+
+def ms(t0):
+    return round((time.perf_counter() - t0) * 1000.0, 3)
+
+def pcts(vals, prefix=""):
+    # p50/p95/p99/max по списку миллисекунд
+    v = sorted(vals)
+    if not v:
+        return {}
+    at = lambda q: round(v[min(len(v) - 1, int(round(q * (len(v) - 1))))], 3)
+    return {f"{prefix}p50_ms": at(0.5), f"{prefix}p95_ms": at(0.95), f"{prefix}p99_ms": at(0.99),
+            f"{prefix}max_ms": round(v[-1], 3)}
+
+def sizes(text):
+    return [int(x) for x in text.split(",") if x]
+
+def emit(row):
+    print(json.dumps(row), flush=True)
+    return row
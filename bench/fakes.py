@@ -0,0 +1,205 @@
+# bench/fakes.py
+# Local stand-ins for the adb server (host:* services incl. track-devices) and the emulator
+# console (geo fix/nmea, kill, avd snapshot) with configurable latency and failures.
+# Порты — эфемерные на 127.0.0.1; serial консоли = "emulator-<порт>", как у настоящего эмулятора.
+# `python fakes.py emulator -avd N -ports C,A` — процесс-«эмулятор» для EmulatorFarm (консоль на C).
+
+import os, random, socket, socketserver, sys, threading, time
+from pathlib import Path
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class _Fake:
+    # общее: latency_ms (+jitter_ms), fail_rate — ответ с ошибкой, drop_rate — обрыв соединения
+    def __init__(self, handler, latency_ms=0.0, jitter_ms=0.0, fail_rate=0.0, drop_rate=0.0, seed=1, port=0):
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.fail_rate, self.drop_rate = fail_rate, drop_rate
+        self.commands = 0; self.failed = 0; self.dropped = 0
+        self._rnd = random.Random(seed)
+        self._rlock = threading.Lock()
+        self._srv = _Server(("127.0.0.1", port), handler)
+        self._srv.fake = self
+        self.port = self._srv.server_address[1]
+        self._thread = threading.Thread(target=self._srv.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name=f"{type(self).__name__}-{self.port}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._srv.shutdown(); self._srv.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _outcome(self):
+        # -> "ok" | "fail" | "drop"; задержка — до ответа, как у медленного устройства
+        with self._rlock:
+            self.commands += 1
+            r = self._rnd.random()
+            delay = self.latency_ms + (self._rnd.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+            out = "drop" if r < self.drop_rate else "fail" if r < self.drop_rate + self.fail_rate else "ok"
+            if out == "drop": self.dropped += 1
+            elif out == "fail": self.failed += 1
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return out
+
+# ---------- emulator console ----------
+class _ConsoleHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        fake = self.server.fake
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if fake.token:
+            self.wfile.write(b"Android Console: Authentication required\r\n"
+                             b"Android Console: type 'auth <auth_token>' to authenticate\r\nOK\r\n")
+        else:
+            self.wfile.write(b"Android Console: type 'help' for a list of commands\r\nOK\r\n")
+        authed = not fake.token
+        for raw in self.rfile:
+            cmd = raw.decode("utf-8", "replace").strip()
+            if not cmd:
+                continue
+            if cmd.startswith("auth "):
+                ok = cmd[5:].strip() == fake.token; authed = authed or ok
+                self.wfile.write(b"OK\r\n" if ok else b"KO: authentication token does not match\r\n"); continue
+            if not authed:
+                self.wfile.write(b"KO: unknown command, try 'help'\r\n"); continue
+            out = fake._outcome()
+            if out == "drop":
+                return
+            if out == "fail":
+                self.wfile.write(b"KO: simulated failure\r\n"); continue
+            fake.handle(cmd)
+            if cmd == "kill":
+                # как настоящий эмулятор: "OK: …", затем консоль закрывается
+                self.wfile.write(b"OK: killing emulator, bye bye\r\n"); self.wfile.flush()
+                fake.bye.set()
+                return
+            self.wfile.write(b"OK\r\n")
+
+class FakeConsole(_Fake):
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, fail_rate=0.0, drop_rate=0.0, token="", seed=1, port=0):
+        self.token = token
+        self.fixes = 0; self.last = None; self.killed = False
+        self.bye = threading.Event()            # ответ на kill отправлен
+        super().__init__(_ConsoleHandler, latency_ms, jitter_ms, fail_rate, drop_rate, seed, port)
+
+    @property
+    def serial(self) -> str:
+        return f"emulator-{self.port}"
+
+    def handle(self, cmd: str):
+        if cmd.startswith("geo fix ") or cmd.startswith("geo nmea "):
+            self.fixes += 1; self.last = cmd
+        elif cmd == "kill":
+            self.killed = True
+
+# ---------- adb server ----------
+def _msg(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return b"%04x" % len(data) + data
+
+class _AdbHandler(socketserver.BaseRequestHandler):
+    def _read(self, n):
+        buf = b""
+        while len(buf) < n:
+            chunk = self.request.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError
+            buf += chunk
+        return buf
+
+    def handle(self):
+        fake = self.server.fake
+        try:
+            service = self._read(int(self._read(4), 16)).decode("utf-8")
+        except (ConnectionError, ValueError):
+            return
+        out = fake._outcome()
+        if out == "drop":
+            return
+        if out == "fail":
+            self.request.sendall(b"FAIL" + _msg("simulated failure")); return
+        if service == "host:version":
+            self.request.sendall(b"OKAY" + _msg("0029"))
+        elif service in ("host:devices", "host:devices-l"):
+            self.request.sendall(b"OKAY" + _msg(fake.payload()))
+        elif service == "host:track-devices":
+            self.request.sendall(b"OKAY")
+            fake.track(self.request)
+        else:
+            self.request.sendall(b"FAIL" + _msg(f"unknown host service '{service}'"))
+
+class FakeAdbServer(_Fake):
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, fail_rate=0.0, drop_rate=0.0, seed=1):
+        self.devices = {}                                   # serial -> state
+        self.version = 0
+        self._cv = threading.Condition()
+        self._closing = False
+        super().__init__(_AdbHandler, latency_ms, jitter_ms, fail_rate, drop_rate, seed)
+
+    def payload(self) -> str:
+        with self._cv:
+            return "".join(f"{s}\t{st}\n" for s, st in sorted(self.devices.items()))
+
+    def set_device(self, serial: str, state="device"):
+        # state=None — устройство исчезло; подписчики track-devices получают новый список
+        with self._cv:
+            if state is None:
+                self.devices.pop(serial, None)
+            else:
+                self.devices[serial] = state
+            self.version += 1
+            self._cv.notify_all()
+
+    def track(self, sock):
+        seen = -1
+        while True:
+            with self._cv:
+                while self.version == seen and not self._closing:
+                    self._cv.wait()
+                if self._closing:
+                    return
+                seen = self.version
+            try:
+                sock.sendall(_msg(self.payload()))
+            except OSError:
+                return
+
+    def close(self):
+        with self._cv:
+            self._closing = True
+            self._cv.notify_all()
+        super().close()
+
+# ---------- emulator process ----------
+def fake_emulator(directory) -> Path:
+    # исполняемый файл с интерфейсом `emulator -avd N -ports C,A` (обёртка над этим модулем)
+    d = Path(directory); me = Path(__file__).resolve()
+    if sys.platform == "win32":
+        p = d / "emulator.bat"
+        p.write_text(f'@"{sys.executable}" "{me}" emulator %*\r\n', encoding="utf-8")
+    else:
+        p = d / "emulator"
+        p.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{me}" emulator "$@"\n', encoding="utf-8")
+        p.chmod(0o755)
+    return p
+
+def _emulator_main(argv):
+    # консоль на первом порту из -ports; выход только после kill через консоль
+    console = int(argv[argv.index("-ports") + 1].split(",")[0])
+    fake = FakeConsole(port=console).start()
+    fake.bye.wait()
+    time.sleep(0.05)
+    fake.close()
+    os._exit(0)
+
+if __name__ == "__main__" and sys.argv[1:2] == ["emulator"]:
+    _emulator_main(sys.argv[2:])
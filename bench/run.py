@@ -0,0 +1,91 @@
+# bench/run.py
+# Runs the whole suite headless and writes one JSON document (meta + rows) for comparison.
+# Запуск:  python bench/run.py --out results.json [--full] [--latency-ms 2 --fail-rate 0.01]
+# Сравнение: python bench/run.py --compare old.json new.json [--threshold 0.10]
+
+import argparse, json, os, platform, subprocess, sys, time
+
+from common import ROOT, sizes
+import bench_store, bench_feed, bench_logs, bench_teleport, bench_farm, bench_bulk
+
+QUICK_SIZES = "1000,10000,100000"
+FULL_SIZES = "1000,10000,100000,1000000"
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                              capture_output=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def meta(args):
+    return {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_rev(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "args": vars(args)}
+
+# чем больше, тем хуже — *_ms; чем больше, тем лучше — *_per_s
+def _direction(key):
+    if key.endswith("_ms"):
+        return 1
+    if key.endswith("_per_s"):
+        return -1
+    return 0
+
+def compare(old_path, new_path, threshold):
+    old = {(r["bench"], r["case"]): r for r in json.load(open(old_path, encoding="utf-8"))["results"]}
+    new = json.load(open(new_path, encoding="utf-8"))["results"]
+    worse = 0
+    for r in new:
+        base = old.get((r["bench"], r["case"]))
+        if base is None:
+            continue
+        for k, v in r.items():
+            d = _direction(k); b = base.get(k)
+            if not d or not isinstance(v, (int, float)) or not isinstance(b, (int, float)) or b <= 0:
+                continue
+            change = (v - b) / b
+            flag = "WORSE" if change * d > threshold else "better" if change * d < -threshold else ""
+            worse += flag == "WORSE"
+            print(f"{r['bench']:<22} {r['case']:<40} {k:<20} {b:>12.3f} -> {v:>12.3f} {change:+7.1%} {flag}")
+    return 1 if worse else 0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="GeoChange benchmark suite")
+    ap.add_argument("--out", help="write results JSON here (default: stdout rows only)")
+    ap.add_argument("--full", action="store_true", help="include 1M-item datasets")
+    ap.add_argument("--sizes", help=f"dataset sizes (default {QUICK_SIZES})")
+    ap.add_argument("--only", default="store,feed,logs,bulk,teleport,farm", help="comma-separated benches")
+    ap.add_argument("-n", type=int, default=500, help="teleports per sequential run")
+    ap.add_argument("--devices", type=int, default=4, help="fake devices for fan-out and fake emulators for the farm")
+    ap.add_argument("--latency-ms", type=float, default=1.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative change reported as a regression")
+    a = ap.parse_args(argv)
+    if a.compare:
+        return compare(*a.compare, a.threshold)
+
+    ns = sizes(a.sizes or (FULL_SIZES if a.full else QUICK_SIZES))
+    only = set(a.only.split(","))
+    rows = []
+    if "store" in only:
+        rows += bench_store.run(ns)
+    if "feed" in only:
+        rows += bench_feed.run(ns)
+    if "logs" in only:
+        rows += bench_logs.run(ns)
+    if "bulk" in only:
+        rows += bench_bulk.run(ns)
+    if "teleport" in only:
+        rows += bench_teleport.run(a.n, a.devices, a.latency_ms, a.jitter_ms, a.fail_rate, a.drop_rate)
+    if "farm" in only:
+        rows += bench_farm.run(a.devices)
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta(a), "results": rows}, f, indent=1)
+        print(f"wrote {len(rows)} rows to {a.out}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# geochange.py
+# Command-line interface (no Qt): devices, teleport, saved locations, routes, launch profiles,
+# SDK toolchain check, daemon.
+# Если запущен демон (geochange daemon), команды идут к нему и используют его тёплые
+# соединения; иначе ядро поднимается прямо в процессе.
+
+import argparse, json, sys, time
+from pathlib import Path
+
+from geochange_core import Core, DEFAULT_ROOT, DEFAULT_SDK, emulator_path, toolchain
+from geochange_profiles import PROFILE_NAMES, HOST_CACHE, STATS_FILE, probe_host, make_plan, load_stats, summarize
+from geochange_rpc import RpcClient, LocalClient, RpcError, serve, DAEMON_HOST, DAEMON_PORT
+
+def _print(obj):
+    print(json.dumps(obj, ensure_ascii=False))
+
+def _core(args):
+    core = Core(sdk_root=Path(args.sdk))
+    if core.store.legacy_error:
+        print(f"warning: {core.store.legacy_error} (will retry on next start)", file=sys.stderr)
+    return core
+
+def _client(args):
+    if not args.no_daemon:
+        c = RpcClient.connect(DAEMON_HOST, args.port)
+        if c is not None:
+            # у демона свой корень SDK: явный --sdk, отличный от него, не применится
+            if args.sdk != str(DEFAULT_SDK):
+                sdk = c.call("ping").get("sdk")
+                if sdk and Path(sdk).resolve() != Path(args.sdk).resolve():
+                    print(f"warning: the running daemon uses SDK {sdk}; --sdk {args.sdk} is ignored "
+                          f"(use --no-daemon or restart the daemon with --sdk)", file=sys.stderr)
+            return c
+    return LocalClient(_core(args))
+
+def cmd_devices(c, args):
+    _print(c.call("devices"))
+
+def cmd_teleport(c, args):
+    if args.stdin:
+        # строки "lat lon [serial]" — поток для CI; ответ по строке на каждую точку
+        ok = True
+        for line in sys.stdin:
+            f = line.split()
+            if len(f) < 2:
+                continue
+            res = c.call("teleport", serial=f[2] if len(f) > 2 else args.serial,
+                         lat=float(f[0]), lon=float(f[1]), wait=not args.no_wait)
+            ok = ok and res.get("ok", True); _print(res)
+        return 0 if ok else 1
+    if args.lat is None or args.lon is None:
+        raise SystemExit("teleport: LAT and LON are required (or --stdin)")
+    if args.all:
+        res = c.call("teleport_all", lat=args.lat, lon=args.lon, spread_m=args.spread)
+        _print(res); return 0 if res["ok"] == res["total"] else 1
+    res = c.call("teleport", serial=args.serial, lat=args.lat, lon=args.lon, wait=not args.no_wait)
+    _print(res); return 0 if res.get("ok", True) else 1
+
+def cmd_loc(c, args):
+    if args.action == "list":
+        _print(c.call("locations"))
+    elif args.action == "save":
+        _print(c.call("save_location", name=args.name, lat=args.lat, lon=args.lon))
+    elif args.action == "delete":
+        _print(c.call("delete_location", name=args.name))
+    elif args.action == "go":
+        res = c.call("goto_location", name=args.name, serial=args.serial)
+        _print(res); return 0 if res.get("ok", True) else 1
+    elif args.action == "import":
+        _print(c.call("import_locations", path=str(Path(args.file).resolve()), fmt=args.format,
+                      dedupe_m=args.dedupe))
+    elif args.action == "export":
+        _print(c.call("export_locations", path=str(Path(args.file).resolve()), fmt=args.format))
+
+def cmd_route(c, args):
+    _print(c.call("route_play", path=str(Path(args.file).resolve()), serial=args.serial,
+                  speed_kmh=args.speed, rate_hz=args.rate, loop=args.loop))
+    if isinstance(c, RpcClient) and not args.wait:
+        return 0                                # маршрут играет демон
+    # в процессе (или --wait): ждём конца маршрута, Ctrl+C — остановка
+    try:
+        while True:
+            time.sleep(0.5)
+            st = c.call("route_status", serial=args.serial)
+            if not st["playing"]:
+                break
+    except KeyboardInterrupt:
+        pass
+    _print(c.call("route_stop", serial=args.serial))
+
+def cmd_metrics(c, args):
+    res = c.call("metrics", jsonl=str(Path(args.jsonl).resolve()) if args.jsonl else "",
+                 trace=str(Path(args.trace).resolve()) if args.trace else "")
+    for m in res:
+        print(f"{m['op']:<24} {m['device']:<16} n={m['count']:<6} err={m['errors']:<4} "
+              f"p50={m['p50']} p95={m['p95']} p99={m['p99']} max={m['max']}")
+    return 0
+
+def cmd_profiles(args):
+    # без демона: зонд хоста (кэш), план запуска и сводка записанных запусков
+    if args.stats:
+        for r in summarize(load_stats(DEFAULT_ROOT / STATS_FILE)):
+            print(f"{r['profile']:<12} {r['cores']}c {r['memory_mb']:>5}MB {r['gpu']:<21} runs={r['runs']:<3} "
+                  f"boot={r['boot_s_p50']}s startup cpu={r['startup_cpu_avg']}% rss={r['startup_rss_max_mb']}MB "
+                  f"steady cpu={r['steady_cpu_avg']}% rss={r['steady_rss_avg_mb']}MB")
+        return 0
+    host = probe_host(emulator_path(Path(args.sdk)), DEFAULT_ROOT / HOST_CACHE, refresh=args.refresh)
+    _print({"host": host, "plan": make_plan(args.profile, host, args.instances)})
+    return 0
+
+def cmd_toolchain(args):
+    tc = toolchain(Path(args.sdk))
+    _print(tc.info())
+    return 0 if tc.has("adb") and tc.has("emulator") else 1
+
+def cmd_daemon(args):
+    if args.stop:
+        c = RpcClient.connect(DAEMON_HOST, args.port)
+        if c is None:
+            print("daemon is not running", file=sys.stderr); return 1
+        _print(c.call("shutdown")); return 0
+    print(f"geochange daemon on {DAEMON_HOST}:{args.port}", file=sys.stderr)
+    serve(_core(args), DAEMON_HOST, args.port)
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="geochange", description="GeoChange emulator location control")
+    p.add_argument("--sdk", default=str(DEFAULT_SDK), help="Android SDK root")
+    p.add_argument("--port", type=int, default=DAEMON_PORT, help="daemon port on 127.0.0.1")
+    p.add_argument("--no-daemon", action="store_true", help="run in-process even if a daemon is running")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("devices", help="list adb devices")
+
+    t = sub.add_parser("teleport", help="send a geo fix")
+    t.add_argument("lat", type=float, nargs="?"); t.add_argument("lon", type=float, nargs="?")
+    t.add_argument("-s", "--serial", default="")
+    t.add_argument("--all", action="store_true", help="all online devices")
+    t.add_argument("--spread", type=float, default=0.0, help="metres east between devices with --all")
+    t.add_argument("--stdin", action="store_true", help="read 'lat lon [serial]' lines from stdin")
+    t.add_argument("--no-wait", action="store_true", help="queue and return without waiting for the device")
+
+    l = sub.add_parser("loc", help="saved locations")
+    la = l.add_subparsers(dest="action", required=True)
+    la.add_parser("list")
+    s = la.add_parser("save"); s.add_argument("name"); s.add_argument("lat", type=float); s.add_argument("lon", type=float)
+    d = la.add_parser("delete"); d.add_argument("name")
+    g = la.add_parser("go"); g.add_argument("name"); g.add_argument("-s", "--serial", default="")
+    im = la.add_parser("import", help="CSV (name,lat,lon), GPX waypoints or GeoJSON points")
+    im.add_argument("file"); im.add_argument("--format", default="", choices=["", "csv", "gpx", "geojson"])
+    im.add_argument("--dedupe", type=float, default=5.0, help="skip points within N metres of a known one (0 = off)")
+    ex = la.add_parser("export"); ex.add_argument("file")
+    ex.add_argument("--format", default="", choices=["", "csv", "gpx", "geojson"])
+
+    r = sub.add_parser("route", help="play a GPX/KML/GeoJSON route")
+    r.add_argument("file"); r.add_argument("-s", "--serial", default="")
+    r.add_argument("--speed", type=float, default=50.0, help="km/h")
+    r.add_argument("--rate", type=float, default=5.0, help="updates per second")
+    r.add_argument("--loop", action="store_true")
+    r.add_argument("--wait", action="store_true", help="with a daemon: wait until the route ends")
+
+    m = sub.add_parser("metrics", help="latency percentiles per operation (daemon or this run)")
+    m.add_argument("--jsonl", default="", help="also export spans as JSON lines")
+    m.add_argument("--trace", default="", help="also export a Chrome trace (chrome://tracing, Perfetto)")
+
+    pr = sub.add_parser("profiles", help="host probe and emulator launch plan")
+    pr.add_argument("--profile", default="auto", choices=PROFILE_NAMES)
+    pr.add_argument("--instances", type=int, default=1, help="plan for N emulators running side by side")
+    pr.add_argument("--refresh", action="store_true", help="probe the host again instead of using the cache")
+    pr.add_argument("--stats", action="store_true", help="summarize recorded startup/steady-state resource use")
+
+    sub.add_parser("toolchain", help="resolved adb/emulator/sdkmanager/avdmanager paths and versions")
+
+    dm = sub.add_parser("daemon", help="run the local JSON-RPC daemon")
+    dm.add_argument("--stop", action="store_true", help="stop a running daemon")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.cmd == "daemon":
+        return cmd_daemon(args) or 0
+    if args.cmd == "profiles":
+        return cmd_profiles(args)
+    if args.cmd == "toolchain":
+        return cmd_toolchain(args)
+    c = _client(args)
+    try:
+        return {"devices": cmd_devices, "teleport": cmd_teleport, "loc": cmd_loc,
+                "route": cmd_route, "metrics": cmd_metrics}[args.cmd](c, args) or 0
+    except (RpcError, KeyError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr); return 2
+    finally:
+        c.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,72 +3,72 @@
 # Эмулятор запускается в отдельном окне; карта встроена. Клик по сохранённой
 # локации автоматически телепортирует устройство.
 
+import time
+_T0 = time.perf_counter()          # отсчёт для отчёта о запуске — до тяжёлых импортов
+
 import os, sys, json, subprocess, threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from PySide6.QtCore import Qt, QObject, Slot, Signal, QUrl, QTimer
+from PySide6.QtCore import Qt, QObject, Slot, Signal, QUrl, QTimer, QBuffer, QByteArray, QIODevice
 from PySide6.QtGui import QPixmap, QPainter, QColor, QFont, QTextCursor
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QTabWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QLineEdit, QTextEdit, QComboBox, QProgressBar, QFrame
+    QPushButton, QLabel, QLineEdit, QPlainTextEdit, QComboBox, QProgressBar, QFrame,
+    QFileDialog, QSpinBox, QTableWidget, QTableWidgetItem, QHeaderView
+)
+# QtWebEngineCore нужен до QApplication (регистрация схем); QtWebEngineWidgets и
+# QtWebChannel (запуск Chromium) импортируются только при первом открытии карты
+from PySide6.QtWebEngineCore import (
+    QWebEngineProfile, QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
 )
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEngineProfile
-from PySide6.QtWebChannel import QWebChannel
+
+from geochange_core import (Core, DEFAULT_ROOT, DEFAULT_SDK, DEFAULT_AVD, SYSTEM_IMAGE, AVD_NAME,
+                            DEVICE_NAME, sdk_env, adb_path, emulator_path, toolchain, run_popen, run_check)
+from geochange_toolchain import expected_path, detached, make_executable, invalidate
+from geochange_teleport import offset_point
+from geochange_routes import Route, RoutePlayer
+from geochange_drive import DriveController
+from geochange_metrics import METRICS, instrument, StallWatchdog
+from geochange_bulk import import_file, export_file
+from geochange_store import ChangeFeed
+from geochange_spatial import SpatialIndex
+from geochange_geocoder import Geocoder
+from geochange_tiles import TileCache, Prefetcher, tiles_for_bbox, tiles_for_corridor, count_bbox
+from geochange_assets import find_assets, download_leaflet, read_asset, LEAFLET_CDN
+from geochange_boot import AdbShell, SnapshotManager, wait_ready
+from geochange_devices import parse_devices
+from geochange_farm import EmulatorFarm, LAST_PORT, FIRST_PORT, max_parallel
+from geochange_profiles import (PROFILE_NAMES, HOST_CACHE, STATS_FILE, probe_host, make_plan, apply_config,
+                                ResourceRecorder, FleetRecorder)
+from geochange_logs import LogBuffer, pump, PROGRESS, LINE
+from geochange_sdk import (PackageCache, archive_info, sdkmanager_install, is_installed,
+                           CMDLINE_TOOLS_ZIP, REPO_BASE)
+_T_IMPORTS = time.perf_counter()
 
 APP_TITLE   = "GeoChange — Emulator + Location Spoofer"
-DEFAULT_ROOT= Path(r"C:\geochange")
-DEFAULT_SDK = DEFAULT_ROOT / "sdk"
-DEFAULT_AVD = DEFAULT_ROOT / "avd"
-SYSTEM_IMAGE= "system-images;android-34;google_apis_playstore;x86_64"
-AVD_NAME    = "GeoChangePlay"
-DEVICE_NAME = "pixel_6"
-DATA_FILE   = Path(__file__).with_name("saved_locations.json")
+TILE_CACHE  = DEFAULT_ROOT / "tiles.mbtiles"
+TILE_CACHE_MB = 1024
+GEOCODER_DIR = DEFAULT_ROOT / "geocoder"          # собирается: geochange_geocoder.py build <tsv> <dir>
+GEOCODER_CACHE = DEFAULT_ROOT / "geocode_cache.db"
+ASSET_CACHE = DEFAULT_ROOT / "assets"
+STARTUP_LOG = DEFAULT_ROOT / "startup.jsonl"
+PREWARM_MAP = os.environ.get("GEOCHANGE_PREWARM_MAP", "0") == "1"
+SDK_PACKAGES = ["platform-tools", "emulator", SYSTEM_IMAGE]
+# кэш пакетов; если путь задан явно (можно общий), туда же сохраняются установленные пакеты
+PKG_CACHE = Path(os.environ.get("GEOCHANGE_PKG_CACHE") or DEFAULT_ROOT / "pkg_cache")
+PKG_CACHE_STORE = bool(os.environ.get("GEOCHANGE_PKG_CACHE"))
+LOG_MAX_LINES = int(os.environ.get("GEOCHANGE_LOG_LINES", "5000"))   # предел строк в окне лога
+LOG_FLUSH_HZ  = 10                                                    # обновлений окна лога в секунду
+LOG_FILE = os.environ.get("GEOCHANGE_LOG_FILE") or None               # полный лог с ротацией (5 МБ x 3)
+STALL_MS = float(os.environ.get("GEOCHANGE_STALL_MS", "0"))           # >0 — сторож зависаний GUI-потока
+LAUNCH_PROFILE = os.environ.get("GEOCHANGE_PROFILE", "auto")          # auto | performance | balanced | light | ci
+PROFILE_STATS = DEFAULT_ROOT / STATS_FILE                             # ресурсы запусков по профилям (JSONL)
 
 def ensure_dirs():
     DEFAULT_ROOT.mkdir(parents=True, exist_ok=True)
     (DEFAULT_ROOT / "map_cache").mkdir(parents=True, exist_ok=True)
 
-def sdk_env(sdk_dir: Path):
-    env = os.environ.copy()
-    env["ANDROID_SDK_ROOT"] = str(sdk_dir)
-    env["ANDROID_HOME"] = str(sdk_dir)
-    env["ANDROID_AVD_HOME"] = str(DEFAULT_AVD)
-    env["PATH"] = (
-        str(sdk_dir / "platform-tools") + os.pathsep +
-        str(sdk_dir / "emulator") + os.pathsep +
-        str(sdk_dir / "cmdline-tools" / "latest" / "bin") + os.pathsep +
-        env.get("PATH", "")
-    )
-    return env
-
-def adb_path(sdk_dir: Path):
-    cand = sdk_dir / "platform-tools" / "adb.exe"
-    return str(cand) if cand.exists() else "adb"
-
-def emulator_path(sdk_dir: Path):
-    cand = sdk_dir / "emulator" / "emulator.exe"
-    return str(cand) if cand.exists() else "emulator"
-
-def run_popen(cmd, env=None):
-    return subprocess.Popen(cmd, env=env, text=True, stdin=subprocess.PIPE,
-                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-
-def run_check(cmd, env=None):
-    return subprocess.run(cmd, env=env, text=True, capture_output=True)
-
-def load_items():
-    if DATA_FILE.exists():
-        try:
-            return json.loads(DATA_FILE.read_text(encoding="utf-8"))
-        except Exception:
-            return []
-    return []
-
-def save_items(items):
-    DATA_FILE.write_text(json.dumps(items, ensure_ascii=False, indent=2),
-                         encoding="utf-8")
-
 def make_logo_pixmap(size: int = 48) -> QPixmap:
     pm = QPixmap(size, size); pm.fill(Qt.transparent)
     p = QPainter(pm)
@@ -84,49 +84,306 @@ def make_logo_pixmap(size: int = 48) -> QPixmap:
 
 # ---------- Web (Map) Bridge ----------
 class Bridge(QObject):
-    itemsUpdated = Signal(str)
+    itemsUpdated = Signal(str)      # снимок {type:"snapshot", seq, items}
+    itemsDelta = Signal(str)        # дельта {type:"delta"|"resync", seq, base, ops}
+    teleportDone = Signal(str)
+    routeLoaded = Signal(str)
+    routeProgress = Signal(str)
+    fanoutDone = Signal(str)
+    prefetchProgress = Signal(str)
+    searchResults = Signal(str)
+    driveState = Signal(str)
+    bulkProgress = Signal(str)
+    _itemsDelta = Signal(str)
+    _teleportResult = Signal(str)
+    _fanoutDone = Signal(str)
+    _prefetchProgress = Signal(str)
+    _searchResults = Signal(str)
+    _routeLoaded = Signal(str)
+    _routeProgress = Signal(str)
+    _driveState = Signal(str)
+    _bulkProgress = Signal(str)
 
     def __init__(self, main):
         super().__init__()
         self.main = main
+        # результаты приходят из рабочих потоков — пересылаем в GUI-поток (queued)
+        self._itemsDelta.connect(self.itemsDelta)
+        self._teleportResult.connect(self.teleportDone)
+        self._routeLoaded.connect(self.routeLoaded)
+        self._routeProgress.connect(self.routeProgress)
+        self._fanoutDone.connect(self.fanoutDone)
+        self._prefetchProgress.connect(self.prefetchProgress)
+        self._searchResults.connect(self.searchResults)
+        self._driveState.connect(self.driveState)
+        self._bulkProgress.connect(self.bulkProgress)
+        self._route_target = ""
+        self._route_targets = []
+        self.player = RoutePlayer(self._route_send,
+            on_progress=lambda st: self._routeProgress.emit(json.dumps(st)))
+        self.drive = None
+        self._bulkCancel = None
+        main.feed.subscribe(lambda msg: self._itemsDelta.emit(json.dumps(msg, ensure_ascii=False)))
 
     @Slot()
+    @instrument("bridge.requestItems")
     def requestItems(self):
-        self.itemsUpdated.emit(json.dumps(load_items(), ensure_ascii=False))
-
+        self.itemsUpdated.emit(json.dumps(self.main.feed.snapshot(), ensure_ascii=False))
+
+    @Slot(int)
+    @instrument("bridge.requestSince")
+    def requestSince(self, seq):
+        # страница пропустила версию: догоняем дельтами из истории либо снимком
+        msgs = self.main.feed.since(seq)
+        if msgs is None:
+            self.requestItems(); return
+        for m in msgs:
+            self.itemsDelta.emit(json.dumps(m, ensure_ascii=False))
+
+    # изменения уходят на страницу через ChangeFeed -> itemsDelta
     @Slot(str, float, float)
+    @instrument("bridge.saveItem")
     def saveItem(self, name, lat, lon):
         name = name.strip()
         if not name:
             return
-        items = load_items()
-        items = [i for i in items if i.get("name") != name]
-        items.append({"name": name, "lat": float(lat), "lon": float(lon)})
-        save_items(items)
-        self.itemsUpdated.emit(json.dumps(items, ensure_ascii=False))
+        self.main.store.put(name, lat, lon)
 
     @Slot(str)
+    @instrument("bridge.deleteItem")
     def deleteItem(self, name):
-        items = [i for i in load_items() if i.get("name") != name]
-        save_items(items)
-        self.itemsUpdated.emit(json.dumps(items, ensure_ascii=False))
+        self.main.store.delete(name)
+
+    # --- bulk import/export: поток, пачки put_many, прогресс сигналом
+    def _bulk(self, op, fn):
+        if self._bulkCancel is not None:
+            self.bulkProgress.emit(json.dumps({"error": "another import/export is running"})); return
+        self._bulkCancel = cancel = threading.Event()
+        emit = lambda st: self._bulkProgress.emit(json.dumps(dict(st, op=op), ensure_ascii=False))
+        def work():
+            try:
+                with METRICS.timer("bulk." + op):
+                    fn(emit, cancel)
+            except Exception as e:
+                emit({"error": str(e), "finished": True})
+            finally:
+                self._bulkCancel = None
+        threading.Thread(target=work, daemon=True).start()
+
+    @Slot(float)
+    @instrument("bridge.importItems")
+    def importItems(self, dedupe_m):
+        path, _ = QFileDialog.getOpenFileName(
+            self.main, "Import locations", "", "Locations (*.csv *.txt *.gpx *.geojson *.json)")
+        if path:
+            self._bulk("import", lambda emit, cancel: import_file(
+                self.main.store, path, dedupe_m=dedupe_m, on_progress=emit, cancel=cancel))
+
+    @Slot()
+    @instrument("bridge.exportItems")
+    def exportItems(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self.main, "Export locations", "locations.csv", "CSV (*.csv);;GPX (*.gpx);;GeoJSON (*.geojson)")
+        if path:
+            self._bulk("export", lambda emit, cancel: export_file(
+                self.main.store, path, on_progress=emit, cancel=cancel))
+
+    @Slot()
+    @instrument("bridge.cancelBulk")
+    def cancelBulk(self):
+        if self._bulkCancel is not None:
+            self._bulkCancel.set()
+
+    def _target(self, target=""):
+        return target.strip() or self.main.adbTarget.text().strip() or "emulator-5554"
+
+    def _spread(self, lat, lon, spread_m):
+        # все онлайн-устройства; i-е смещено на i*spread_m к востоку
+        devs = self.main.devices() or [self._target()]
+        return [(d, *offset_point(lat, lon, i * spread_m, 0.0)) for i, d in enumerate(devs)]
+
+    # --- spatial queries (синхронные: отвечают из индекса в памяти)
+    @Slot(float, float, float, float, int, result=str)
+    @instrument("bridge.viewport")
+    def viewport(self, south, west, north, east, zoom):
+        return json.dumps(self.main.spatial.viewport(south, west, north, east, zoom),
+                          ensure_ascii=False)
+
+    @Slot(float, float, int, result=str)
+    @instrument("bridge.nearest")
+    def nearest(self, lat, lon, k):
+        return json.dumps(self.main.spatial.nearest(lat, lon, max(1, k)), ensure_ascii=False)
+
+    @Slot()
+    @instrument("bridge.mapReady")
+    def mapReady(self):
+        self.main.startup.mark("map_ready")
+        self.main.report_startup("map")
+
+    # --- geocoding: подсказки из локального индекса, поиск с сетевым fallback
+    @Slot(str, int, result=str)
+    @instrument("bridge.suggest")
+    def suggest(self, query, limit):
+        return json.dumps(self.main.geocoder.suggest(query, max(1, limit)), ensure_ascii=False)
+
+    @Slot(str)
+    @instrument("bridge.search")
+    def search(self, query):
+        def work():
+            try:
+                with METRICS.timer("geocoder.search"):
+                    res, src = self.main.geocoder.search(query)
+                msg = {"query": query, "source": src, "results": res}
+            except Exception as e:
+                msg = {"query": query, "error": str(e), "results": []}
+            self._searchResults.emit(json.dumps(msg, ensure_ascii=False))
+        threading.Thread(target=work, daemon=True).start()
+
+    # --- offline tiles
+    def _prefetch(self, tiles, total=0):
+        try:
+            self.main.prefetcher.start(tiles, total,
+                on_progress=lambda st: self._prefetchProgress.emit(json.dumps(st)))
+        except (RuntimeError, ValueError) as e:
+            self.prefetchProgress.emit(json.dumps({"error": str(e)}))
+
+    @Slot(float, float, float, float, int, int)
+    @instrument("bridge.prefetchView")
+    def prefetchView(self, south, west, north, east, zmin, zmax):
+        self._prefetch(tiles_for_bbox(south, west, north, east, zmin, zmax),
+                       count_bbox(south, west, north, east, zmin, zmax))
+
+    @Slot(float, int, int)
+    @instrument("bridge.prefetchRoute")
+    def prefetchRoute(self, radius_m, zmin, zmax):
+        route = self.player.route
+        if route is None:
+            self.prefetchProgress.emit(json.dumps({"error": "load a route first"})); return
+        pts = [(p[0], p[1]) for p in route.simplified(5000)]
+        self._prefetch(tiles_for_corridor(pts, radius_m, zmin, zmax))
+
+    @Slot()
+    @instrument("bridge.cancelPrefetch")
+    def cancelPrefetch(self):
+        self.main.prefetcher.cancel()
+
+    @Slot(result=str)
+    @instrument("bridge.tileStats")
+    def tileStats(self):
+        return json.dumps(self.main.tiles.snapshot_stats())
 
     @Slot(float, float, str)
+    @instrument("bridge.teleport")
     def teleport(self, lat, lon, target=""):
-        sdk = self.main.sdkRoot(); env = sdk_env(sdk)
-        if not target.strip():
-            target = self.main.adbTarget.text().strip() or "emulator-5554"
-        adb = adb_path(sdk)
-        # убедимся, что устройство online
-        try:
-            st = run_check([adb, "-s", target, "get-state"], env=env)
-            if (st.stdout or "").strip() != "device":
-                subprocess.run([adb, "-s", target, "wait-for-device"], env=env,
-                               text=True, timeout=30)
-        except Exception:
-            pass
-        run_check([adb, "-s", target, "emu", "geo", "fix", str(lon), str(lat)],
-                  env=env)
+        target = self._target(target)
+        # не блокируем GUI: точка уходит в очередь устройства, результат придёт сигналом
+        fut = self.main.teleports.submit(target, lat, lon)
+        fut.add_done_callback(
+            lambda f: self._teleportResult.emit(json.dumps(f.result(), ensure_ascii=False)))
+
+    @Slot(float, float, float)
+    @instrument("bridge.teleportAll")
+    def teleportAll(self, lat, lon, spread_m=0.0):
+        targets = self._spread(lat, lon, spread_m)
+        def work():
+            res = self.main.teleports.fan_out(targets, timeout=10.0)
+            self._fanoutDone.emit(json.dumps(res, ensure_ascii=False))
+        threading.Thread(target=work, daemon=True).start()
+
+    # --- route playback
+    def _route_send(self, lat, lon, brg, spd):
+        if not self._route_targets:
+            return self.main.send_fix(self._route_target, lat, lon)
+        # несколько устройств: в очереди устройств (latest-wins), не ждём медленные
+        for serial, east in self._route_targets:
+            self.main.teleports.submit(serial, *offset_point(lat, lon, east, 0.0))
+
+    @Slot()
+    @instrument("bridge.openRoute")
+    def openRoute(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self.main, "Open route", "", "Routes (*.gpx *.kml *.geojson *.json)")
+        if not path:
+            return
+        def work():
+            try:
+                route = Route.load(path)
+            except Exception as e:
+                self._routeLoaded.emit(json.dumps({"error": str(e)})); return
+            self.player.load(route)
+            self._routeLoaded.emit(json.dumps({
+                "name": route.name, "length": round(route.length, 1),
+                "count": len(route), "points": route.simplified()}, ensure_ascii=False))
+        threading.Thread(target=work, daemon=True).start()
+
+    @Slot(str, float)
+    @instrument("bridge.routePlay")
+    def routePlay(self, target="", spread_m=0.0):
+        # target "*" — все устройства сразу
+        if target == "*":
+            self._route_targets = [(d, i * spread_m) for i, d in
+                                   enumerate(self.main.devices() or [self._target()])]
+        else:
+            self._route_targets = []
+            self._route_target = self._target(target)
+        self.player.play()
+
+    @Slot()
+    @instrument("bridge.routePause")
+    def routePause(self):
+        self.player.pause()
+
+    @Slot(float)
+    @instrument("bridge.routeSeek")
+    def routeSeek(self, fraction):
+        self._route_target = self._route_target or self._target()
+        self.player.seek(fraction)
+
+    @Slot(bool)
+    @instrument("bridge.routeLoop")
+    def routeLoop(self, loop):
+        self.player.set_loop(loop)
+
+    @Slot(float, float)
+    @instrument("bridge.routeConfig")
+    def routeConfig(self, speed_kmh, rate_hz):
+        self.player.set_speed(speed_kmh / 3.6)
+        self.player.set_rate(rate_hz)
+
+    # --- live drive: ввод с клавиатуры/джойстика, позиция считается в Python
+    @Slot(float, float, float, float, float)
+    @instrument("bridge.driveStart")
+    def driveStart(self, lat, lon, heading, rate_hz, max_kmh):
+        self.driveStop()
+        self.player.pause()
+        target = self._target()
+        self.drive = DriveController(lambda s: self.main.core.send_nmea(target, s), lat, lon,
+            heading, rate_hz, max_kmh,
+            on_state=lambda st: self._driveState.emit(json.dumps(dict(st, serial=target)))).start()
+
+    @Slot(float, float, float)
+    @instrument("bridge.driveKeys")
+    def driveKeys(self, turn, throttle, stamp):
+        if self.drive is not None:
+            self.drive.keys(turn, throttle, stamp)
+
+    @Slot(float, float, float)
+    @instrument("bridge.driveStick")
+    def driveStick(self, heading, fraction, stamp):
+        if self.drive is not None:
+            self.drive.stick(heading, fraction, stamp)
+
+    @Slot(float, float)
+    @instrument("bridge.driveConfig")
+    def driveConfig(self, rate_hz, max_kmh):
+        if self.drive is not None:
+            self.drive.set_rate(rate_hz); self.drive.set_max_speed(max_kmh)
+
+    @Slot()
+    @instrument("bridge.driveStop")
+    def driveStop(self):
+        if self.drive is not None:
+            self.drive.close(); self.drive = None
 
 # ---------- Embedded HTML (Leaflet map) ----------
 HTML = r"""<!DOCTYPE html>
@@ -135,8 +392,8 @@ HTML = r"""<!DOCTYPE html>
 <meta charset="utf-8"/>
 <meta name="viewport" content="width=device-width,initial-scale=1"/>
 <title>GeoChange — Map</title>
-<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"/>
-<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<link rel="stylesheet" href="{{LEAFLET}}leaflet.css"/>
+<script src="{{LEAFLET}}leaflet.js"></script>
 <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
 <style>
   html,body{height:100%;margin:0;background:#0b0f14;color:#e6eefc;
@@ -149,48 +406,223 @@ HTML = r"""<!DOCTYPE html>
   .btn:hover{background:#1a2842}
   input,select{padding:.5rem .65rem;border:1px solid #24324b;border-radius:.7rem;
        min-width:10rem;background:#0f1722;color:#e6eefc}
-  #saved{width:16rem}
+  #savedPanel{position:absolute;right:.6rem;top:70px;z-index:1000;width:17rem;display:flex;
+              flex-direction:column;gap:.35rem;padding:.45rem;border:1px solid #24324b;
+              border-radius:.7rem;background:rgba(15,23,34,.92)}
+  #savedFilter{min-width:0}
+  #savedList{position:relative;height:16rem;overflow-y:auto;outline:none}
+  #savedRows{position:absolute;left:0;right:0;top:0}
+  .row{height:28px;line-height:28px;padding:0 .5rem;border-radius:.4rem;cursor:pointer;
+       white-space:nowrap;overflow:hidden;text-overflow:ellipsis}
+  .row:hover{background:#1a2842}
+  .row.sel{background:#2a6bff}
+  #savedCount{font-size:.8rem;opacity:.7}
+  #bulkRow{display:flex;gap:.35rem;align-items:center}
+  #bulkRow .btn{padding:.3rem .6rem}
+  #bulkInfo{font-size:.8rem;opacity:.85}
   .spacer{flex:1 1 auto}
   #status{font-size:.9rem;opacity:.9}
+  #routebar{position:absolute;left:.6rem;bottom:1.6rem;z-index:1000;display:flex;gap:.4rem;
+            align-items:center;padding:.45rem .6rem;border:1px solid #24324b;border-radius:.7rem;
+            background:rgba(15,23,34,.92)}
+  #routebar input[type=number]{min-width:0;width:4.2rem}
+  #routebar input[type=range]{min-width:0;width:14rem;padding:0}
+  #routeInfo{font-size:.85rem;opacity:.85}
+  #drivebar{position:absolute;left:.6rem;bottom:5.4rem;z-index:1000;display:flex;gap:.4rem;
+            align-items:center;padding:.45rem .6rem;border:1px solid #24324b;border-radius:.7rem;
+            background:rgba(15,23,34,.92);font-size:.85rem}
+  #drivebar input{min-width:0;width:3.6rem}
+  #driveBtn.on{background:#2a6bff}
+  #stick{position:absolute;left:1.2rem;bottom:9.2rem;z-index:1000;width:120px;height:120px;display:none;
+         border:2px solid #24324b;border-radius:50%;background:rgba(15,23,34,.75);touch-action:none}
+  #stickKnob{position:absolute;left:40px;top:40px;width:40px;height:40px;border-radius:50%;
+             background:#2a6bff;pointer-events:none}
+  #tilebar{position:absolute;right:.6rem;bottom:1.6rem;z-index:1000;display:flex;gap:.4rem;
+           align-items:center;padding:.45rem .6rem;border:1px solid #24324b;border-radius:.7rem;
+           background:rgba(15,23,34,.92);font-size:.85rem}
+  #tilebar input{min-width:0;width:3.2rem}
+  #searchBox{position:relative}
+  #suggest{position:absolute;left:0;top:calc(100% + 4px);z-index:2000;min-width:100%;display:none;
+           border:1px solid #24324b;border-radius:.6rem;background:#0f1722;overflow:hidden}
+  #suggest div{padding:.4rem .65rem;cursor:pointer;white-space:nowrap}
+  #suggest div.act,#suggest div:hover{background:#1a2842}
+  .cluster{display:flex;align-items:center;justify-content:center;border-radius:50%;
+           background:rgba(42,107,255,.85);color:#fff;font:600 12px system-ui;
+           border:2px solid rgba(230,238,252,.8)}
 </style>
 </head>
 <body>
   <div id="topbar">
-    <input id="search" placeholder="Search address/place (Enter)">
+    <span id="searchBox"><input id="search" placeholder="Search address/place (Enter)" autocomplete="off"><div id="suggest"></div></span>
     <button class="btn" id="btnSearch">Find</button>
     <button class="btn" id="btnTeleport">Teleport here</button>
-    <select id="saved"></select>
+    <label title="Send to every online device"><input id="allDevices" type="checkbox"> all devices</label>
+    <input id="spread" type="number" min="0" value="0" title="Offset between devices, m" style="min-width:0;width:4.5rem">
     <button class="btn" id="btnSave">Save</button>
     <button class="btn" id="btnDelete">Delete</button>
+    <button class="btn" id="btnNearest">Nearest</button>
     <span class="spacer"></span>
     <span id="status"></span>
   </div>
   <div id="map"></div>
+  <div id="savedPanel">
+    <input id="savedFilter" placeholder="Filter saved…">
+    <div id="savedList" tabindex="0"><div id="savedSpacer"></div><div id="savedRows"></div></div>
+    <span id="savedCount"></span>
+    <div id="bulkRow">
+      <button class="btn" id="btnImport" title="CSV (name,lat,lon), GPX waypoints, GeoJSON points">Import…</button>
+      <button class="btn" id="btnExport">Export…</button>
+      <input id="dedupeM" type="number" min="0" value="5" title="skip points within N m of a saved one" style="min-width:0;width:3.2rem"> m
+      <button class="btn" id="btnBulkCancel" style="display:none">Cancel</button>
+    </div>
+    <span id="bulkInfo"></span>
+  </div>
+  <div id="routebar">
+    <button class="btn" id="btnRoute">Route…</button>
+    <button class="btn" id="btnRoutePlay">▶</button>
+    <input id="routeSeek" type="range" min="0" max="1000" value="0">
+    <label><input id="routeLoop" type="checkbox"> loop</label>
+    <input id="routeSpeed" type="number" min="1" max="1000" value="50" title="km/h"> km/h
+    <input id="routeRate" type="number" min="1" max="20" value="5" title="updates per second"> Hz
+    <span id="routeInfo"></span>
+  </div>
+  <div id="drivebar">
+    <button class="btn" id="driveBtn" title="WASD / arrows or the joystick">Drive</button>
+    <input id="driveMax" type="number" min="5" max="300" value="60" title="max km/h"> km/h
+    <input id="driveRate" type="number" min="10" max="20" value="10" title="updates per second"> Hz
+    <span id="driveInfo"></span>
+  </div>
+  <div id="stick"><div id="stickKnob"></div></div>
+  <div id="tilebar">
+    <span>zoom</span>
+    <input id="tileZmin" type="number" min="0" max="19" value="10">
+    <input id="tileZmax" type="number" min="0" max="19" value="16">
+    <button class="btn" id="btnPrefetchView">Prefetch view</button>
+    <button class="btn" id="btnPrefetchRoute">Prefetch route</button>
+    <button class="btn" id="btnPrefetchCancel">Cancel</button>
+    <span id="tileInfo"></span>
+  </div>
 
 <script>
 let bridge=null;
 new QWebChannel(qt.webChannelTransport, ch=>{
   bridge = ch.objects.bridge;
-  bridge.itemsUpdated.connect(items_json=>{
-    const items = JSON.parse(items_json);
-    const sel = document.getElementById('saved');
-    sel.innerHTML = '';
-    items.forEach(it=>{
-      const opt = document.createElement('option');
-      // показываем только имя (без координат)
-      opt.value = JSON.stringify(it);
-      opt.textContent = it.name;
-      sel.appendChild(opt);
-    });
+  bridge.itemsUpdated.connect(js=>applySnapshot(JSON.parse(js)));
+  bridge.itemsDelta.connect(js=>applyDelta(JSON.parse(js)));
+  bridge.teleportDone.connect(res_json=>{
+    const r = JSON.parse(res_json);
+    if(r.superseded) return;
+    if(r.ok) setStatus(`Teleported ${r.serial} via ${r.via} (${r.latency_ms} ms)`);
+    else setStatus(`Teleport failed on ${r.serial}: ${r.error}`);
+  });
+  bridge.fanoutDone.connect(js=>{
+    const r = JSON.parse(js);
+    const bad = r.results.filter(x=>!x.ok).map(x=>`${x.serial}: ${x.error||'superseded'}`);
+    const slow = Math.max(0, ...r.results.map(x=>x.latency_ms));
+    setStatus(`Teleported ${r.ok}/${r.total} devices in ${r.wall_ms} ms (slowest ${slow} ms)`
+              + (bad.length ? ' — ' + bad.join('; ') : ''));
+  });
+  bridge.searchResults.connect(js=>{
+    const r = JSON.parse(js);
+    if(r.error){ setStatus('Search error: '+r.error); return; }
+    if(!r.results.length){ setStatus('Nothing found'); return; }
+    goTo(r.results[0]);
+  });
+  bridge.prefetchProgress.connect(js=>{
+    const p = JSON.parse(js);
+    if(p.error){ setStatus('Prefetch: '+p.error); return; }
+    setStatus(`Prefetch ${p.done}${p.total ? '/'+p.total : ''} tiles (new ${p.fetched}, cached ${p.cached}, failed ${p.failed})`
+              + (p.finished ? (p.cancelled ? ' — cancelled' : ' — done') : ''));
+  });
+  bridge.routeLoaded.connect(js=>{
+    const r = JSON.parse(js);
+    if(r.error){ setStatus('Route error: '+r.error); return; }
+    routePts = r.points; routePlaying = false;
+    if(routeLine) routeLine.remove();
+    if(routeDone) routeDone.remove();
+    routeLine = L.polyline(routePts.map(p=>[p[0],p[1]]),{color:'#7a8599',weight:4,opacity:.7}).addTo(map);
+    routeDone = L.polyline([],{color:'#2a6bff',weight:5}).addTo(map);
+    map.fitBounds(routeLine.getBounds());
+    document.getElementById('routeInfo').innerText = `${r.name}: ${(r.length/1000).toFixed(2)} km`;
+    document.getElementById('btnRoutePlay').innerText = '▶';
+  });
+  bridge.routeProgress.connect(js=>{
+    const st = JSON.parse(js);
+    if(!routeDone) return;
+    // последняя точка упрощённой линии, пройденная к текущей доле маршрута
+    let lo=0, hi=routePts.length-1;
+    while(lo<hi){ const m=(lo+hi+1)>>1; if(routePts[m][2]<=st.fraction) lo=m; else hi=m-1; }
+    const done = routePts.slice(0,lo+1).map(p=>[p[0],p[1]]); done.push([st.lat,st.lon]);
+    routeDone.setLatLngs(done);
+    marker.setLatLng([st.lat,st.lon]);
+    if(!seeking) document.getElementById('routeSeek').value = Math.round(st.fraction*1000);
+    routePlaying = st.playing;
+    document.getElementById('btnRoutePlay').innerText = st.playing ? '⏸' : '▶';
+    if(st.ok===false) setStatus('Route send error: '+st.error);
+  });
+  bridge.bulkProgress.connect(js=>{
+    const p = JSON.parse(js), info = document.getElementById('bulkInfo');
+    // кнопка — с первого события задачи (диалог могли закрыть без выбора файла)
+    document.getElementById('btnBulkCancel').style.display = p.finished ? 'none' : '';
+    if(p.error){ info.innerText = 'Error: '+p.error; return; }
+    if(p.op==='import'){
+      const pct = p.total_bytes ? Math.round(p.bytes*100/p.total_bytes) : 100;
+      info.innerText = `${p.finished ? (p.cancelled ? 'Import cancelled' : 'Imported') : 'Importing '+pct+'%'}: `
+        + `${p.added} new, ${p.renamed} renamed, ${p.duplicates} duplicates, ${p.invalid} invalid`
+        + (p.finished ? ` (${(p.ms/1000).toFixed(1)} s)` : '');
+    } else {
+      info.innerText = p.finished ? `${p.cancelled ? 'Export cancelled' : 'Exported'} ${p.written}/${p.total}`
+                                  : `Exporting ${p.written}/${p.total}`;
+    }
+  });
+  bridge.driveState.connect(js=>{
+    const st = JSON.parse(js);
+    if(!driving) return;
+    marker.setLatLng([st.lat,st.lon]);
+    if(!map.getBounds().pad(-0.2).contains(marker.getLatLng())) map.panTo(marker.getLatLng(),{animate:false});
+    // клавиша -> ответ консоли -> обратно на страницу; device_ms — часть до ответа консоли
+    if(st.stamp) keyMs = performance.now() - st.stamp;
+    const s = st.stats;
+    document.getElementById('driveInfo').innerText = st.ok===false ? 'Drive error: '+st.error :
+      `${st.kmh} km/h ${Math.round(st.heading)}° via ${st.via}` +
+      (keyMs!==null ? ` · key→device ${keyMs.toFixed(0)} ms (avg ${s.avg_ms} / max ${s.max_ms.toFixed(0)} ms in Python)` : '') +
+      (s.late ? ` · late ${s.late}/${s.ticks}` : '');
   });
   bridge.requestItems();
+  bridge.mapReady();
 });
 
 const map = L.map('map',{zoomControl:true}).setView([50.45,30.52],5);
-L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
+// тайлы идут через локальный кэш (схема geotile:), сеть — только при промахе
+L.tileLayer('geotile:{z}/{x}/{y}.png',
             {maxZoom:19,attribution:'&copy; OpenStreetMap'}).addTo(map);
 const marker = L.marker([50.45,30.52],{draggable:true}).addTo(map);
 
+// сохранённые точки на карте: только видимое, кластеры считаются в Python
+const savedLayer = L.layerGroup().addTo(map);
+function refreshSaved(){
+  if(!bridge) return;
+  const b=map.getBounds();
+  bridge.viewport(b.getSouth(), b.getWest(), b.getNorth(), b.getEast(), map.getZoom(), js=>{
+    const v=JSON.parse(js);
+    savedLayer.clearLayers();
+    v.clusters.forEach(([lat,lon,n])=>{
+      const sz = n<100 ? 30 : n<1000 ? 38 : 46;
+      L.marker([lat,lon],{icon:L.divIcon({className:'',html:`<div class="cluster" style="width:${sz}px;height:${sz}px">${n}</div>`,
+                                          iconSize:[sz,sz]})})
+        .on('click',()=>map.setView([lat,lon], Math.min(map.getZoom()+2, 19)))
+        .addTo(savedLayer);
+    });
+    v.points.forEach(([name,lat,lon])=>{
+      L.circleMarker([lat,lon],{radius:6,color:'#e6eefc',weight:1,fillColor:'#2a6bff',fillOpacity:.9})
+        .bindTooltip(name)
+        .on('click',()=>{ marker.setLatLng([lat,lon]); setStatus(`Selected: ${name}`); })
+        .addTo(savedLayer);
+    });
+  });
+}
+map.on('moveend', refreshSaved);
+
 function setStatus(t){ document.getElementById('status').innerText=t||''; }
 
 map.on('click',e=>marker.setLatLng(e.latlng));
@@ -199,9 +631,17 @@ marker.on('dragend',()=>{
   setStatus(`Selected: ${p.lat.toFixed(5)}, ${p.lng.toFixed(5)}`);
 });
 
+function allDevices(){ return document.getElementById('allDevices').checked; }
+function spreadM(){ return parseFloat(document.getElementById('spread').value)||0; }
+function teleportTo(lat, lon){
+  setStatus('Teleporting…');
+  if(allDevices()) bridge.teleportAll(lat, lon, spreadM());
+  else bridge.teleport(lat, lon, "");
+}
+
 document.getElementById('btnTeleport').onclick=()=>{
   const p=marker.getLatLng();
-  bridge.teleport(p.lat, p.lng, "");
+  teleportTo(p.lat, p.lng);
 };
 
 document.getElementById('btnSave').onclick=()=>{
@@ -212,46 +652,355 @@ document.getElementById('btnSave').onclick=()=>{
 };
 
 document.getElementById('btnDelete').onclick=()=>{
-  const sel=document.getElementById('saved');
-  if(!sel.value) return;
-  const obj=JSON.parse(sel.value);
-  bridge.deleteItem(obj.name);
+  if(selectedName!==null) bridge.deleteItem(selectedName);
 };
 
-// поиск по Nominatim
+// сохранённые локации: снимок + дельты по номерам версий, виртуальный список
+const ROW=28;
+const listEl=document.getElementById('savedList'), rowsEl=document.getElementById('savedRows');
+const filterEl=document.getElementById('savedFilter');
+let feedSeq=-1, resyncing=false, savedNames=[], savedPos=new Map(), savedView=null,
+    selectedName=null, renderQueued=false;
+function lowerBound(arr,x){ let lo=0,hi=arr.length; while(lo<hi){ const m=(lo+hi)>>1; if(arr[m]<x) lo=m+1; else hi=m; } return lo; }
+function esc(t){ return t.replace(/[&<>"]/g,c=>({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}[c])); }
+function savedChanged(){ savedView=null; scheduleRender(); refreshSaved(); }
+function applySnapshot(msg){
+  feedSeq=msg.seq; resyncing=false;
+  savedPos=new Map(msg.items.map(([n,lat,lon])=>[n,[lat,lon]]));
+  savedNames=[...savedPos.keys()].sort();
+  if(selectedName!==null && !savedPos.has(selectedName)) selectedName=null;
+  savedChanged();
+}
+function applyDelta(msg){
+  if(msg.seq<=feedSeq) return;
+  if(msg.type==='resync' || msg.base!==feedSeq){
+    if(!resyncing){ resyncing=true; bridge.requestSince(feedSeq); }
+    return;
+  }
+  msg.ops.forEach(([op,n,lat,lon])=>{
+    const i=lowerBound(savedNames,n), has=savedNames[i]===n;
+    if(op==='remove'){
+      if(has) savedNames.splice(i,1);
+      savedPos.delete(n); if(selectedName===n) selectedName=null;
+    } else {
+      if(!has) savedNames.splice(i,0,n);
+      savedPos.set(n,[lat,lon]);
+    }
+  });
+  feedSeq=msg.seq; resyncing=false;
+  savedChanged();
+}
+function currentView(){
+  if(savedView) return savedView;
+  const f=filterEl.value.trim().toLowerCase();
+  savedView = f ? savedNames.filter(n=>n.toLowerCase().includes(f)) : savedNames;
+  return savedView;
+}
+function scheduleRender(){
+  if(renderQueued) return;
+  renderQueued=true;
+  requestAnimationFrame(()=>{ renderQueued=false; renderSaved(); });
+}
+function renderSaved(){
+  // в DOM только видимые строки (+ запас), высоту прокрутки держит spacer
+  const view=currentView();
+  document.getElementById('savedSpacer').style.height=(view.length*ROW)+'px';
+  const first=Math.max(0, Math.floor(listEl.scrollTop/ROW)-5);
+  const last=Math.min(view.length, first+Math.ceil(listEl.clientHeight/ROW)+10);
+  rowsEl.style.transform=`translateY(${first*ROW}px)`;
+  let html='';
+  for(let i=first;i<last;i++){
+    const n=view[i];
+    html+=`<div class="row${n===selectedName?' sel':''}" data-i="${i}">${esc(n)}</div>`;
+  }
+  rowsEl.innerHTML=html;
+  document.getElementById('savedCount').innerText =
+    view===savedNames ? `${savedNames.length} saved` : `${view.length} / ${savedNames.length}`;
+}
+let filterTimer=null;
+filterEl.addEventListener('input',()=>{
+  clearTimeout(filterTimer);
+  filterTimer=setTimeout(()=>{ savedView=null; listEl.scrollTop=0; scheduleRender(); },120);
+});
+listEl.addEventListener('scroll',scheduleRender);
+rowsEl.addEventListener('click',e=>{
+  const r=e.target.closest('.row'); if(!r) return;
+  selectSaved(currentView()[+r.dataset.i]);
+});
+listEl.addEventListener('keydown',e=>{
+  if(e.key!=='ArrowDown' && e.key!=='ArrowUp') return;
+  e.preventDefault();
+  const view=currentView(); if(!view.length) return;
+  let i=selectedName===null ? -1 : view.indexOf(selectedName);
+  i=Math.min(view.length-1, Math.max(0, i+(e.key==='ArrowDown'?1:-1)));
+  if(i*ROW<listEl.scrollTop) listEl.scrollTop=i*ROW;
+  else if((i+1)*ROW>listEl.scrollTop+listEl.clientHeight) listEl.scrollTop=(i+1)*ROW-listEl.clientHeight;
+  selectSaved(view[i]);
+});
+
+document.getElementById('btnImport').onclick=()=>bridge.importItems(parseFloat(document.getElementById('dedupeM').value)||0);
+document.getElementById('btnExport').onclick=()=>bridge.exportItems();
+document.getElementById('btnBulkCancel').onclick=()=>bridge.cancelBulk();
+
+document.getElementById('btnNearest').onclick=()=>{
+  const p=marker.getLatLng();
+  bridge.nearest(p.lat, p.lng, 5, js=>{
+    const res=JSON.parse(js);
+    if(!res.length){ setStatus('No saved locations'); return; }
+    setStatus('Nearest: '+res.map(r=>`${r.name} (${r.dist_m<1000 ? r.dist_m+' m' : (r.dist_m/1000).toFixed(1)+' km'})`).join(', '));
+  });
+};
+
+// проигрывание маршрута
+let routeLine=null, routeDone=null, routePts=[], routePlaying=false, seeking=false;
+function routeConfig(){
+  const kmh=parseFloat(document.getElementById('routeSpeed').value)||50;
+  const hz=parseFloat(document.getElementById('routeRate').value)||5;
+  bridge.routeConfig(kmh, hz);
+}
+document.getElementById('btnRoute').onclick=()=>bridge.openRoute();
+document.getElementById('btnRoutePlay').onclick=()=>{
+  if(!routeLine) return;
+  if(routePlaying) bridge.routePause();
+  else { routeConfig(); bridge.routePlay(allDevices() ? "*" : "", spreadM()); }
+};
+const seekEl=document.getElementById('routeSeek');
+seekEl.addEventListener('input',()=>{ seeking=true; });
+seekEl.addEventListener('change',()=>{ seeking=false; bridge.routeSeek(seekEl.value/1000); });
+document.getElementById('routeLoop').addEventListener('change',e=>bridge.routeLoop(e.target.checked));
+document.getElementById('routeSpeed').addEventListener('change',routeConfig);
+document.getElementById('routeRate').addEventListener('change',routeConfig);
+
+// live drive: WASD/стрелки — поворот и газ, джойстик — курс и доля макс. скорости
+let driving=false, keyMs=null, driveKeys=new Set(), lastKeys='0,0';
+const stickEl=document.getElementById('stick'), knobEl=document.getElementById('stickKnob');
+const DRIVE_KEYS={w:'up',arrowup:'up',s:'down',arrowdown:'down',a:'left',arrowleft:'left',d:'right',arrowright:'right'};
+function driveConfig(){
+  return [parseFloat(document.getElementById('driveRate').value)||10,
+          parseFloat(document.getElementById('driveMax').value)||60];
+}
+function setDriving(on){
+  driving=on; keyMs=null; driveKeys.clear(); lastKeys='0,0';
+  document.getElementById('driveBtn').classList.toggle('on', on);
+  stickEl.style.display = on ? 'block' : 'none';
+  if(on){
+    const p=marker.getLatLng(), [hz,kmh]=driveConfig();
+    bridge.driveStart(p.lat, p.lng, 0, hz, kmh);
+    setStatus('Driving: WASD / arrows or the joystick');
+  } else {
+    bridge.driveStop();
+    document.getElementById('driveInfo').innerText='';
+  }
+}
+document.getElementById('driveBtn').onclick=()=>setDriving(!driving);
+['driveRate','driveMax'].forEach(id=>document.getElementById(id).addEventListener('change',()=>{
+  if(driving) bridge.driveConfig(...driveConfig());
+}));
+function sendKeys(){
+  const turn=(driveKeys.has('right')?1:0)-(driveKeys.has('left')?1:0);
+  const thr=(driveKeys.has('up')?1:0)-(driveKeys.has('down')?1:0);
+  const k=turn+','+thr;
+  if(k===lastKeys) return;            // автоповтор клавиш не шлём
+  lastKeys=k; bridge.driveKeys(turn, thr, performance.now());
+}
+function driveKey(e, down){
+  const k=DRIVE_KEYS[e.key.toLowerCase()];
+  if(!driving || !k || e.target.closest('input,textarea,#savedList')) return;
+  e.preventDefault();
+  if(down) driveKeys.add(k); else driveKeys.delete(k);
+  sendKeys();
+}
+document.addEventListener('keydown',e=>driveKey(e,true));
+document.addEventListener('keyup',e=>driveKey(e,false));
+window.addEventListener('blur',()=>{ if(driving){ driveKeys.clear(); sendKeys(); } });
+let stickId=null, stickQueued=false, stickVec=[0,0];
+function stickMove(e){
+  const r=stickEl.getBoundingClientRect(), R=r.width/2;
+  let dx=e.clientX-r.left-R, dy=e.clientY-r.top-R;
+  const len=Math.hypot(dx,dy);
+  if(len>R){ dx*=R/len; dy*=R/len; }
+  stickVec=[dx,dy];
+  knobEl.style.transform=`translate(${dx}px,${dy}px)`;
+  if(stickQueued) return;
+  // не чаще кадра: pointermove приходит заметно чаще
+  stickQueued=true;
+  requestAnimationFrame(()=>{
+    stickQueued=false;
+    if(stickId===null) return;
+    const [x,y]=stickVec;
+    bridge.driveStick((Math.atan2(x,-y)*180/Math.PI+360)%360, Math.hypot(x,y)/R, performance.now());
+  });
+}
+stickEl.addEventListener('pointerdown',e=>{ stickId=e.pointerId; stickEl.setPointerCapture(stickId); stickMove(e); });
+stickEl.addEventListener('pointermove',e=>{ if(e.pointerId===stickId) stickMove(e); });
+['pointerup','pointercancel'].forEach(t=>stickEl.addEventListener(t,e=>{
+  if(e.pointerId!==stickId) return;
+  stickId=null; knobEl.style.transform='';
+  bridge.driveStick(0, 0, performance.now());
+}));
+
+// офлайн-тайлы: докачка региона/коридора маршрута, статистика кэша
+function tileZooms(){
+  const a=parseInt(document.getElementById('tileZmin').value)||0;
+  const b=parseInt(document.getElementById('tileZmax').value)||a;
+  return [Math.min(a,b), Math.min(Math.max(a,b),19)];
+}
+document.getElementById('btnPrefetchView').onclick=()=>{
+  const b=map.getBounds(), [z0,z1]=tileZooms();
+  bridge.prefetchView(b.getSouth(), b.getWest(), b.getNorth(), b.getEast(), z0, z1);
+};
+document.getElementById('btnPrefetchRoute').onclick=()=>{
+  const [z0,z1]=tileZooms();
+  bridge.prefetchRoute(500, z0, z1);
+};
+document.getElementById('btnPrefetchCancel').onclick=()=>bridge.cancelPrefetch();
+setInterval(()=>{
+  if(!bridge) return;
+  bridge.tileStats(js=>{
+    const t=JSON.parse(js);
+    document.getElementById('tileInfo').innerText =
+      `${t.tiles} tiles, ${(t.bytes/1048576).toFixed(1)}/${(t.max_bytes/1048576).toFixed(0)} MB, hit ${(t.hit_rate*100).toFixed(0)}%`;
+  });
+}, 2000);
+
+// поиск: подсказки из локального индекса по мере ввода, Enter — полный поиск в Python
+const searchEl=document.getElementById('search'), suggestEl=document.getElementById('suggest');
+let suggestions=[], activeSug=-1, suggestTimer=null;
+function goTo(f){
+  map.setView([f.lat,f.lon],13); marker.setLatLng([f.lat,f.lon]);
+  setStatus(f.display||f.name);
+}
+function hideSuggest(){ suggestEl.style.display='none'; suggestions=[]; activeSug=-1; }
+function showSuggest(){
+  if(!suggestions.length){ hideSuggest(); return; }
+  suggestEl.innerHTML=suggestions.map((f,i)=>`<div data-i="${i}"${i===activeSug?' class="act"':''}>${esc(f.display||f.name)}</div>`).join('');
+  suggestEl.style.display='block';
+}
+searchEl.addEventListener('input',()=>{
+  clearTimeout(suggestTimer);
+  const q=searchEl.value.trim();
+  if(!q){ hideSuggest(); return; }
+  suggestTimer=setTimeout(()=>bridge.suggest(q, 8, js=>{
+    if(searchEl.value.trim()!==q) return;
+    suggestions=JSON.parse(js); activeSug=-1; showSuggest();
+  }), 80);
+});
+suggestEl.addEventListener('mousedown',e=>{
+  const d=e.target.closest('div[data-i]'); if(!d) return;
+  e.preventDefault(); const f=suggestions[+d.dataset.i];
+  searchEl.value=f.name; hideSuggest(); goTo(f);
+});
+searchEl.addEventListener('blur',()=>setTimeout(hideSuggest,150));
 document.getElementById('btnSearch').onclick=doSearch;
-document.getElementById('search').addEventListener('keydown',e=>{
-  if(e.key==='Enter') doSearch();
+searchEl.addEventListener('keydown',e=>{
+  if(e.key==='ArrowDown' || e.key==='ArrowUp'){
+    if(!suggestions.length) return;
+    e.preventDefault();
+    activeSug=(activeSug+(e.key==='ArrowDown'?1:-1)+suggestions.length)%suggestions.length;
+    showSuggest();
+  } else if(e.key==='Escape'){ hideSuggest(); }
+  else if(e.key==='Enter'){
+    if(activeSug>=0){ const f=suggestions[activeSug]; searchEl.value=f.name; hideSuggest(); goTo(f); }
+    else doSearch();
+  }
 });
 function doSearch(){
-  const q=document.getElementById('search').value.trim();
+  const q=searchEl.value.trim();
   if(!q) return;
+  hideSuggest();
   setStatus('Searching…');
-  fetch('https://nominatim.openstreetmap.org/search?format=json&q='+encodeURIComponent(q))
-    .then(r=>r.json())
-    .then(res=>{
-      if(!res.length){ setStatus('Nothing found'); return; }
-      const f=res[0], lat=parseFloat(f.lat), lon=parseFloat(f.lon);
-      map.setView([lat,lon],13); marker.setLatLng([lat,lon]);
-      setStatus(f.display_name);
-    }).catch(e=>setStatus('Search error: '+e));
+  bridge.search(q);
 }
 
 // ⚡ Авотелепорт по клику на сохранённую локацию
-document.getElementById('saved').addEventListener('change',()=>{
-  const sel=document.getElementById('saved'); if(!sel.value) return;
-  const obj=JSON.parse(sel.value);
-  marker.setLatLng([obj.lat,obj.lon]);
-  map.setView([obj.lat,obj.lon],13);
-  setStatus(`Selected: ${obj.name}`);
+function selectSaved(name){
+  const p=savedPos.get(name); if(!p) return;
+  selectedName=name; scheduleRender();
+  marker.setLatLng(p);
+  map.setView(p,13);
+  setStatus(`Selected: ${name}`);
   // сразу отправляем координаты в эмулятор
-  bridge.teleport(obj.lat, obj.lon, "");
-});
+  teleportTo(p[0], p[1]);
+}
 </script>
 </body>
 </html>
 """
 
+# ---------- Offline tiles (geotile: scheme) ----------
+def register_schemes():
+    # схемы регистрируются до создания QApplication
+    for name in (b"geotile", b"geoapp"):
+        sch = QWebEngineUrlScheme(name)
+        sch.setSyntax(QWebEngineUrlScheme.Syntax.Path)
+        sch.setFlags(QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.CorsEnabled)
+        QWebEngineUrlScheme.registerScheme(sch)
+
+class TileSchemeHandler(QWebEngineUrlSchemeHandler):
+    _done = Signal(object, object)
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(6, thread_name_prefix="tile-serve")
+        self._done.connect(self._reply)
+
+    def requestStarted(self, job):
+        # geotile:{z}/{x}/{y}.png — чтение/сеть в пуле, ответ в GUI-потоке
+        try:
+            z, x, y = (int(p) for p in job.requestUrl().path().removesuffix(".png").split("/")[-3:])
+        except ValueError:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlInvalid); return
+        self.pool.submit(self._load, job, z, x, y)
+
+    def _load(self, job, z, x, y):
+        with METRICS.timer("tile.load"):
+            data = self.cache.fetch(z, x, y)
+        self._done.emit(job, data)
+
+    def _reply(self, job, data):
+        try:
+            if data is None:
+                job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound); return
+            buf = QBuffer(job); buf.setData(QByteArray(data)); buf.open(QIODevice.ReadOnly)
+            job.reply(b"image/png", buf)
+        except RuntimeError:
+            pass        # страница уже отменила запрос
+
+def page_html(local_assets: bool) -> str:
+    # Leaflet из локальных файлов (geoapp:), пока их нет — с CDN
+    return HTML.replace("{{LEAFLET}}", "geoapp:leaflet/" if local_assets else LEAFLET_CDN)
+
+# ---------- Local assets (geoapp: scheme) ----------
+class AssetSchemeHandler(QWebEngineUrlSchemeHandler):
+    def __init__(self, root, parent=None):
+        super().__init__(parent)
+        self.root = root
+
+    def requestStarted(self, job):
+        found = read_asset(self.root, job.requestUrl().path())
+        if found is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound); return
+        mime, data = found
+        buf = QBuffer(job); buf.setData(QByteArray(data)); buf.open(QIODevice.ReadOnly)
+        job.reply(mime, buf)
+
+# ---------- Startup timing ----------
+class StartupTimer:
+    def __init__(self, t0: float):
+        self.t0 = t0
+        self.marks = {}
+
+    def mark(self, name: str):
+        self.marks.setdefault(name, round((time.perf_counter() - self.t0) * 1000.0, 1))
+
+    def write(self, path: Path, event: str):
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": time.time(), "event": event, "ms": self.marks}) + "\n")
+        except OSError:
+            pass
+
 # ---------- Header ----------
 class Header(QWidget):
     def __init__(self):
@@ -269,8 +1018,10 @@ class Header(QWidget):
 # ---------- Emulator Tab ----------
 class EmulatorTab(QWidget):
     devicesListed = Signal(str)
-    logSig   = Signal(str)
+    devicesChanged = Signal(object)     # снимок таблицы DeviceTracker (из его потока)
+    fleetSig = Signal(object)           # список экземпляров EmulatorFarm
     busySig  = Signal(bool)
+    progressSig = Signal(int, int)      # done, total; total <= 0 — неопределённый прогресс
     refreshSig = Signal()
 
     def __init__(self, main):
@@ -286,6 +1037,10 @@ class EmulatorTab(QWidget):
         row2 = QHBoxLayout()
         self.avdEdit = QLineEdit(AVD_NAME)
         row2.addWidget(QLabel("AVD name:")); row2.addWidget(self.avdEdit, 1)
+        self.profileCombo = QComboBox(); self.profileCombo.addItems(PROFILE_NAMES)
+        self.profileCombo.setCurrentText(LAUNCH_PROFILE if LAUNCH_PROFILE in PROFILE_NAMES else "auto")
+        self.profileCombo.setToolTip("Launch profile: -cores/-memory/-gpu, window, boot animation, snapshots")
+        row2.addWidget(QLabel("Profile:")); row2.addWidget(self.profileCombo)
 
         self.layout().addLayout(row1); self.layout().addLayout(row2)
 
@@ -305,9 +1060,26 @@ class EmulatorTab(QWidget):
         devRow.addWidget(QLabel("ADB devices:")); devRow.addWidget(self.deviceCombo, 1)
         self.layout().addLayout(devRow)
 
+        # ферма: клоны шаблонного AVD, каждый на своей паре портов
+        fleetRow = QHBoxLayout()
+        self.fleetSpin = QSpinBox(); self.fleetSpin.setRange(1, (LAST_PORT - FIRST_PORT) // 2 + 1); self.fleetSpin.setValue(2)
+        self.btnFleetStart = QPushButton("Start fleet")
+        self.btnFleetStop  = QPushButton("Stop fleet")
+        for b in [self.btnFleetStart, self.btnFleetStop]: b.setCursor(Qt.PointingHandCursor)
+        fleetRow.addWidget(QLabel("Fleet (clones of AVD):")); fleetRow.addWidget(self.fleetSpin)
+        fleetRow.addWidget(self.btnFleetStart); fleetRow.addWidget(self.btnFleetStop); fleetRow.addStretch(1)
+        self.layout().addLayout(fleetRow)
+        self.fleetTable = QTableWidget(0, 8)
+        self.fleetTable.setHorizontalHeaderLabels(["AVD", "Serial", "Ports", "State", "PID", "CPU %", "RAM MB", "Boot s"])
+        self.fleetTable.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.fleetTable.verticalHeader().setVisible(False); self.fleetTable.setMaximumHeight(170)
+        self.fleetTable.setEditTriggers(QTableWidget.NoEditTriggers); self.fleetTable.setVisible(False)
+        self.layout().addWidget(self.fleetTable)
+
         self.progress = QProgressBar(); self.progress.setRange(0,0); self.progress.setVisible(False)
         self.layout().addWidget(self.progress)
-        self.log = QTextEdit(); self.log.setReadOnly(True)
+        self.log = QPlainTextEdit(); self.log.setReadOnly(True)
+        self.log.setMaximumBlockCount(LOG_MAX_LINES)
         self.log.setStyleSheet("background:#0b0f14; color:#cfe0ff; border:1px solid #1b2230;")
         self.layout().addWidget(self.log, 1)
 
@@ -317,9 +1089,21 @@ class EmulatorTab(QWidget):
         self.btnStop.clicked.connect(self.stop_emulator)
         self.btnPlay.clicked.connect(self.open_play_store)
         self.btnList.clicked.connect(self.list_devices)
-
-        self.logSig.connect(self._append_log_main)
+        self.btnFleetStart.clicked.connect(self.start_fleet)
+        self.btnFleetStop.clicked.connect(self.stop_fleet)
+        self.fleetSig.connect(self._fleet_main)
+        self.fleetTimer = QTimer(self); self.fleetTimer.setInterval(2000)
+        self.fleetTimer.timeout.connect(lambda: self.main.farm and self._fleet_main(self.main.farm.sample()))
+        self.fleetTimer.start()
+
+        # рабочие потоки пишут в буфер, окно обновляется пачками по таймеру
+        self.logbuf = LogBuffer(LOG_MAX_LINES, LOG_FILE)
+        self._progressLine = False
+        self.logTimer = QTimer(self); self.logTimer.setInterval(1000 // LOG_FLUSH_HZ)
+        self.logTimer.timeout.connect(self._flush_log); self.logTimer.start()
         self.busySig.connect(self._set_busy_main)
+        self.progressSig.connect(self._set_progress_main)
+        self.devicesChanged.connect(self._devices_main)
         self.refreshSig.connect(self.refresh_buttons_state)
 
         self.refresh_buttons_state()
@@ -328,130 +1112,216 @@ class EmulatorTab(QWidget):
         return Path(self.sdkEdit.text().strip())
 
     # --- thread-safe UI helpers
-    def append_log(self, s: str): self.logSig.emit(s)
-    def _append_log_main(self, s: str):
-        self.log.append(s); self.log.moveCursor(QTextCursor.End)
+    def append_log(self, s: str): self.logbuf.write_text(s)
+    def _flush_log(self):
+        items, dropped = self.logbuf.drain()
+        if not items and not dropped:
+            return
+        bar = self.log.verticalScrollBar(); at_end = bar.value() >= bar.maximum() - 4
+        cur = QTextCursor(self.log.document()); cur.beginEditBlock()
+        if dropped:
+            self._write_block(cur, f"[... {dropped} lines dropped ...]", False); self._progressLine = False
+        for text, kind in items:
+            replace = kind != LINE and self._progressLine
+            self._write_block(cur, text, replace)
+            self._progressLine = kind == PROGRESS
+        cur.endEditBlock()
+        if at_end:
+            bar.setValue(bar.maximum())
+    def _write_block(self, cur, text, replace):
+        cur.movePosition(QTextCursor.End)
+        if replace:
+            cur.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+        elif not self.log.document().isEmpty():
+            cur.insertBlock()
+        cur.insertText(text)
     def set_busy(self, busy: bool): self.busySig.emit(busy)
     def _set_busy_main(self, busy: bool):
-        self.progress.setVisible(busy)
-        for w in [self.btnInstall, self.btnCreate, self.btnStart, self.btnStop, self.btnPlay, self.btnList, self.sdkEdit, self.avdEdit]:
+        self.progress.setRange(0,0); self.progress.setVisible(busy)
+        for w in [self.btnInstall, self.btnCreate, self.btnStart, self.btnStop, self.btnPlay, self.btnList, self.sdkEdit, self.avdEdit,
+                  self.profileCombo]:
             w.setEnabled(not busy)
-    def run_threaded(self, fn): threading.Thread(target=fn, daemon=True).start()
+    def set_progress(self, done: int, total: int): self.progressSig.emit(done, total)
+    def _set_progress_main(self, done: int, total: int):
+        if total <= 0:
+            self.progress.setRange(0,0); return
+        # байты могут не влезть в int QProgressBar — показываем в промилле
+        self.progress.setRange(0,1000); self.progress.setValue(min(1000, done * 1000 // total))
+    def run_threaded(self, fn, op: str = ""):
+        # долгие задачи вкладки — спаны emu.* в метриках
+        def run():
+            with METRICS.timer("emu." + (op or "task")):
+                fn()
+        threading.Thread(target=run, daemon=True).start()
 
     def refresh_buttons_state(self):
-        sdk_ok = (self.sdkRoot() / "emulator" / "emulator.exe").exists()
+        sdk_ok = toolchain(self.sdkRoot()).has("emulator")
         avd_ok = (DEFAULT_AVD / f"{self.avdEdit.text().strip() or AVD_NAME}.avd").exists()
         self.btnInstall.setEnabled(not sdk_ok)
         self.btnCreate.setEnabled(sdk_ok and not avd_ok)
 
     # --- wait for device
-    def _wait_for_device(self, sdk, serial: str, timeout_sec: int = 120) -> bool:
-        env = sdk_env(sdk); adb = adb_path(sdk)
-        try:
-            subprocess.run([adb, "-s", serial, "wait-for-device"], env=env, text=True, timeout=timeout_sec)
-        except subprocess.TimeoutExpired:
-            return False
-        try:
-            out = run_check([adb, "-s", serial, "get-state"], env=env)
-            return (out.stdout or "").strip() == "device"
-        except Exception:
-            return False
+    def _wait_for_device(self, serial: str, timeout_sec: int = 120) -> bool:
+        with METRICS.timer("adb.wait_device", serial) as span:
+            ok = self.main.tracker.wait_for(serial, "device", timeout_sec)
+            if not ok: span.fail("timeout")
+        return ok
+
+    # --- live device list (DeviceTracker)
+    def _devices_main(self, snap):
+        online = [d["serial"] for d in snap if d["state"] == "device"]
+        cur = self.deviceCombo.currentText()
+        self.deviceCombo.clear(); self.deviceCombo.addItems(online)
+        if cur in online:
+            self.deviceCombo.setCurrentText(cur)
+        target = self.main.adbTarget.text().strip()
+        if target not in online:
+            first = next((s for s in online if s.startswith("emulator-")), "")
+            if first or not target:
+                self.main.adbTarget.setText(first)
 
     # --- actions
     def install_sdk(self):
         def work():
             self.set_busy(True); self.append_log("Installing SDK...")
             try:
-                url = "https://dl.google.com/android/repository/commandlinetools-win-11076708_latest.zip"
                 sdk = self.sdkRoot()
                 cmdtools = sdk / "cmdline-tools" / "latest"
                 cmdtools.parent.mkdir(parents=True, exist_ok=True)
-                sdkmanager = cmdtools / "bin" / "sdkmanager.bat"
+                sdkmanager = expected_path(sdk, "sdkmanager")
+                cache = PackageCache(PKG_CACHE)
 
                 if not sdkmanager.exists():
-                    self.append_log("Downloading commandlinetools...")
-                    import urllib.request, zipfile, shutil
-                    zip_path = sdk / "commandlinetools.zip"
-                    with urllib.request.urlopen(url) as r, open(zip_path, "wb") as f: f.write(r.read())
+                    import zipfile, shutil
+                    try:
+                        info = archive_info(CMDLINE_TOOLS_ZIP)
+                    except Exception as e:
+                        info = None; self.append_log(f"[!] Repository manifest unavailable ({e})")
+                    if info is None:
+                        self.append_log("[!] No published checksum, download will not be verified.")
+                    self.append_log(f"Downloading {CMDLINE_TOOLS_ZIP}...")
+                    zip_path = cache.fetch(CMDLINE_TOOLS_ZIP, REPO_BASE, info,
+                                           on_progress=self.set_progress)
+                    self.set_progress(0, 0)
                     with zipfile.ZipFile(zip_path, 'r') as z:
                         tmp = sdk / "_tmp_cmdline"; shutil.rmtree(tmp, ignore_errors=True); z.extractall(tmp)
                         inner = tmp / "cmdline-tools"; shutil.rmtree(cmdtools, ignore_errors=True); shutil.move(str(inner), str(cmdtools))
                         shutil.rmtree(tmp, ignore_errors=True)
-                    zip_path.unlink(missing_ok=True)
+                    make_executable(cmdtools)
+                    invalidate(sdk)
                     self.append_log("commandlinetools installed.")
 
                 env = sdk_env(sdk)
 
-                # update
-                args = [str(sdkmanager), "--sdk_root="+str(sdk), "--update"]
-                self.append_log("> " + " ".join(args))
-                p = run_popen(args, env=env)
-                for line in p.stdout: self.append_log(line.rstrip())
-
-                # accept licenses
-                self.append_log("> Accepting licenses...")
-                p = subprocess.Popen([str(sdkmanager), "--sdk_root="+str(sdk), "--licenses"],
-                                     env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-                try:
-                    out,_ = p.communicate(input=("y\n"*50), timeout=240); self.append_log(out or "")
-                except subprocess.TimeoutExpired:
-                    p.kill(); self.append_log("[!] License acceptance timeout, try again if needed.")
-
-                # install packages
-                for pkg in ["platform-tools","emulator",SYSTEM_IMAGE]:
-                    args = [str(sdkmanager), "--sdk_root="+str(sdk), pkg]
-                    self.append_log("> " + " ".join(args))
-                    p = run_popen(args, env=env)
-                    for line in p.stdout: self.append_log(line.rstrip())
-
-                self.append_log("SDK install finished.")
+                # пакеты: уже установленные пропускаем, из кэша распаковываем, остальное — одним вызовом
+                todo = []
+                for pkg in SDK_PACKAGES:
+                    if is_installed(sdk, pkg):
+                        self.append_log(f"{pkg}: already installed")
+                    elif cache.restore(pkg, sdk):
+                        self.append_log(f"{pkg}: restored from {PKG_CACHE}")
+                    else:
+                        todo.append(pkg)
+                if todo:
+                    rc = sdkmanager_install(sdkmanager, sdk, todo, env=env, on_line=self.append_log,
+                                            on_percent=lambda pct: self.set_progress(pct, 100))
+                    self.set_progress(0, 0)
+                    missing = [p for p in todo if not is_installed(sdk, p)]
+                    if rc != 0 or missing:
+                        raise RuntimeError(f"sdkmanager exited with {rc}; not installed: {', '.join(missing) or '-'}")
+                    if PKG_CACHE_STORE:
+                        for pkg in todo:
+                            self.append_log(f"Caching {pkg}..."); cache.store(pkg, sdk)
+
+                invalidate(sdk)
+                tc = toolchain(sdk)
+                self.append_log("SDK install finished: " + ", ".join(f"{k} {v}" for k, v in tc.versions.items() if v))
             except Exception as e:
                 self.append_log(f"[ERROR] {e}")
             finally:
+                self.main.tracker.kick()            # adb мог появиться — трекер подключается сразу
                 self.set_busy(False); self.refreshSig.emit()
-        self.run_threaded(work)
+        self.run_threaded(work, "install_sdk")
 
     def create_avd(self):
         def work():
             self.set_busy(True); self.append_log("Creating AVD...")
             try:
                 sdk = self.sdkRoot(); env = sdk_env(sdk)
-                avdmanager = sdk / "cmdline-tools" / "latest" / "bin" / "avdmanager.bat"
-                args = [str(avdmanager), "--verbose", "create", "avd",
+                avdmanager = toolchain(sdk).require("avdmanager")
+                args = [avdmanager, "--verbose", "create", "avd",
                         "-n", self.avdEdit.text().strip() or AVD_NAME,
                         "-k", SYSTEM_IMAGE, "--device", DEVICE_NAME]
                 self.append_log("> " + " ".join(args))
                 p = run_popen(args, env=env)
-                for line in p.stdout: self.append_log(line.rstrip())
+                pump(p.stdout, self.logbuf.write)
                 self.append_log("AVD created.")
             except Exception as e:
                 self.append_log(f"[ERROR] {e}")
             finally:
                 self.set_busy(False); self.refreshSig.emit()
-        self.run_threaded(work)
+        self.run_threaded(work, "create_avd")
+
+    def _plan(self, emu, instances: int = 1):
+        # зонд хоста кэшируется (в памяти и в DEFAULT_ROOT) — повторный старт его не повторяет
+        plan = make_plan(self.profileCombo.currentText(),
+                         probe_host(emu, DEFAULT_ROOT / HOST_CACHE), instances)
+        self.append_log(f"Profile {plan['profile']}: {plan['cores']} cores, {plan['memory_mb']} MB, "
+                        f"gpu {plan['gpu']}{'' if plan['window'] else ', no window'}")
+        for n in plan["notes"]:
+            self.append_log(f"  [!] {n}")
+        return plan
 
     def start_emulator(self):
         def work():
             self.set_busy(True); self.append_log("Starting emulator...")
+            serial = "emulator-5554"; rec = None
             try:
                 sdk = self.sdkRoot(); env = sdk_env(sdk); emu = emulator_path(sdk)
                 avd = self.avdEdit.text().strip() or AVD_NAME
-                args = [emu, "-avd", avd, "-netdelay", "none", "-netspeed", "full", "-gpu", "host"]
-                self.append_log("> " + " ".join(args))
-                subprocess.Popen(args, env=env, creationflags=subprocess.DETACHED_PROCESS)
-                self.append_log("Start command sent. Waiting for ADB...")
-                serial = "emulator-5554"
-                if self._wait_for_device(sdk, serial, timeout_sec=180):
-                    self.append_log(f"Device {serial} is online.")
-                    self.main.adbTarget.setText(serial)
-                    self.deviceCombo.clear(); self.deviceCombo.addItem(serial)
+                plan = self._plan(emu)
+                snaps = SnapshotManager(DEFAULT_AVD, sdk)
+                changed = apply_config(snaps.avd_dir(avd), plan)
+                if changed:
+                    # снимок сделан с другими ядрами/RAM/GPU — восстановить его нельзя
+                    self.append_log(f"config.ini updated: {', '.join(changed)}")
+                    snaps.invalidate(avd)
+                if plan["snapshot"] == "none":
+                    quick, snap_args = False, []
                 else:
+                    quick, snap_args = snaps.launch_args(avd)
+                args = [emu, "-avd", avd, *plan["args"], *(a for a in snap_args if a not in plan["args"])]
+                self.append_log("> " + " ".join(args))
+                t0 = time.monotonic()
+                # до готовности системы geo fix ждёт (send_fix), а не теряется
+                self.main.boot_started(serial, t0)
+                proc = subprocess.Popen(args, env=env, **detached())
+                rec = ResourceRecorder(proc.pid, plan, PROFILE_STATS, avd).start()
+                self.append_log((f"Quick boot from snapshot '{snaps.name}'." if quick else "Cold boot.")
+                                + " Waiting for ADB...")
+                if not self._wait_for_device(serial, timeout_sec=180):
                     self.append_log("[!] Device didn't come online in time. Use 'List ADB Devices' and retry.")
+                    return
+                self.append_log(f"Device {serial} is online ({(time.monotonic() - t0):.1f} s).")
+                res = wait_ready(lambda: AdbShell(adb_path(sdk), serial, env), t0=t0, timeout=300,
+                                 on_phase=lambda name, ms: self.append_log(f"  {name}: {ms / 1000:.1f} s"))
+                if not res["ready"]:
+                    self.append_log("[!] System didn't finish booting in time.")
+                    return
+                self.main.boot_ready(serial)
+                self.append_log(f"Ready for location updates in {res['total_ms'] / 1000:.1f} s.")
+                if not quick and plan["snapshot"] != "none":
+                    self.append_log(f"Saving snapshot '{snaps.name}' for quick boot...")
+                    self.append_log(f"Snapshot saved in {snaps.save(avd, serial):.1f} s.")
+                # дальше — установившийся режим; итог пишется в PROFILE_STATS через минуту
+                rec.ready(res["total_ms"] / 1000.0); rec = None
             except Exception as e:
                 self.append_log(f"[ERROR] {e}")
             finally:
+                if rec is not None: rec.stop()
+                self.main.boot_ready(serial)
                 self.set_busy(False)
-        self.run_threaded(work)
+        self.run_threaded(work, "start_emulator")
 
     def stop_emulator(self):
         def work():
@@ -459,18 +1329,80 @@ class EmulatorTab(QWidget):
             try:
                 sdk = self.sdkRoot(); env = sdk_env(sdk); adb = adb_path(sdk)
                 serial = self.main.adbTarget.text().strip() or "emulator-5554"
+                self.main.consoles.forget(serial)
                 out = run_check([adb, "-s", serial, "emu", "kill"], env=env)
                 self.append_log(out.stdout or out.stderr or "Kill sent.")
-                try:
-                    subprocess.run([adb, "-s", serial, "wait-for-disconnect"], env=env, text=True, timeout=25)
+                tr = self.main.tracker
+                gone = tr.wait_for(serial, None, 25) if tr.connected else False
+                if not tr.connected:
+                    # трекер без adb-сервера держит пустую таблицу — она ничего не говорит; спросим adb
+                    gone, deadline = False, time.monotonic() + 25
+                    while not gone and time.monotonic() < deadline:
+                        gone = serial not in parse_devices(run_check([adb, "devices"], env=env).stdout or "")
+                        if not gone: time.sleep(0.5)
+                if gone:
                     self.append_log("Emulator disconnected.")
-                except subprocess.TimeoutExpired:
+                else:
                     self.append_log("[!] Timeout waiting for disconnect. If UI still running, close the window manually.")
             except Exception as e:
                 self.append_log(f"[ERROR] {e}")
             finally:
                 self.set_busy(False)
-        self.run_threaded(work)
+        self.run_threaded(work, "stop_emulator")
+
+    # --- fleet
+    def _farm(self, plan) -> EmulatorFarm:
+        if self.main.farm is None:
+            sdk = self.sdkRoot(); env = sdk_env(sdk)
+            def ready(serial, timeout):
+                t0 = time.monotonic()
+                return self.main.tracker.wait_for(serial, "device", timeout) and \
+                    wait_ready(lambda: AdbShell(adb_path(sdk), serial, env), t0=t0, timeout=timeout)["ready"]
+            self.main.farm = EmulatorFarm(emulator_path(sdk), DEFAULT_AVD, env, ready=ready, extra_args=plan["args"],
+                                          parallel=max_parallel(plan["cores"], plan["memory_mb"]))
+            self.main.farm.subscribe(self.fleetSig.emit)
+            self.fleetRec = FleetRecorder(plan, PROFILE_STATS)
+            self.main.farm.subscribe(self.fleetRec)
+            self.append_log(f"Fleet: up to {self.main.farm.parallel} emulators boot in parallel on this host.")
+        return self.main.farm
+
+    def _fleet_main(self, instances):
+        t = self.fleetTable; t.setVisible(bool(instances)); t.setRowCount(len(instances))
+        for r, i in enumerate(instances):
+            vals = [i["name"], i["serial"] or "", f"{i['console']},{i['adb']}" if i["console"] else "",
+                    i["state"] + (f" ({i['error']})" if i["error"] else ""), i["pid"] or "",
+                    "" if i["cpu"] is None else i["cpu"], "" if i["rss_mb"] is None else i["rss_mb"],
+                    "" if i["boot_s"] is None else i["boot_s"]]
+            for c, v in enumerate(vals):
+                t.setItem(r, c, QTableWidgetItem(str(v)))
+
+    def start_fleet(self):
+        template = self.avdEdit.text().strip() or AVD_NAME; n = self.fleetSpin.value()
+        def work():
+            try:
+                # профиль считается под размер флота; клоны получают те же ключи config.ini
+                plan = self._plan(emulator_path(self.sdkRoot()), n)
+                farm = self._farm(plan)
+                farm.extra_args = plan["args"]; self.fleetRec.plan = plan
+                names = farm.clones(template, n)
+                for name in names:
+                    apply_config(DEFAULT_AVD / f"{name}.avd", plan)
+                self.append_log(f"Fleet: starting {', '.join(names)}")
+                for name, fut in farm.start(names).items():
+                    fut.add_done_callback(lambda f, name=name: self.append_log(
+                        f"Fleet: {name} {'ready' if not f.exception() and f.result() else 'failed'}"))
+            except Exception as e:
+                self.append_log(f"[ERROR] {e}")
+        self.run_threaded(work, "start_fleet")
+
+    def stop_fleet(self):
+        farm = self.main.farm
+        if farm is None:
+            return
+        def work():
+            names = farm.stop_all()
+            self.append_log(f"Fleet: stopped {len(names)} emulator(s).")
+        self.run_threaded(work, "stop_fleet")
 
     def open_play_store(self):
         def work():
@@ -481,53 +1413,144 @@ class EmulatorTab(QWidget):
             self.append_log("> " + " ".join(args))
             out = run_check(args, env=env)
             self.append_log(out.stdout or out.stderr or "Launched.")
-        self.run_threaded(work)
+        self.run_threaded(work, "open_play_store")
 
     def list_devices(self):
-        def work():
-            sdk = self.sdkRoot(); env = sdk_env(sdk); adb = adb_path(sdk)
-            out = run_check([adb, "devices"], env=env)
-            self.append_log(out.stdout or out.stderr or "")
-            self.deviceCombo.clear()
-            first = ""
-            if out.stdout:
-                for line in out.stdout.splitlines():
-                    if "\tdevice" in line:
-                        dev = line.split("\t")[0]
-                        self.deviceCombo.addItem(dev)
-                        if not first and dev.startswith("emulator-"):
-                            first = dev
-            if first:
-                self.main.adbTarget.setText(first)
-        self.run_threaded(work)
+        # таблица уже в памяти (track-devices); adb запускаем, только если сервер не отвечает
+        tr = self.main.tracker
+        if not tr.connected:
+            def work():
+                sdk = self.sdkRoot(); out = run_check([adb_path(sdk), "devices"], env=sdk_env(sdk))
+                self.append_log(out.stdout or out.stderr or "")
+            self.run_threaded(work, "list_devices"); return
+        snap = tr.snapshot()
+        self.append_log("List of devices attached" + "".join(
+            f"\n{d['serial']}\t{d['state']}" + (f"\tconsole {d['port']}" if d["port"] else "") for d in snap))
+        self._devices_main(snap)
 
 # ---------- Map Tab ----------
-class MapTab(QWebEngineView):
+class MapTab(QWidget):
+    # QWebEngineView создаётся при первом открытии вкладки (или прогревом после старта)
     def __init__(self, main):
         super().__init__()
         self.main = main
+        self.view = None; self.bridge = None; self.tileHandler = None
+        lay = QVBoxLayout(self); lay.setContentsMargins(0,0,0,0)
+        self.placeholder = QLabel("Loading map…"); self.placeholder.setAlignment(Qt.AlignCenter)
+        lay.addWidget(self.placeholder)
+
+    def ensure_view(self):
+        if self.view is not None:
+            return
+        self.main.startup.mark("map_open")
+        from PySide6.QtWebEngineWidgets import QWebEngineView
+        from PySide6.QtWebChannel import QWebChannel
+        main = self.main
+        main.map_services()
+
         profile = QWebEngineProfile.defaultProfile()
         cache_dir = str((DEFAULT_ROOT / "map_cache").resolve())
         profile.setCachePath(cache_dir)
         profile.setPersistentStoragePath(cache_dir)
-
-        self.channel = QWebChannel(self.page())
+        self.tileHandler = TileSchemeHandler(main.tiles, self)
+        profile.installUrlSchemeHandler(b"geotile", self.tileHandler)
+        assets = find_assets(ASSET_CACHE)
+        if assets is not None:
+            self.assetHandler = AssetSchemeHandler(assets, self)
+            profile.installUrlSchemeHandler(b"geoapp", self.assetHandler)
+        else:
+            # в этот раз Leaflet с CDN, в фоне кладём копию для следующих запусков
+            threading.Thread(target=lambda: download_leaflet(ASSET_CACHE), daemon=True).start()
+
+        self.view = QWebEngineView(self)
+        self.channel = QWebChannel(self.view.page())
         self.bridge = Bridge(main)
         self.channel.registerObject("bridge", self.bridge)
-        self.page().setWebChannel(self.channel)
+        self.view.page().setWebChannel(self.channel)
+        self.view.setHtml(page_html(assets is not None), QUrl("https://local.content/"))
+
+        self.layout().replaceWidget(self.placeholder, self.view)
+        self.placeholder.deleteLater()
+        main.startup.mark("map_view")
+
+# ---------- Metrics Tab ----------
+class MetricsTab(QWidget):
+    COLUMNS = ["Operation", "Device", "Count", "Errors", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Last error"]
 
-        self.setHtml(HTML, QUrl("https://local.content/"))
+    def __init__(self, main):
+        super().__init__()
+        self.main = main
+        lay = QVBoxLayout(self); lay.setContentsMargins(12,12,12,12); lay.setSpacing(10)
+        row = QHBoxLayout()
+        self.btnJsonl = QPushButton("Export JSON lines…")
+        self.btnTrace = QPushButton("Export Chrome trace…")
+        self.btnReset = QPushButton("Reset")
+        for b in [self.btnJsonl, self.btnTrace, self.btnReset]:
+            b.setCursor(Qt.PointingHandCursor); row.addWidget(b)
+        row.addStretch(1)
+        self.info = QLabel(""); row.addWidget(self.info)
+        lay.addLayout(row)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        lay.addWidget(self.table, 1)
+
+        self.btnJsonl.clicked.connect(lambda: self.export("JSON lines (*.jsonl)", METRICS.export_jsonl))
+        self.btnTrace.clicked.connect(lambda: self.export("Chrome trace (*.json)", METRICS.export_chrome_trace))
+        self.btnReset.clicked.connect(lambda: (METRICS.reset(), self.refresh()))
+        # перерисовка раз в секунду и только когда вкладка видна
+        self.timer = QTimer(self); self.timer.setInterval(1000)
+        self.timer.timeout.connect(lambda: self.isVisible() and self.refresh())
+        self.timer.start()
+
+    def refresh(self):
+        snap = METRICS.snapshot()
+        t = self.table; t.setRowCount(len(snap))
+        for r, m in enumerate(snap):
+            vals = [m["op"], m["device"], m["count"], m["errors"], m["p50"], m["p95"], m["p99"], m["max"],
+                    m["last_error"]]
+            for c, v in enumerate(vals):
+                t.setItem(r, c, QTableWidgetItem("" if v is None else str(v)))
+        wd = self.main.watchdog
+        self.info.setText(f"GUI stalls > {STALL_MS:.0f} ms: {wd.stalls}" if wd is not None
+                          else "GUI stall watchdog off (GEOCHANGE_STALL_MS)")
+
+    def export(self, filt, fn):
+        path, _ = QFileDialog.getSaveFileName(self, "Export metrics", "", filt)
+        if not path:
+            return
+        try:
+            fn(path); self.main.emu.append_log(f"Metrics exported to {path}")
+        except OSError as e:
+            self.main.emu.append_log(f"[ERROR] {e}")
 
 # ---------- Main ----------
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         ensure_dirs()
+        self.startup = StartupTimer(_T0)
+        self.startup.marks["imports"] = round((_T_IMPORTS - _T0) * 1000.0, 1)
+        # ядро без Qt: устройства, телепорт, хранилище (то же, что у CLI и демона)
+        self.core = Core(sdk_root=self.sdkRoot, log=lambda msg: self.emu.append_log(msg))
+        self.store, self.consoles, self.tracker, self.teleports = \
+            self.core.store, self.core.consoles, self.core.tracker, self.core.teleports
+        self.send_fix = self.core.send_fix
+        self.boot_started, self.boot_ready = self.core.boot_started, self.core.boot_ready
+        self.feed = ChangeFeed(self.store)
+        # сервисы карты (индекс, тайлы, геокодер) поднимаются вместе с MapTab
+        self.spatial = self.tiles = self.geocoder = self.prefetcher = None
+        self.farm = None
+        self.watchdog = None
+        self.tracker.subscribe(lambda snap, changes: self.emu.devicesChanged.emit(snap))
         self.setWindowTitle(APP_TITLE)
         self.resize(1220, 820)
         self.setStyleSheet("""
             QMainWindow { background:#0b0f14; color:#e6eefc; }
-            QLabel, QLineEdit, QComboBox, QTextEdit { color:#e6eefc; }
+            QLabel, QLineEdit, QComboBox, QPlainTextEdit { color:#e6eefc; }
             QLineEdit, QComboBox { background:#0f1722; border:1px solid #1b2230; border-radius:8px; padding:6px; }
             QPushButton { background:#152034; border:1px solid #24324b; padding:9px 12px; border-radius:10px; color:#e6eefc; }
             QPushButton:hover { background:#1a2842; }
@@ -543,22 +1566,89 @@ class MainWindow(QMainWindow):
 
         self.tabs = QTabWidget(); v.addWidget(self.tabs, 1)
         self.emu = EmulatorTab(self); self.tabs.addTab(self.emu, "Emulator Manager")
+        if self.store.legacy_error:
+            self.emu.append_log(f"[!] {self.store.legacy_error} (will retry on next start)")
         self.mapTab = MapTab(self); self.tabs.addTab(self.mapTab, "Location Spoofer")
+        self.metricsTab = MetricsTab(self); self.tabs.addTab(self.metricsTab, "Metrics")
+        self.tabs.currentChanged.connect(self._tab_changed)
 
         # скрытое поле: текущая ADB-цель
         self.adbTarget = QLineEdit(); self.adbTarget.setVisible(False)
 
         self.setCentralWidget(wrapper)
 
-        # Автосписок устройств после запуска, чтобы target был задан
-        QTimer.singleShot(400, self.emu.list_devices)
+        # живой список устройств (adb track-devices); target выставляется из него
+        self.core.start()
+
+        if STALL_MS > 0:
+            # пульс из GUI-потока; зависание дольше STALL_MS — стек в метрики и лог
+            self.watchdog = StallWatchdog(threading.get_ident(), STALL_MS,
+                on_stall=lambda info: self.emu.append_log(
+                    f"[stall] GUI thread blocked {info['ms']:.0f} ms: {'; '.join(info['hot'][:2])}")).start()
+            self.stallTimer = QTimer(self); self.stallTimer.setInterval(max(10, int(STALL_MS // 4)))
+            self.stallTimer.timeout.connect(self.watchdog.beat); self.stallTimer.start()
 
     def sdkRoot(self) -> Path:
         return self.emu.sdkRoot()
 
+    def map_services(self):
+        if self.spatial is not None:
+            return
+        self.spatial = SpatialIndex(); self.spatial.load(self.store.items())
+        self.store.subscribe(self.spatial.apply)
+        self.tiles = TileCache(TILE_CACHE, TILE_CACHE_MB << 20)
+        self.prefetcher = Prefetcher(self.tiles)
+        self.geocoder = Geocoder(GEOCODER_DIR, GEOCODER_CACHE,
+                                 remote=os.environ.get("GEOCHANGE_GEOCODER_REMOTE", "1") != "0")
+
+    def _tab_changed(self, i):
+        if self.tabs.widget(i) is self.mapTab and self.mapTab.view is None:
+            # даём вкладке отрисовать заглушку, затем поднимаем WebEngine
+            QTimer.singleShot(0, self.mapTab.ensure_view)
+
+    def first_paint(self):
+        self.startup.mark("window")
+        self.report_startup("window")
+        if PREWARM_MAP:
+            QTimer.singleShot(1500, self.mapTab.ensure_view)
+
+    def report_startup(self, event: str):
+        m = self.startup.marks
+        parts = [f"{k} {v:.0f} ms" for k, v in m.items()]
+        if event == "map" and "map_open" in m:
+            parts.append(f"map open→ready {m['map_ready'] - m['map_open']:.0f} ms")
+        self.emu.append_log("Startup: " + ", ".join(parts))
+        self.startup.write(STARTUP_LOG, event)
+
+    def devices(self):
+        c = self.emu.deviceCombo
+        return [c.itemText(i) for i in range(c.count())]
+
+    def closeEvent(self, e):
+        if self.mapTab.bridge is not None:
+            self.mapTab.bridge.player.close()
+            self.mapTab.bridge.driveStop()
+            self.mapTab.tileHandler.pool.shutdown(wait=False, cancel_futures=True)
+        if self.farm is not None:
+            self.farm.shutdown()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        self.core.close()
+        self.emu.logbuf.close()
+        if self.tiles is not None:
+            self.prefetcher.cancel()
+            self.tiles.close()
+            self.geocoder.close()
+        super().closeEvent(e)
+
 def main():
+    register_schemes()
+    # WebEngine импортируется позже, уже после создания QApplication
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     win = MainWindow(); win.show()
+    win.startup.mark("shown")
+    QTimer.singleShot(0, win.first_paint)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+# geochange_assets.py
+# Local web assets for the map page (Leaflet). Ищем рядом с приложением
+# (assets/leaflet, кладётся в сборку через --add-data), затем в кэше DEFAULT_ROOT;
+# если файлов нет — один раз скачиваем с unpkg с проверкой SRI-хэшей.
+
+import base64, hashlib, sys, urllib.request
+from pathlib import Path
+
+LEAFLET_VERSION = "1.9.4"
+LEAFLET_CDN = f"https://unpkg.com/leaflet@{LEAFLET_VERSION}/dist/"
+# имя файла -> sha256 (base64, как в integrity=) или None для картинок
+LEAFLET_FILES = {
+    "leaflet.js":  "20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=",
+    "leaflet.css": "p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=",
+    "images/marker-icon.png": None,
+    "images/marker-icon-2x.png": None,
+    "images/marker-shadow.png": None,
+    "images/layers.png": None,
+    "images/layers-2x.png": None,
+}
+MIME = {".js": b"text/javascript", ".css": b"text/css", ".png": b"image/png",
+        ".svg": b"image/svg+xml", ".html": b"text/html"}
+
+def bundled_root() -> Path:
+    # PyInstaller распаковывает данные в sys._MEIPASS
+    return Path(getattr(sys, "_MEIPASS", Path(__file__).resolve().parent)) / "assets"
+
+def _complete(d: Path) -> bool:
+    return all((d / name).is_file() for name in LEAFLET_FILES)
+
+def find_assets(cache_root: Path):
+    # -> каталог assets с полным комплектом leaflet/ или None
+    for root in (bundled_root(), Path(cache_root)):
+        if _complete(root / "leaflet"):
+            return root
+    return None
+
+def _sri_ok(data: bytes, sri) -> bool:
+    return sri is None or base64.b64encode(hashlib.sha256(data).digest()).decode() == sri
+
+def download_leaflet(cache_root: Path, timeout: float = 20.0) -> Path:
+    dest = Path(cache_root) / "leaflet"
+    for name, sri in LEAFLET_FILES.items():
+        target = dest / name
+        if target.is_file():
+            continue
+        with urllib.request.urlopen(LEAFLET_CDN + name, timeout=timeout) as r:
+            data = r.read()
+        if not _sri_ok(data, sri):
+            raise ValueError(f"{name}: integrity check failed")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(target.suffix + ".part")
+        tmp.write_bytes(data); tmp.replace(target)
+    return Path(cache_root)
+
+def read_asset(root: Path, rel: str):
+    # -> (mime, bytes) или None; пути вне root не отдаём
+    root = Path(root).resolve()
+    p = (root / rel.lstrip("/")).resolve()
+    if root not in p.parents or not p.is_file():
+        return None
+    return MIME.get(p.suffix.lower(), b"application/octet-stream"), p.read_bytes()
+
+if __name__ == "__main__":
+    # подготовка assets/ для сборки:  python geochange_assets.py
+    out = download_leaflet(bundled_root())
+    print(f"Leaflet {LEAFLET_VERSION} saved to {out / 'leaflet'}")
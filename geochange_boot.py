@@ -0,0 +1,184 @@
+# geochange_boot.py
+# Boot readiness and quick-boot snapshots for AVDs.
+# Готовность проверяется через одну постоянную adb shell-сессию (без процесса на каждый опрос):
+# sys.boot_completed, остановка bootanim и наличие location service; тайминги фаз — в отчёт.
+# Снимок "geochange_ready" сохраняется после первой полной загрузки и сбрасывается при смене образа.
+
+import hashlib, json, queue, shutil, subprocess, threading, time
+from pathlib import Path
+
+from geochange_console import EmulatorConsole, console_port
+
+SNAPSHOT_NAME = "geochange_ready"
+SNAPSHOT_STATE = "geochange_snapshot.json"
+POLL_CMD = "getprop sys.boot_completed; getprop init.svc.bootanim; service check location"
+
+class BootError(Exception):
+    pass
+
+# ---------- persistent shell ----------
+class AdbShell:
+    # команды пишутся в stdin одного `adb shell`; конец ответа — строка-метка с кодом возврата
+    def __init__(self, adb, serial: str, env=None):
+        self.serial = serial
+        self._n = 0
+        self._lines = queue.Queue()
+        self._p = subprocess.Popen([str(adb), "-s", serial, "shell"], env=env, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        threading.Thread(target=self._reader, name=f"shell-{serial}", daemon=True).start()
+
+    def _reader(self):
+        for raw in self._p.stdout:
+            self._lines.put(raw.decode("utf-8", "replace").rstrip("\r\n"))
+        self._lines.put(None)
+
+    @property
+    def alive(self) -> bool:
+        return self._p.poll() is None
+
+    def run(self, cmd: str, timeout: float = 10.0):
+        # -> (код возврата, [строки вывода])
+        self._n += 1
+        mark = f"__GC{self._n}__"
+        try:
+            self._p.stdin.write(f"{cmd}; echo {mark} $?\n".encode("utf-8")); self._p.stdin.flush()
+        except OSError as e:
+            raise BootError(f"adb shell on {self.serial} closed: {e}") from e
+        out, deadline = [], time.monotonic() + timeout
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise BootError(f"'{cmd}' timed out on {self.serial}")
+            if line is None:
+                raise BootError(f"adb shell on {self.serial} exited")
+            if line.startswith(mark):
+                return int(line.split()[-1] or 0), out
+            out.append(line)
+
+    def close(self):
+        try:
+            self._p.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._p.wait(2.0)
+        except subprocess.TimeoutExpired:
+            self._p.kill()
+
+# ---------- readiness ----------
+def poll_state(shell: AdbShell):
+    # один запрос на опрос: boot_completed, bootanim, location service
+    _, out = shell.run(POLL_CMD)
+    out += ["", "", ""]
+    boot, anim = out[0].strip() == "1", out[1].strip()
+    # на образах без bootanim свойство пустое — тогда ориентируемся на boot_completed
+    return {"boot_completed": boot,
+            "bootanim_stopped": anim == "stopped" or (boot and not anim),
+            "location_service": out[2].strip().endswith("found") and "not found" not in out[2]}
+
+def wait_ready(shell_factory, t0=None, timeout: float = 300.0, interval: float = 0.5,
+               on_phase=None, cancel=None):
+    # -> {"ready", "phases": {phase: ms от t0}, "total_ms"}; shell_factory() -> AdbShell
+    t0 = time.monotonic() if t0 is None else t0
+    phases, shell = {}, None
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline and not (cancel is not None and cancel.is_set()):
+            try:
+                if shell is None or not shell.alive:
+                    shell = shell_factory()
+                    phases.setdefault("shell", _mark(t0, "shell", on_phase))
+                st = poll_state(shell)
+            except BootError:
+                # на раннем этапе загрузки adbd перезапускается — открываем сессию заново
+                if shell is not None: shell.close()
+                shell = None; time.sleep(interval); continue
+            for name in ("boot_completed", "bootanim_stopped", "location_service"):
+                if st[name] and name not in phases:
+                    phases[name] = _mark(t0, name, on_phase)
+            if all(st.values()):
+                return {"ready": True, "phases": phases, "total_ms": _ms(t0)}
+            time.sleep(interval)
+    finally:
+        if shell is not None: shell.close()
+    return {"ready": False, "phases": phases, "total_ms": _ms(t0)}
+
+def _ms(t0):
+    return round((time.monotonic() - t0) * 1000.0, 1)
+
+def _mark(t0, name, on_phase):
+    ms = _ms(t0)
+    if on_phase: on_phase(name, ms)
+    return ms
+
+# ---------- snapshots ----------
+class SnapshotManager:
+    def __init__(self, avd_home, sdk, name: str = SNAPSHOT_NAME):
+        self.avd_home = Path(avd_home); self.sdk = Path(sdk); self.name = name
+
+    def avd_dir(self, avd: str) -> Path:
+        return self.avd_home / f"{avd}.avd"
+
+    def _config(self, avd):
+        cfg = {}
+        try:
+            for line in (self.avd_dir(avd) / "config.ini").read_text(encoding="utf-8", errors="replace").splitlines():
+                if "=" in line:
+                    k, v = line.split("=", 1); cfg[k.strip()] = v.strip()
+        except OSError:
+            pass
+        return cfg
+
+    def fingerprint(self, avd: str) -> str:
+        # образ системы (ревизия + размеры/mtime образов) и версия эмулятора
+        h = hashlib.sha1()
+        sysdir = self._config(avd).get("image.sysdir.1", "")
+        img = self.sdk / sysdir if sysdir else None
+        for p in ([img / "source.properties"] if img else []) + [self.sdk / "emulator" / "source.properties"]:
+            try: h.update(p.read_bytes())
+            except OSError: h.update(b"-")
+        if img:
+            for n in ("system.img", "vendor.img", "ramdisk.img", "kernel-ranchu", "build.prop"):
+                try:
+                    st = (img / n).stat(); h.update(f"{n}:{st.st_size}:{int(st.st_mtime)}".encode())
+                except OSError:
+                    pass
+        return h.hexdigest()
+
+    def _state_path(self, avd):
+        return self.avd_dir(avd) / SNAPSHOT_STATE
+
+    def valid(self, avd: str) -> bool:
+        try:
+            st = json.loads(self._state_path(avd).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        return (st.get("name") == self.name and st.get("fingerprint") == self.fingerprint(avd)
+                and (self.avd_dir(avd) / "snapshots" / self.name).is_dir())
+
+    def invalidate(self, avd: str):
+        self._state_path(avd).unlink(missing_ok=True)
+        shutil.rmtree(self.avd_dir(avd) / "snapshots" / self.name, ignore_errors=True)
+
+    def launch_args(self, avd: str):
+        # -> (quick_boot, флаги эмулятора); устаревший снимок удаляется, загрузка холодная
+        if self.valid(avd):
+            return True, ["-snapshot", self.name, "-no-snapshot-save"]
+        self.invalidate(avd)
+        return False, ["-no-snapshot-load", "-no-snapshot-save"]
+
+    def save(self, avd: str, serial: str, timeout: float = 180.0, token_path=None) -> float:
+        # снимок через консоль эмулятора; -> секунды на сохранение
+        port = console_port(serial)
+        if port is None:
+            raise BootError(f"{serial} is not an emulator serial")
+        con = EmulatorConsole(port, token_path=token_path, timeout=timeout)
+        t = time.monotonic()
+        try:
+            con.command(f"avd snapshot save {self.name}")
+        finally:
+            con.close()
+        self._state_path(avd).write_text(json.dumps({"name": self.name, "fingerprint": self.fingerprint(avd),
+                                                     "created": time.time()}), encoding="utf-8")
+        return round(time.monotonic() - t, 1)
@@ -0,0 +1,292 @@
+# geochange_bulk.py
+# Bulk import/export of saved locations: streaming CSV, GPX waypoints and GeoJSON points,
+# batched put_many transactions, near-duplicate filtering with a spatial hash, progress/cancel.
+# Файл читается потоково (память не растёт с размером файла); хэш хранит только принятые точки.
+
+import csv, io, json, math, os, threading, time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from geochange_routes import haversine_m, iter_geojson_features
+
+FORMATS = {".csv": "csv", ".txt": "csv", ".gpx": "gpx", ".geojson": "geojson", ".json": "geojson"}
+BATCH = 5000                # строк на транзакцию (и не больше max_delta ленты изменений)
+CHECK_EVERY = 1000          # записей между проверками отмены и прогрессом (в т.ч. дубликаты/битые)
+NAME_KEYS = ("name", "title", "label", "id")
+LAT_KEYS = ("lat", "latitude", "y")
+LON_KEYS = ("lon", "lng", "long", "longitude", "x")
+
+class BulkCancelled(Exception):
+    pass
+
+def detect_format(path) -> str:
+    fmt = FORMATS.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"unsupported file type {Path(path).suffix or '(none)'}; use .csv, .gpx or .geojson")
+    return fmt
+
+def _valid(lat, lon) -> bool:
+    return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0 and not (math.isnan(lat) or math.isnan(lon))
+
+# ---------- readers: генераторы (name, lat, lon) или None для битой записи ----------
+# name == "" — в файле имени нет; имя даёт import_file (уникальное относительно хранилища)
+def _col(header, keys):
+    low = [h.strip().lower() for h in header]
+    return next((low.index(k) for k in keys if k in low), None)
+
+def iter_csv(fp):
+    # заголовок name/lat/lon (или синонимы) в любом порядке; без заголовка — name,lat,lon или lat,lon
+    # разделитель угадываем по первой строке (поток назад не перематывается)
+    line = fp.readline()
+    try:
+        dialect = csv.Sniffer().sniff(line, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    rows = csv.reader(_chain([line], fp), dialect)
+    first = next(rows, None)
+    if first is None:
+        return
+    ci = _col(first, LAT_KEYS), _col(first, LON_KEYS)
+    if None not in ci:
+        ni = _col(first, NAME_KEYS)
+        la, lo = ci
+    else:
+        ni, la, lo = (None, 0, 1) if len(first) == 2 else (0, 1, 2)
+        rows = _chain([first], rows)
+    for r in rows:
+        try:
+            yield (r[ni].strip() if ni is not None else ""), float(r[la]), float(r[lo])
+        except (IndexError, ValueError):
+            yield None if any(c.strip() for c in r) else ()
+
+def _chain(head, rest):
+    yield from head
+    yield from rest
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def iter_gpx_waypoints(fp):
+    # <wpt lat lon><name/></wpt>; обработанные элементы очищаются (iterparse)
+    root = None
+    for ev, el in ET.iterparse(fp, events=("start", "end")):
+        if ev == "start":
+            if root is None: root = el
+            continue
+        if _local(el.tag) != "wpt":
+            continue
+        name = next((c.text for c in el if _local(c.tag) == "name" and c.text), "")
+        try:
+            yield name.strip(), float(el.get("lat")), float(el.get("lon"))
+        except (TypeError, ValueError):
+            yield None
+        el.clear()
+        if root is not None:
+            root.clear()                    # wpt — прямые потомки <gpx>
+
+def iter_geojson_points(fp):
+    for f in iter_geojson_features(fp):
+        geom = (f or {}).get("geometry") or {}
+        props = (f or {}).get("properties") or {}
+        base = next((str(props[k]) for k in NAME_KEYS if props.get(k) not in (None, "")), "")
+        t, c = geom.get("type"), geom.get("coordinates")
+        pts = [c] if t == "Point" else c if t == "MultiPoint" else None
+        if not pts:
+            yield None; continue
+        for j, p in enumerate(pts):
+            name = f"{base} #{j + 1}" if base and len(pts) > 1 else base
+            try:
+                yield name, float(p[1]), float(p[0])
+            except (TypeError, ValueError, IndexError):
+                yield None
+
+READERS = {"csv": iter_csv, "gpx": iter_gpx_waypoints, "geojson": iter_geojson_points}
+
+# ---------- writers: потоковые ----------
+def write_csv(fp, rows):
+    w = csv.writer(fp, lineterminator="\n")
+    w.writerow(["name", "lat", "lon"])
+    for name, lat, lon in rows:
+        w.writerow([name, repr(lat), repr(lon)])
+        yield
+
+def write_gpx(fp, rows):
+    fp.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<gpx version="1.1" creator="GeoChange" xmlns="http://www.topografix.com/GPX/1/1">\n')
+    for name, lat, lon in rows:
+        fp.write(f'  <wpt lat="{lat!r}" lon="{lon!r}"><name>{escape(name)}</name></wpt>\n')
+        yield
+    fp.write("</gpx>\n")
+
+def write_geojson(fp, rows):
+    fp.write('{"type":"FeatureCollection","features":[\n')
+    sep = ""
+    for name, lat, lon in rows:
+        fp.write(sep + json.dumps({"type": "Feature", "properties": {"name": name},
+                                   "geometry": {"type": "Point", "coordinates": [lon, lat]}},
+                                  ensure_ascii=False, separators=(",", ":")))
+        sep = ",\n"
+        yield
+    fp.write("\n]}\n")
+
+WRITERS = {"csv": write_csv, "gpx": write_gpx, "geojson": write_geojson}
+
+# ---------- dedupe ----------
+class SpatialHash:
+    # ячейки ~radius_m в локальной проекции; сосед ищется в 3x3 ячейках по haversine
+    def __init__(self, radius_m: float):
+        self.radius = float(radius_m)
+        self._cell_deg = self.radius / 111320.0
+        self._cells = {}
+
+    def _key(self, lat, lon):
+        cy = math.floor(lat / self._cell_deg)
+        cx = math.floor(lon * max(math.cos(math.radians(lat)), 1e-6) / self._cell_deg)
+        return cx, cy
+
+    def near(self, lat, lon) -> bool:
+        cx, cy = self._key(lat, lon)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for p in self._cells.get((cx + dx, cy + dy), ()):
+                    if haversine_m(lat, lon, p[0], p[1]) <= self.radius:
+                        return True
+        return False
+
+    def add(self, lat, lon):
+        self._cells.setdefault(self._key(lat, lon), []).append((lat, lon))
+
+    def add_if_new(self, lat, lon) -> bool:
+        if self.near(lat, lon):
+            return False
+        self.add(lat, lon); return True
+
+# ---------- names ----------
+class UniqueNames:
+    # импорт только добавляет: занятое имя (в хранилище или раньше в этом файле) получает « (2)», « (3)»…
+    # безымянные точки — «<имя файла> <номер записи>»
+    def __init__(self, store, stem: str):
+        self.store, self.stem = store, stem
+        self._used = set()
+        self._next = {}                     # имя -> следующий суффикс (повтор «Stop» ×N без O(N²))
+
+    def _taken(self, name):
+        return name in self._used or name in self.store
+
+    def assign(self, name: str, n: int):
+        base = name or f"{self.stem} {n}"
+        name = base
+        if self._taken(name):
+            k = self._next.get(base, 2)
+            while self._taken(f"{base} ({k})"):
+                k += 1
+            self._next[base] = k + 1
+            name = f"{base} ({k})"
+        self._used.add(name)
+        return name, name != base
+
+# ---------- import / export ----------
+class _Counting(io.RawIOBase):
+    # счётчик прочитанных байт для прогресса (TextIOWrapper читает блоками — точность ~8 КБ)
+    def __init__(self, raw):
+        self.raw = raw; self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.raw.readinto(b); self.pos += n or 0
+        return n
+
+def import_file(store, path, fmt: str = None, dedupe_m: float = 5.0, batch: int = BATCH,
+                on_progress=None, cancel: threading.Event = None):
+    # -> статистика; каждая пачка — отдельная транзакция put_many; отмена и прогресс — каждые
+    # CHECK_EVERY записей файла, чтобы файл из одних дубликатов тоже можно было прервать
+    path = Path(path); fmt = fmt or detect_format(path)
+    total = os.path.getsize(path)
+    st = {"file": str(path), "format": fmt, "read": 0, "added": 0, "renamed": 0, "duplicates": 0,
+          "invalid": 0, "bytes": 0, "total_bytes": total, "cancelled": False, "finished": False}
+    if on_progress:
+        on_progress(dict(st))
+    dedupe = None
+    if dedupe_m and dedupe_m > 0:
+        dedupe = SpatialHash(dedupe_m)
+        for it in store.items():
+            dedupe.add(it["lat"], it["lon"])
+    names = UniqueNames(store, path.stem)
+    t0 = time.perf_counter(); last = 0.0
+    pending = []
+
+    def flush():
+        if pending:
+            st["added"] += len(store.put_many(pending))
+            pending.clear()
+
+    with open(path, "rb") as raw:
+        counter = _Counting(raw)
+        if fmt == "gpx":
+            fp = io.BufferedReader(counter, 1 << 16)
+        else:
+            fp = io.TextIOWrapper(io.BufferedReader(counter, 1 << 16), encoding="utf-8-sig", errors="replace",
+                                  newline="" if fmt == "csv" else None)
+        try:
+            for n, rec in enumerate(READERS[fmt](fp), 1):
+                if n % CHECK_EVERY == 0:
+                    if cancel is not None and cancel.is_set():
+                        raise BulkCancelled()
+                    now = time.perf_counter()
+                    if on_progress and now - last >= 0.1:
+                        last = now; st["bytes"] = counter.pos; on_progress(dict(st))
+                if rec == ():
+                    continue                        # пустая строка CSV
+                if rec is None or not _valid(rec[1], rec[2]):
+                    st["invalid"] += 1; continue
+                st["read"] += 1
+                if dedupe is not None and not dedupe.add_if_new(rec[1], rec[2]):
+                    st["duplicates"] += 1; continue
+                name, renamed = names.assign(rec[0], n)
+                st["renamed"] += renamed
+                pending.append((name, rec[1], rec[2]))
+                if len(pending) >= batch:
+                    flush()
+            if cancel is not None and cancel.is_set():
+                raise BulkCancelled()
+            flush()
+        except BulkCancelled:
+            st["cancelled"] = True              # уже записанные пачки остаются
+        finally:
+            pending.clear()
+    st.update(bytes=counter.pos, finished=True, ms=round((time.perf_counter() - t0) * 1000.0, 1))
+    if on_progress:
+        on_progress(dict(st))
+    return st
+
+def export_file(store, path, fmt: str = None, on_progress=None, cancel: threading.Event = None):
+    # пишет во временный файл и переименовывает: при отмене старый файл не портится
+    path = Path(path); fmt = fmt or detect_format(path)
+    total = len(store)
+    st = {"file": str(path), "format": fmt, "written": 0, "total": total, "cancelled": False, "finished": False}
+    tmp = path.with_name(path.name + ".part")
+    t0 = time.perf_counter(); last = 0.0
+    if on_progress:
+        on_progress(dict(st))
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as fp:
+            for _ in WRITERS[fmt](fp, store.iter_rows()):
+                st["written"] += 1
+                if st["written"] % 1000 == 0:
+                    if cancel is not None and cancel.is_set():
+                        raise BulkCancelled()
+                    now = time.perf_counter()
+                    if on_progress and now - last >= 0.1:
+                        last = now; on_progress(dict(st))
+        tmp.replace(path)
+    except BulkCancelled:
+        st["cancelled"] = True
+    finally:
+        tmp.unlink(missing_ok=True)
+    st.update(finished=True, ms=round((time.perf_counter() - t0) * 1000.0, 1))
+    if on_progress:
+        on_progress(dict(st))
+    return st
@@ -0,0 +1,187 @@
+# geochange_console.py
+# Persistent emulator-console sessions (console port = serial port) for geo fix.
+# Одна аутентифицированная TCP-сессия на serial; переподключение при обрыве.
+
+import socket, threading, time
+from pathlib import Path
+
+from geochange_metrics import METRICS
+
+CONSOLE_HOST    = "127.0.0.1"
+AUTH_TOKEN_FILE = Path.home() / ".emulator_console_auth_token"
+
+class ConsoleError(Exception):
+    pass
+
+class ConsoleCommandError(ConsoleError):
+    # консоль ответила "KO: ..." — соединение живо, команда отклонена
+    pass
+
+def console_port(serial: str):
+    if serial.startswith("emulator-"):
+        try:
+            return int(serial.split("-", 1)[1])
+        except ValueError:
+            return None
+    return None
+
+def read_auth_token(path=None) -> str:
+    try:
+        return Path(path or AUTH_TOKEN_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+class EmulatorConsole:
+    def __init__(self, port: int, host: str = CONSOLE_HOST, token_path=None,
+                 timeout: float = 2.0):
+        self.port = port
+        self.host = host
+        self.token_path = token_path
+        self.timeout = timeout
+        self._sock = None
+        self._rf = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def _connect(self):
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise ConsoleError(f"console {self.host}:{self.port} unreachable: {e}") from e
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._sock = sock; self._rf = sock.makefile("rb")
+        try:
+            banner = self._read_reply()
+            if "Authentication required" in banner:
+                token = read_auth_token(self.token_path)
+                if not token:
+                    raise ConsoleError("console requires auth, token file is missing")
+                self._send(f"auth {token}")
+                self._read_reply()
+        except Exception:
+            self._close()
+            raise
+
+    def _send(self, cmd: str):
+        try:
+            self._sock.sendall(cmd.encode("utf-8") + b"\r\n")
+        except OSError as e:
+            raise ConsoleError(f"console send failed: {e}") from e
+
+    def _read_reply(self, eof_ok: bool = False) -> str:
+        # ответ консоли — строки текста, завершённые "OK" (или "OK: …", как у kill) либо "KO: <причина>";
+        # eof_ok — закрытие соединения тоже успех (kill может закрыть сокет, не дописав ответ)
+        lines = []
+        while True:
+            try:
+                raw = self._rf.readline()
+            except OSError as e:
+                raise ConsoleError(f"console read failed: {e}") from e
+            if not raw:
+                if eof_ok:
+                    return "\n".join(lines)
+                raise ConsoleError("console closed the connection")
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if line == "OK" or line.startswith("OK:"):
+                return "\n".join(lines)
+            if line.startswith("KO"):
+                raise ConsoleCommandError(line)
+            lines.append(line)
+
+    def command(self, cmd: str) -> str:
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            kill = cmd.strip() == "kill"
+            try:
+                self._send(cmd)
+                return self._read_reply(eof_ok=kill)
+            except ConsoleCommandError:
+                raise
+            except ConsoleError:
+                self._close()
+                raise
+            finally:
+                if kill: self._close()          # эмулятор закрывает консоль сам
+
+    def _close(self):
+        for h in (self._rf, self._sock):
+            try:
+                if h is not None: h.close()
+            except OSError:
+                pass
+        self._sock = None; self._rf = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+class ConsolePool:
+    # retry_after: сколько секунд не пытаться снова после неудачного переподключения,
+    # чтобы fallback через adb не платил таймаут соединения на каждом fix
+    def __init__(self, host: str = CONSOLE_HOST, token_path=None, timeout: float = 2.0,
+                 retry_after: float = 5.0):
+        self.host = host
+        self.token_path = token_path
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._conns = {}
+        self._down_until = {}
+        self._lock = threading.Lock()
+
+    def _get(self, serial: str) -> EmulatorConsole:
+        port = console_port(serial)
+        if port is None:
+            raise ConsoleError(f"{serial} is not an emulator serial")
+        with self._lock:
+            if self._down_until.get(serial, 0.0) > time.monotonic():
+                raise ConsoleError(f"console for {serial} is unavailable")
+            conn = self._conns.get(serial)
+            if conn is None:
+                conn = self._conns[serial] = EmulatorConsole(
+                    port, self.host, self.token_path, self.timeout)
+            return conn
+
+    def command(self, serial: str, cmd: str) -> str:
+        with METRICS.timer("console " + cmd.split(" ", 1)[0], serial):
+            return self._command(serial, cmd)
+
+    def _command(self, serial: str, cmd: str) -> str:
+        conn = self._get(serial)
+        # первая попытка может попасть в протухшее соединение — переподключаемся один раз
+        for attempt in (0, 1):
+            try:
+                reply = conn.command(cmd)
+                self._down_until.pop(serial, None)
+                return reply
+            except ConsoleCommandError:
+                raise
+            except ConsoleError:
+                if attempt:
+                    with self._lock:
+                        self._down_until[serial] = time.monotonic() + self.retry_after
+                    raise
+
+    def geo_fix(self, serial: str, lat: float, lon: float) -> str:
+        return self.command(serial, f"geo fix {lon} {lat}")
+
+    def geo_nmea(self, serial: str, sentence: str) -> str:
+        return self.command(serial, f"geo nmea {sentence}")
+
+    def forget(self, serial: str):
+        with self._lock:
+            conn = self._conns.pop(serial, None)
+            self._down_until.pop(serial, None)
+        if conn is not None:
+            conn.close()
+
+    def close_all(self):
+        with self._lock:
+            conns = list(self._conns.values())
+            self._conns.clear(); self._down_until.clear()
+        for c in conns:
+            c.close()
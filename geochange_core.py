@@ -0,0 +1,245 @@
+# geochange_core.py
+# GUI-free core: SDK paths/environment (cached toolchain), device tracking, teleport (console first, adb
+# fallback), saved locations and route playback. Используется окном, CLI (geochange.py)
+# и демоном; PySide6 здесь не импортируется.
+
+import subprocess, threading, time
+from pathlib import Path
+
+from geochange_console import ConsolePool, ConsoleError
+from geochange_teleport import TeleportDispatcher, offset_point
+from geochange_devices import DeviceTracker
+from geochange_routes import Route, RoutePlayer
+from geochange_store import LocationStore
+from geochange_metrics import METRICS
+from geochange_bulk import import_file, export_file
+from geochange_toolchain import resolve, default_root
+
+DEFAULT_ROOT= default_root()
+DEFAULT_SDK = DEFAULT_ROOT / "sdk"
+DEFAULT_AVD = DEFAULT_ROOT / "avd"
+SYSTEM_IMAGE= "system-images;android-34;google_apis_playstore;x86_64"
+AVD_NAME    = "GeoChangePlay"
+DEVICE_NAME = "pixel_6"
+DATA_FILE   = Path(__file__).with_name("saved_locations.json")   # legacy, импортируется в STORE_FILE
+STORE_FILE  = Path(__file__).with_name("saved_locations.db")
+DEFAULT_TARGET = "emulator-5554"
+
+def toolchain(sdk_dir: Path):
+    # разобранный SDK из кэша: пути инструментов, версии, окружение
+    return resolve(sdk_dir, DEFAULT_AVD)
+
+def sdk_env(sdk_dir: Path):
+    # общий словарь из кэша — не изменять (нужна правка — env = dict(sdk_env(sdk)))
+    return toolchain(sdk_dir).env
+
+def adb_path(sdk_dir: Path):
+    return toolchain(sdk_dir).path("adb")
+
+def emulator_path(sdk_dir: Path):
+    return toolchain(sdk_dir).path("emulator")
+
+def run_popen(cmd, env=None):
+    # stdout бинарный: читается через geochange_logs.pump (с обработкой \r)
+    return subprocess.Popen(cmd, env=env, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+def _cmd_op(cmd):
+    # ["…/adb.exe", "-s", "emulator-5554", "emu", "kill"] -> ("adb emu", "emulator-5554")
+    name = Path(str(cmd[0])).stem; device = ""; rest = [str(a) for a in cmd[1:]]
+    if len(rest) >= 2 and rest[0] == "-s":
+        device = rest[1]; rest = rest[2:]
+    verb = next((a for a in rest if not a.startswith("-")), "")
+    return f"{name} {verb}".strip(), device
+
+def run_check(cmd, env=None):
+    op, device = _cmd_op(cmd)
+    with METRICS.timer(op, device) as span:
+        out = subprocess.run(cmd, env=env, text=True, capture_output=True)
+        if out.returncode != 0:
+            msg = (out.stderr or out.stdout or "").strip()[:200]
+            span.fail(f"exit {out.returncode}" + (f": {msg}" if msg else ""))
+    return out
+
+class Core:
+    # sdk_root — путь или функция без аргументов (окно читает его из поля ввода);
+    # tracker — свой DeviceTracker (другой адрес adb-сервера, стенд бенчмарков)
+    def __init__(self, sdk_root=DEFAULT_SDK, store_path=STORE_FILE, legacy_json=DATA_FILE, log=None,
+                 tracker: DeviceTracker = None):
+        self._sdk_root = sdk_root
+        self.log = log or (lambda s: None)
+        self.store = LocationStore(store_path, legacy_json=legacy_json)
+        self.consoles = ConsolePool()
+        self.tracker = tracker or DeviceTracker(start_server=self.adb_start_server)
+        self.teleports = TeleportDispatcher(self.send_fix)
+        self.booting = {}; self.bootClock = {}            # serial -> Event готовности / время старта
+        self.players = {}                                 # serial -> RoutePlayer
+        self._lock = threading.Lock()
+
+    def sdk_root(self) -> Path:
+        return Path(self._sdk_root() if callable(self._sdk_root) else self._sdk_root)
+
+    def start(self):
+        self.tracker.start()
+        return self
+
+    def adb_start_server(self):
+        sdk = self.sdk_root()
+        run_check([adb_path(sdk), "start-server"], env=sdk_env(sdk))
+
+    # --- devices
+    def devices(self, wait: float = 1.0):
+        # первый список track-devices приходит сразу после подключения
+        if not self.tracker.connected:
+            self.start()
+            deadline = time.monotonic() + wait
+            while not self.tracker.connected and time.monotonic() < deadline:
+                time.sleep(0.02)
+        return self.tracker.snapshot()
+
+    def online(self):
+        return [d["serial"] for d in self.devices() if d["state"] == "device"]
+
+    # --- boot gating: пока эмулятор грузится, send_fix ждёт готовности
+    def boot_started(self, serial: str, t0: float):
+        self.booting[serial] = threading.Event(); self.bootClock[serial] = t0
+
+    def boot_ready(self, serial: str):
+        ev = self.booting.pop(serial, None)
+        if ev is not None: ev.set()
+
+    # --- teleport; вызывается из потока TeleportWorker
+    def send_fix(self, target: str, lat: float, lon: float) -> str:
+        ev = self.booting.get(target)
+        if ev is not None:
+            with METRICS.timer("teleport.boot_wait", target):
+                if not ev.wait(300):
+                    raise RuntimeError(f"{target} is still booting")
+        # быстрый путь: постоянная сессия консоли эмулятора, без запуска adb
+        try:
+            self.consoles.geo_fix(target, lat, lon)
+            self._first_fix(target)
+            return "console"
+        except ConsoleError:
+            pass
+        sdk = self.sdk_root(); env = sdk_env(sdk)
+        adb = adb_path(sdk)
+        # состояние — из таблицы трекера; если устройство ещё не online, ждём его
+        if self.tracker.connected and not self.tracker.online(target):
+            with METRICS.timer("adb.wait_device", target):
+                if not self.tracker.wait_for(target, "device", 30):
+                    raise RuntimeError(f"{target} is {self.tracker.state(target) or 'not connected'}")
+        out = run_check([adb, "-s", target, "emu", "geo", "fix", str(lon), str(lat)],
+                        env=env)
+        if out.returncode != 0:
+            raise RuntimeError((out.stderr or out.stdout or "adb emu geo fix failed").strip())
+        self._first_fix(target)
+        return "adb"
+
+    def send_nmea(self, target: str, sentence: str) -> str:
+        # live drive: предложение NMEA несёт скорость и курс; fallback — adb emu geo nmea
+        try:
+            self.consoles.geo_nmea(target, sentence)
+            return "console"
+        except ConsoleError:
+            pass
+        sdk = self.sdk_root()
+        out = run_check([adb_path(sdk), "-s", target, "emu", "geo", "nmea", sentence], env=sdk_env(sdk))
+        if out.returncode != 0:
+            raise RuntimeError((out.stderr or out.stdout or "adb emu geo nmea failed").strip())
+        return "adb"
+
+    def _first_fix(self, target):
+        t0 = self.bootClock.pop(target, None)
+        if t0 is not None:
+            self.log(f"First teleport on {target} {time.monotonic() - t0:.1f} s after start.")
+
+    def teleport(self, serial: str, lat: float, lon: float, wait: bool = True, timeout: float = 30.0):
+        fut = self.teleports.submit(serial or DEFAULT_TARGET, lat, lon)
+        return fut.result(timeout) if wait else {"serial": serial, "queued": True}
+
+    def teleport_all(self, lat: float, lon: float, spread_m: float = 0.0, serials=None, timeout: float = 5.0):
+        serials = serials or self.online() or [DEFAULT_TARGET]
+        targets = [(s, *offset_point(lat, lon, i * spread_m, 0.0)) for i, s in enumerate(serials)]
+        return self.teleports.fan_out(targets, timeout)
+
+    def metrics(self, jsonl: str = "", trace: str = ""):
+        # сводка по операциям; пути — экспорт спанов (пишет процесс, где живёт ядро)
+        if jsonl:
+            METRICS.export_jsonl(jsonl)
+        if trace:
+            METRICS.export_chrome_trace(trace)
+        return METRICS.snapshot()
+
+    # --- saved locations
+    def locations(self):
+        return self.store.items()
+
+    def save_location(self, name: str, lat: float, lon: float):
+        return {"name": name.strip(), "op": self.store.put(name, lat, lon)}
+
+    def delete_location(self, name: str):
+        return {"name": name, "deleted": self.store.delete(name)}
+
+    def goto_location(self, name: str, serial: str = "", wait: bool = True):
+        loc = self.store.get(name)
+        if loc is None:
+            raise KeyError(f"no saved location named {name!r}")
+        return self.teleport(serial, loc["lat"], loc["lon"], wait)
+
+    def import_locations(self, path: str, fmt: str = "", dedupe_m: float = 5.0):
+        with METRICS.timer("bulk.import"):
+            return import_file(self.store, path, fmt or None, dedupe_m)
+
+    def export_locations(self, path: str, fmt: str = ""):
+        with METRICS.timer("bulk.export"):
+            return export_file(self.store, path, fmt or None)
+
+    # --- routes (по плееру на устройство)
+    def route_play(self, path, serial: str = "", speed_kmh: float = 50.0, rate_hz: float = 5.0,
+                   loop: bool = False, on_progress=None):
+        serial = serial or DEFAULT_TARGET
+        route = Route.load(path)
+        with self._lock:
+            player = self.players.get(serial)
+            if player is None:
+                player = self.players[serial] = RoutePlayer(
+                    lambda lat, lon, brg, spd: self.teleports.submit(serial, lat, lon))
+        player.on_progress = on_progress
+        player.load(route); player.set_speed(speed_kmh / 3.6); player.set_rate(rate_hz); player.set_loop(loop)
+        player.play()
+        return {"serial": serial, "name": route.name, "length": round(route.length, 1), "count": len(route)}
+
+    def _player(self, serial):
+        player = self.players.get(serial or DEFAULT_TARGET)
+        if player is None:
+            raise KeyError(f"no route loaded for {serial or DEFAULT_TARGET}")
+        return player
+
+    def route_pause(self, serial: str = ""):
+        self._player(serial).pause(); return self.route_status(serial)
+
+    def route_resume(self, serial: str = ""):
+        self._player(serial).play(); return self.route_status(serial)
+
+    def route_stop(self, serial: str = ""):
+        with self._lock:
+            player = self.players.pop(serial or DEFAULT_TARGET, None)
+        if player is not None:
+            player.close()
+        return {"serial": serial or DEFAULT_TARGET, "stopped": player is not None}
+
+    def route_status(self, serial: str = ""):
+        p = self._player(serial)
+        return {"serial": serial or DEFAULT_TARGET, "playing": p.playing,
+                "length": round(p.route.length, 1) if p.route else 0.0, "stats": dict(p.stats)}
+
+    def close(self):
+        with self._lock:
+            players = list(self.players.values()); self.players.clear()
+        for p in players:
+            p.close()
+        self.teleports.close()
+        self.tracker.stop()
+        self.consoles.close_all()
+        self.store.close()
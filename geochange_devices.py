@@ -0,0 +1,168 @@
+# geochange_devices.py
+# Live device table from the adb server's host:track-devices stream (port 5037):
+# сервер сам присылает полный список при каждом изменении, опрашивать adb не нужно.
+# Ожидание состояния — через Future/wait_for, без блокирующих wait-for-device.
+
+import socket, threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from geochange_console import console_port
+
+ADB_HOST = "127.0.0.1"
+ADB_PORT = 5037
+
+class AdbError(Exception):
+    pass
+
+def _read_exact(sock, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("adb server closed the connection")
+        buf += chunk
+    return buf
+
+def _read_message(sock) -> str:
+    # сообщение adb: 4 hex-цифры длины + данные
+    n = int(_read_exact(sock, 4), 16)
+    return _read_exact(sock, n).decode("utf-8", "replace") if n else ""
+
+def adb_request(sock, service: str):
+    data = service.encode("utf-8")
+    sock.sendall(b"%04x" % len(data) + data)
+    status = _read_exact(sock, 4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        raise AdbError(_read_message(sock))
+    raise AdbError(f"unexpected adb reply {status!r}")
+
+def parse_devices(payload: str):
+    # "serial\tstate\n..." -> {serial: state}
+    out = {}
+    for line in payload.splitlines():
+        if "\t" in line:
+            serial, state = line.split("\t", 1)
+            out[serial.strip()] = state.strip()
+    return out
+
+class DeviceTracker:
+    def __init__(self, host: str = ADB_HOST, port: int = ADB_PORT, start_server=None,
+                 reconnect: float = 1.0, max_reconnect: float = 5.0):
+        self.host, self.port = host, port
+        self.start_server = start_server            # колбэк: запустить adb server, если он не отвечает
+        self.reconnect, self.max_reconnect = reconnect, max_reconnect
+        self.connected = False
+        self._table = {}                            # serial -> state
+        self._cond = threading.Condition()
+        self._waiters = []                          # (serial, state, Future)
+        self._listeners = []
+        self._sock = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()              # kick(): переподключиться без ожидания паузы
+        self._thread = None
+
+    # --- lookups (из памяти)
+    def state(self, serial: str):
+        return self._table.get(serial)
+
+    def online(self, serial: str) -> bool:
+        return self._table.get(serial) == "device"
+
+    def snapshot(self):
+        with self._cond:
+            return [{"serial": s, "state": st, "port": console_port(s)} for s, st in sorted(self._table.items())]
+
+    def subscribe(self, fn):
+        # fn(snapshot, changes): changes = [(serial, old_state, new_state)], None — устройства нет
+        self._listeners.append(fn)
+
+    # --- waiting
+    def future(self, serial: str, state="device") -> Future:
+        # state=None — дождаться исчезновения устройства
+        f = Future()
+        with self._cond:
+            if self._table.get(serial) == state:
+                f.set_result(state)
+            else:
+                self._waiters.append((serial, state, f))
+        return f
+
+    def wait_for(self, serial: str, state="device", timeout: float = 120.0) -> bool:
+        f = self.future(serial, state)
+        try:
+            f.result(timeout)
+            return True
+        except FutureTimeout:
+            with self._cond:
+                self._waiters = [w for w in self._waiters if w[2] is not f]
+            return False
+
+    # --- lifecycle
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="adb-track", daemon=True)
+            self._thread.start()
+        return self
+
+    def kick(self):
+        # после установки SDK / invalidate(): adb мог появиться — пробуем сразу, пауза с начала
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set(); self._wake.set()
+        s = self._sock
+        if s is not None:
+            try: s.close()
+            except OSError: pass
+        if self._thread is not None:
+            self._thread.join(2.0)
+
+    def _run(self):
+        delay, started = self.reconnect, False
+        while not self._stop.is_set():
+            if self._wake.is_set():
+                self._wake.clear(); delay, started = self.reconnect, False
+            try:
+                with socket.create_connection((self.host, self.port), timeout=3.0) as s:
+                    self._sock = s
+                    adb_request(s, "host:track-devices")
+                    s.settimeout(None)
+                    self.connected = True; delay, started = self.reconnect, False
+                    while not self._stop.is_set():
+                        self._update(parse_devices(_read_message(s)))
+            except ConnectionRefusedError:
+                # сервер adb не запущен (ещё нет SDK, adb kill-server) — поднимаем на каждом отказе:
+                # после запуска сразу переподключаемся, следующий отказ уже ждёт паузу
+                if self.start_server and not started:
+                    started = True
+                    try: self.start_server()
+                    except Exception: pass
+                    continue
+                started = False
+            except (OSError, AdbError, ValueError):
+                pass
+            finally:
+                self._sock = None
+                if self.connected:
+                    self.connected = False
+                    self._update({})                # сервер пропал — о состоянии устройств ничего не знаем
+            self._wake.wait(delay)
+            delay = min(delay * 2, self.max_reconnect)
+
+    def _update(self, table):
+        with self._cond:
+            old = self._table
+            changes = [(s, old.get(s), table.get(s)) for s in sorted(set(old) | set(table))
+                       if old.get(s) != table.get(s)]
+            self._table = table
+            done = [w for w in self._waiters if table.get(w[0]) == w[1]]
+            self._waiters = [w for w in self._waiters if table.get(w[0]) != w[1]]
+        for _, st, f in done:
+            if not f.done():
+                f.set_result(st)
+        if changes:
+            snap = self.snapshot()
+            for fn in list(self._listeners):
+                fn(snap, changes)
@@ -0,0 +1,192 @@
+# geochange_drive.py
+# Live drive: keyboard/joystick input sets heading and speed, a fixed-rate thread integrates
+# the position and sends NMEA ($GPRMC with speed/course) over the persistent console.
+# Задержка «клавиша → устройство» меряется от приёма ввода до ответа консоли на следующий тик.
+
+import math, threading, time
+
+from geochange_teleport import offset_point
+from geochange_routes import MIN_RATE_HZ, MAX_RATE_HZ
+
+KNOTS_PER_MPS = 1.943844
+TURN_RATE_DEG = 90.0            # поворот клавишами, град/с
+ACCEL_MPS2 = 4.0                # разгон/торможение клавишами и джойстиком
+DRAG_MPS2 = 1.5                 # накат без газа
+DEFAULT_MAX_KMH = 60.0
+
+# ---------- NMEA ----------
+def nmea_checksum(body: str) -> str:
+    cs = 0
+    for ch in body:
+        cs ^= ord(ch)
+    return f"{cs:02X}"
+
+def _sentence(body: str) -> str:
+    return f"${body}*{nmea_checksum(body)}"
+
+def _coord(value: float, width: int, pos: str, neg: str):
+    # градусы -> (d)ddmm.mmmm + полушарие
+    a = abs(value); deg = int(a); minutes = (a - deg) * 60.0
+    if minutes >= 59.99995:                     # округление до 60.0000 переносим в градусы
+        deg += 1; minutes = 0.0
+    return f"{deg:0{width}d}{minutes:07.4f}", pos if value >= 0 else neg
+
+def gprmc(lat: float, lon: float, speed_mps: float, course_deg: float, ts: float = None) -> str:
+    ts = time.time() if ts is None else ts
+    t = time.gmtime(ts); frac = ts % 1.0
+    la, ns = _coord(lat, 2, "N", "S"); lo, ew = _coord(lon, 3, "E", "W")
+    return _sentence(f"GPRMC,{time.strftime('%H%M%S', t)}.{int(frac * 100):02d},A,{la},{ns},{lo},{ew},"
+                     f"{max(speed_mps, 0.0) * KNOTS_PER_MPS:.2f},{course_deg % 360.0:.1f},"
+                     f"{time.strftime('%d%m%y', t)},,")
+
+def gpgga(lat: float, lon: float, alt_m: float = 0.0, sats: int = 8, ts: float = None) -> str:
+    ts = time.time() if ts is None else ts
+    t = time.gmtime(ts); frac = ts % 1.0
+    la, ns = _coord(lat, 2, "N", "S"); lo, ew = _coord(lon, 3, "E", "W")
+    return _sentence(f"GPGGA,{time.strftime('%H%M%S', t)}.{int(frac * 100):02d},{la},{ns},{lo},{ew},"
+                     f"1,{sats:02d},0.9,{alt_m:.1f},M,0.0,M,,")
+
+# ---------- controller ----------
+class DriveController:
+    # send(sentence) -> канал ("console"/"adb"), вызывается из потока drive;
+    # on_state(dict) — после каждой отправки
+    def __init__(self, send, lat: float, lon: float, heading: float = 0.0, rate_hz: float = 10.0,
+                 max_kmh: float = DEFAULT_MAX_KMH, on_state=None):
+        self.send = send
+        self.on_state = on_state
+        self.lat, self.lon = float(lat), float(lon)
+        self.heading = float(heading) % 360.0
+        self.speed = 0.0
+        self.rate = min(max(float(rate_hz), MIN_RATE_HZ), MAX_RATE_HZ)
+        self.max_speed = max(float(max_kmh), 1.0) / 3.6
+        self.stats = {"ticks": 0, "late": 0, "max_late_ms": 0.0, "errors": 0,
+                      "inputs": 0, "last_ms": None, "avg_ms": None, "max_ms": 0.0}
+        self._turn = 0.0; self._throttle = 0.0    # клавиши: -1..1
+        self._aim = None                          # джойстик: (курс, целевая скорость)
+        self._input = None                        # (метка клиента, perf_counter приёма) — ждёт отправки
+        self._lat_sum = 0.0
+        self._cv = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    # --- input (потокобезопасно, из GUI)
+    def keys(self, turn: float, throttle: float, stamp: float = 0.0):
+        with self._cv:
+            self._turn = min(max(float(turn), -1.0), 1.0)
+            self._throttle = min(max(float(throttle), -1.0), 1.0)
+            self._aim = None
+            self._mark(stamp)
+
+    def stick(self, heading: float, fraction: float, stamp: float = 0.0):
+        with self._cv:
+            self._turn = self._throttle = 0.0
+            f = min(max(float(fraction), 0.0), 1.0)
+            self._aim = (float(heading) % 360.0, f * self.max_speed) if f > 0 else None
+            self._mark(stamp)
+
+    def _mark(self, stamp):
+        # задержку считаем для первого ввода до отправки; следующие до тика её не сдвигают
+        if self._input is None:
+            self._input = (stamp, time.perf_counter())
+
+    def set_rate(self, rate_hz: float):
+        with self._cv:
+            self.rate = min(max(float(rate_hz), MIN_RATE_HZ), MAX_RATE_HZ)
+            self._cv.notify()
+
+    def set_max_speed(self, max_kmh: float):
+        with self._cv:
+            self.max_speed = max(float(max_kmh), 1.0) / 3.6
+            self.speed = min(self.speed, self.max_speed)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="drive", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+
+    # --- internals
+    def _integrate(self, dt: float):
+        if self._aim is not None:
+            want_heading, want_speed = self._aim
+            self.heading = want_heading
+        else:
+            self.heading = (self.heading + self._turn * TURN_RATE_DEG * dt) % 360.0
+            if self._throttle > 0:
+                want_speed = self.max_speed
+            elif self._throttle < 0:
+                want_speed = 0.0
+            else:
+                want_speed = max(self.speed - DRAG_MPS2 * dt, 0.0)
+        rate = ACCEL_MPS2 * (abs(self._throttle) or 1.0)
+        if want_speed > self.speed:
+            self.speed = min(want_speed, self.speed + rate * dt)
+        else:
+            self.speed = max(want_speed, self.speed - rate * dt)
+        d = self.speed * dt
+        if d > 0:
+            h = math.radians(self.heading)
+            self.lat, self.lon = offset_point(self.lat, self.lon, d * math.sin(h), d * math.cos(h))
+
+    def _tick(self, dt: float):
+        with self._cv:
+            self._integrate(dt)
+            lat, lon, heading, speed = self.lat, self.lon, self.heading, self.speed
+            inp, self._input = self._input, None
+        st = {"lat": lat, "lon": lon, "heading": round(heading, 1), "speed": round(speed, 2),
+              "kmh": round(speed * 3.6, 1), "rate": self.rate}
+        t = time.perf_counter()
+        try:
+            st["via"] = self.send(gprmc(lat, lon, speed, heading))
+            st["ok"] = True
+        except Exception as e:
+            st["ok"] = False; st["error"] = str(e)
+            self.stats["errors"] += 1
+        done = time.perf_counter()
+        st["send_ms"] = round((done - t) * 1000.0, 2)
+        if inp is not None:
+            # от приёма ввода до ответа консоли: ожидание тика + отправка
+            ms = round((done - inp[1]) * 1000.0, 2)
+            s = self.stats
+            s["inputs"] += 1; self._lat_sum += ms
+            s["last_ms"] = ms; s["avg_ms"] = round(self._lat_sum / s["inputs"], 2)
+            s["max_ms"] = max(s["max_ms"], ms)
+            st["stamp"] = inp[0]; st["device_ms"] = ms
+        st["stats"] = dict(self.stats)
+        return st
+
+    def _run(self):
+        try:
+            self.send(gpgga(self.lat, self.lon))   # начальная точка с высотой и качеством фикса
+        except Exception:
+            self.stats["errors"] += 1
+        last = deadline = time.monotonic()
+        while True:
+            with self._cv:
+                if self._closed:
+                    return
+                period = 1.0 / self.rate
+                now = time.monotonic()
+                if deadline > now:
+                    self._cv.wait(deadline - now)
+                    continue
+            late = now - deadline
+            st = self._tick(now - last)
+            last = now
+            s = self.stats
+            s["ticks"] += 1
+            if late > period * 0.5:
+                s["late"] += 1
+            s["max_late_ms"] = max(s["max_late_ms"], round(late * 1000.0, 2))
+            if self.on_state:
+                self.on_state(st)
+            # абсолютные сроки, как у RoutePlayer: пропущенные тики не догоняем
+            deadline += period
+            now = time.monotonic()
+            if deadline <= now:
+                deadline += math.ceil((now - deadline) / period) * period
@@ -0,0 +1,291 @@
+# geochange_farm.py
+# Emulator farm: AVD clones from a template, explicit console/adb port pairs, parallel
+# start bounded by host cores/RAM, per-process CPU/memory sampling and fleet shutdown.
+# Без Qt; эмулятор — любой исполняемый файл с интерфейсом `emulator -avd N -ports C,A`.
+
+import os, shutil, socket, subprocess, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from geochange_console import EmulatorConsole, ConsoleError
+
+try:
+    import psutil                                   # необязательно: без него — /proc или только PID
+except ImportError:
+    psutil = None
+
+# adb сам находит эмуляторы только на портах 5555..5585 — отсюда 16 пар
+FIRST_PORT, LAST_PORT = 5554, 5584
+CORES_PER_INSTANCE = 2
+MEM_PER_INSTANCE_MB = 3072
+HOST_RESERVE_MB = 2048
+CLONE_SKIP = (".lock", ".qcow2", "snapshots", "geochange_snapshot.json", "hardware-qemu.ini", "multiinstance.lock")
+
+# ---------- AVD clones ----------
+def _read_ini(path: Path):
+    out = {}
+    for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
+        if "=" in line:
+            k, v = line.split("=", 1); out[k.strip()] = v.strip()
+    return out
+
+def _write_ini(path: Path, values):
+    path.write_text("".join(f"{k}={v}\n" for k, v in values.items()), encoding="utf-8")
+
+def clone_avd(avd_home, template: str, name: str) -> Path:
+    # копия <template>.avd без локов, оверлеев qcow2 и снимков (они ссылаются на путь шаблона)
+    home = Path(avd_home); src = home / f"{template}.avd"; dst = home / f"{name}.avd"
+    if not src.is_dir():
+        raise FileNotFoundError(f"template AVD {template} not found in {home}")
+    if dst.exists():
+        return dst
+    tmp = home / f"{name}.avd.part"
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.copytree(src, tmp, ignore=lambda d, names: [n for n in names if n.endswith(CLONE_SKIP)])
+    cfg = _read_ini(tmp / "config.ini")
+    cfg["AvdId"] = name; cfg["avd.ini.displayname"] = name
+    _write_ini(tmp / "config.ini", cfg)
+    tmp.replace(dst)
+    ini = _read_ini(home / f"{template}.ini") if (home / f"{template}.ini").exists() else {}
+    ini["path"] = str(dst.resolve()); ini["path.rel"] = f"avd/{name}.avd"
+    _write_ini(home / f"{name}.ini", ini)
+    return dst
+
+def delete_clone(avd_home, name: str):
+    home = Path(avd_home)
+    shutil.rmtree(home / f"{name}.avd", ignore_errors=True)
+    (home / f"{name}.ini").unlink(missing_ok=True)
+
+# ---------- ports ----------
+def _port_free(port: int) -> bool:
+    with socket.socket() as s:
+        try:
+            s.bind(("127.0.0.1", port)); return True
+        except OSError:
+            return False
+
+class PortAllocator:
+    # пары (консоль, adb): чётный и следующий нечётный порт
+    def __init__(self, first: int = FIRST_PORT, last: int = LAST_PORT):
+        self.first, self.last = first & ~1, last
+        self._used = set()
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            for c in range(self.first, self.last + 1, 2):
+                if c not in self._used and _port_free(c) and _port_free(c + 1):
+                    self._used.add(c)
+                    return c, c + 1
+        raise RuntimeError(f"no free emulator port pair in {self.first}-{self.last + 1}")
+
+    def release(self, console: int):
+        with self._lock:
+            self._used.discard(console)
+
+# ---------- host ----------
+def host_memory_mb():
+    # -> (всего, доступно) МБ или (None, None)
+    if psutil is not None:
+        vm = psutil.virtual_memory()
+        return vm.total >> 20, vm.available >> 20
+    try:
+        info = _read_meminfo()
+        return info["MemTotal"] >> 10, info.get("MemAvailable", info.get("MemFree", 0)) >> 10
+    except (OSError, KeyError, ValueError):
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        class MEMSTAT(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+        st = MEMSTAT(); st.dwLength = ctypes.sizeof(MEMSTAT)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(st)):
+            return st.ullTotalPhys >> 20, st.ullAvailPhys >> 20
+    return None, None
+
+def _read_meminfo():
+    out = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            k, v = line.split(":", 1); out[k] = int(v.split()[0])
+    return out
+
+def max_parallel(cores_per: int = CORES_PER_INSTANCE, mem_per_mb: int = MEM_PER_INSTANCE_MB,
+                 reserve_mb: int = HOST_RESERVE_MB) -> int:
+    by_cpu = max(1, (os.cpu_count() or 2) // cores_per)
+    _, avail = host_memory_mb()
+    by_mem = max(1, (avail - reserve_mb) // mem_per_mb) if avail else by_cpu
+    return int(min(by_cpu, by_mem))
+
+# ---------- process stats ----------
+class ProcSampler:
+    # CPU% считается по приращению времени процесса между вызовами
+    def __init__(self):
+        self._prev = {}
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def sample(self, pid: int):
+        # -> (cpu_percent, rss_mb) или (None, None)
+        try:
+            if psutil is not None:
+                p = psutil.Process(pid)
+                t = p.cpu_times(); cpu_s = t.user + t.system
+                rss = p.memory_info().rss >> 20
+            else:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                cpu_s = (int(fields[11]) + int(fields[12])) / self._tick
+                with open(f"/proc/{pid}/statm") as f:
+                    rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") >> 20
+        except Exception:
+            self._prev.pop(pid, None)
+            return None, None
+        now = time.monotonic()
+        prev = self._prev.get(pid); self._prev[pid] = (now, cpu_s)
+        if prev is None or now <= prev[0]:
+            return None, rss
+        return round((cpu_s - prev[1]) / (now - prev[0]) * 100.0, 1), rss
+
+    def forget(self, pid):
+        self._prev.pop(pid, None)
+
+# ---------- farm ----------
+class EmulatorFarm:
+    def __init__(self, emulator, avd_home, env=None, ports: PortAllocator = None, parallel: int = None,
+                 extra_args=(), ready=None, token_path=None):
+        self.emulator = str(emulator)
+        self.avd_home = Path(avd_home)
+        self.env = env
+        self.ports = ports or PortAllocator()
+        self.parallel = parallel or max_parallel()
+        self.extra_args = list(extra_args)
+        self.ready = ready                  # ready(serial, timeout) -> bool; None — ждём порт консоли
+        self.token_path = token_path
+        self._inst = {}                     # name -> dict
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._sampler = ProcSampler()
+        self._pool = ThreadPoolExecutor(self.parallel, thread_name_prefix="farm")
+
+    def subscribe(self, fn):
+        # fn(instances) при каждом изменении состояния
+        self._listeners.append(fn)
+
+    def _set(self, name, **kw):
+        with self._lock:
+            self._inst[name].update(kw)
+        snap = self.instances()
+        for fn in list(self._listeners):
+            fn(snap)
+
+    def instances(self):
+        with self._lock:
+            return [dict((k, v) for k, v in i.items() if k != "proc") for i in self._inst.values()]
+
+    def clones(self, template: str, count: int):
+        names = [f"{template}_{i + 1}" for i in range(count)]
+        for n in names:
+            clone_avd(self.avd_home, template, n)
+        return names
+
+    def start(self, names, boot_timeout: float = 300.0):
+        # -> {name: Future}; одновременно грузится не больше self.parallel экземпляров
+        futs = {}
+        with self._lock:
+            for n in names:
+                if n in self._inst and self._inst[n]["state"] in ("queued", "starting", "booting", "running"):
+                    continue
+                self._inst[n] = {"name": n, "serial": None, "console": None, "adb": None, "pid": None,
+                                 "state": "queued", "cpu": None, "rss_mb": None, "boot_s": None,
+                                 "error": None, "proc": None}
+                futs[n] = self._pool.submit(self._start_one, n, boot_timeout)
+        return futs
+
+    def _start_one(self, name, boot_timeout):
+        try:
+            console, adb = self.ports.allocate()
+        except RuntimeError as e:
+            self._set(name, state="failed", error=str(e)); return False
+        serial = f"emulator-{console}"
+        # клоны без снимков: -no-snapshot-save, если профиль (extra_args) не задал своё
+        snap = [] if {"-no-snapshot", "-no-snapshot-save"} & set(self.extra_args) else ["-no-snapshot-save"]
+        args = [self.emulator, "-avd", name, "-ports", f"{console},{adb}", *snap, *self.extra_args]
+        flags = subprocess.DETACHED_PROCESS if sys.platform == "win32" else 0
+        t0 = time.monotonic()
+        try:
+            proc = subprocess.Popen(args, env=self.env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL, creationflags=flags)
+        except OSError as e:
+            self.ports.release(console)
+            self._set(name, state="failed", error=str(e)); return False
+        self._set(name, serial=serial, console=console, adb=adb, pid=proc.pid, proc=proc, state="booting")
+        ok = self.ready(serial, boot_timeout) if self.ready else self._wait_console(console, proc, boot_timeout)
+        if proc.poll() is not None:
+            self.ports.release(console)
+            self._set(name, state="failed", error=f"exited with {proc.returncode}"); return False
+        self._set(name, state="running" if ok else "failed", boot_s=round(time.monotonic() - t0, 1),
+                  error=None if ok else "boot timeout")
+        return ok
+
+    @staticmethod
+    def _wait_console(port, proc, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and proc.poll() is None:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close(); return True
+            except OSError:
+                time.sleep(0.2)
+        return False
+
+    def sample(self):
+        # обновляет CPU/память всех живых экземпляров; вызывать периодически
+        with self._lock:
+            live = [(i["name"], i["pid"]) for i in self._inst.values() if i["pid"] and i["state"] != "stopped"]
+        for name, pid in live:
+            cpu, rss = self._sampler.sample(pid)
+            with self._lock:
+                self._inst[name].update(cpu=cpu, rss_mb=rss)
+        return self.instances()
+
+    def stop(self, name: str, timeout: float = 20.0):
+        with self._lock:
+            inst = self._inst.get(name)
+            if inst is None or inst["proc"] is None or inst["state"] == "stopped":
+                return
+            proc, console = inst["proc"], inst["console"]
+        self._set(name, state="stopping")
+        # корректно — через консоль (эмулятор сам сохранит/закроет образы); terminate — только
+        # если консоль недоступна или отказала, kill — если процесс не вышел за timeout
+        con = EmulatorConsole(console, token_path=self.token_path, timeout=2.0)
+        try:
+            con.command("kill"); clean = True
+        except (ConsoleError, OSError):
+            clean = False
+        finally:
+            con.close()
+        if not clean:
+            proc.terminate()
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill(); proc.wait(5)
+        self._sampler.forget(proc.pid)
+        self.ports.release(console)
+        self._set(name, state="stopped", cpu=None, rss_mb=None)
+
+    def stop_all(self, timeout: float = 20.0):
+        # параллельно: каждый эмулятор закрывается несколько секунд
+        with self._lock:
+            names = [n for n, i in self._inst.items() if i["proc"] is not None and i["state"] != "stopped"]
+        if names:
+            with ThreadPoolExecutor(len(names)) as pool:
+                list(pool.map(lambda n: self.stop(n, timeout), names))
+        return names
+
+    def shutdown(self, timeout: float = 20.0):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.stop_all(timeout)
@@ -0,0 +1,305 @@
+# geochange_geocoder.py
+# Offline geocoder: compact prefix index built from a GeoNames-style TSV dump,
+# memory-mapped for instant startup; optional Nominatim fallback behind a
+# persistent LRU cache and a rate limiter.
+# Сборка индекса:  python geochange_geocoder.py build cities500.txt <out_dir>
+
+import bisect, heapq, json, math, mmap, sqlite3, struct, sys, threading, time, unicodedata, urllib.parse, urllib.request
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+KEY_LEN   = 16
+KEY_FMT   = struct.Struct(f"<{KEY_LEN}sI")          # ключ-префикс + id записи
+REC_FMT   = struct.Struct("<IHffI2s")              # name_off, name_len, lat, lon, population, cc
+MAX_ALT   = 16
+TOP_CHARS = 3                                        # префиксы до 3 символов…
+TOP_MIN   = 20000                                    # …шире стольких ключей получают список по населению
+TOP_K     = 1000
+EXACT     = 0x80000000                               # бит в top.bin: слово совпало с префиксом целиком
+NOMINATIM = "https://nominatim.openstreetmap.org/search"
+USER_AGENT = "GeoChange/1.0 (Android emulator location tool)"
+
+def normalize(text: str) -> str:
+    t = unicodedata.normalize("NFKD", text.lower())
+    t = "".join(c for c in t if not unicodedata.combining(c))
+    return " ".join("".join(c if c.isalnum() else " " for c in t).split())
+
+def _key(token: str) -> bytes:
+    return token.encode("utf-8")[:KEY_LEN]
+
+# ---------- build ----------
+def build_index(tsv_path, out_dir):
+    out = Path(out_dir); out.mkdir(parents=True, exist_ok=True)
+    keys, pops = [], []
+    n = 0
+    with open(tsv_path, encoding="utf-8") as src, \
+         open(out / "records.bin", "wb") as rec, open(out / "names.bin", "wb") as names:
+        off = 0
+        for line in src:
+            f = line.rstrip("\n").split("\t")
+            if len(f) < 15 or not f[1]:
+                continue
+            try:
+                lat, lon = float(f[4]), float(f[5])
+                pop = int(f[14] or 0)
+            except ValueError:
+                continue
+            name = f[1].encode("utf-8")[:65535]
+            rec.write(REC_FMT.pack(off, len(name), lat, lon, min(pop, 0xFFFFFFFF),
+                                   f[8].encode("ascii", "replace")[:2].ljust(2)))
+            names.write(name); off += len(name); pops.append(pop)
+            alts = [a for a in f[3].split(",") if a and len(a) <= 40][:MAX_ALT] if len(f) > 3 else []
+            toks = set()
+            for s in [f[1], f[2]] + alts:
+                toks.update(normalize(s).split())
+            keys.extend((_key(t), n) for t in toks)
+            n += 1
+    keys.sort()
+    with open(out / "keys.bin", "wb") as kf:
+        for k, i in keys:
+            kf.write(KEY_FMT.pack(k, i))
+    top = _build_top(keys, pops, out / "top.bin")
+    (out / "meta.json").write_text(json.dumps({"records": n, "keys": len(keys), "top": top,
+                                               "source": str(tsv_path)}), encoding="utf-8")
+    return {"records": n, "keys": len(keys), "top": len(top)}
+
+def _build_top(keys, pops, path):
+    # короткий префикс покрывает десятки тысяч ключей, а в порядке байт первыми идут «Aa…»:
+    # для таких префиксов заранее храним TOP_K записей по убыванию населения
+    # -> {префикс: [смещение, число]} в top.bin (uint32 rid | EXACT)
+    cnt = Counter()
+    for k, _ in keys:
+        t = k.decode("utf-8", "ignore")
+        cnt.update(t[:n] for n in range(1, min(len(t), TOP_CHARS) + 1))
+    top = {}
+    with open(path, "wb") as f:
+        for p in sorted(q for q, c in cnt.items() if c > TOP_MIN):
+            pb = p.encode("utf-8")
+            lo, hi = bisect.bisect_left(keys, (pb,)), bisect.bisect_left(keys, (pb + b"\xff",))
+            ids = {}
+            for k, rid in keys[lo:hi]:
+                ids[rid] = ids.get(rid, False) or k == pb
+            best = heapq.nlargest(TOP_K, ids.items(), key=lambda c: (c[1], pops[c[0]]))
+            top[p] = [f.tell() // 4, len(best)]
+            f.write(struct.pack(f"<{len(best)}I", *(rid | (EXACT if ex else 0) for rid, ex in best)))
+    return top
+
+# ---------- lookup ----------
+class LocalGeocoder:
+    def __init__(self, index_dir, cache_size: int = 512):
+        d = Path(index_dir)
+        self._files = [open(d / n, "rb") for n in ("keys.bin", "records.bin", "names.bin")]
+        self._keys, self._recs, self._names = (self._map(f) for f in self._files)
+        self.n_keys = len(self._keys) // KEY_FMT.size
+        # индекс, собранный до top.bin, работает и без него (полный проход по диапазону)
+        try:
+            self._top = json.loads((d / "meta.json").read_text(encoding="utf-8")).get("top") or {}
+            self._top_bin = (d / "top.bin").read_bytes() if self._top else b""
+        except (OSError, ValueError):
+            self._top, self._top_bin = {}, b""
+        self._cache = OrderedDict(); self.cache_size = cache_size
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _map(f):
+        # mmap не умеет отображать пустой файл
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if Path(f.name).stat().st_size else b""
+
+    @classmethod
+    def open(cls, index_dir):
+        # None, если индекс ещё не собран
+        return cls(index_dir) if (Path(index_dir) / "keys.bin").exists() else None
+
+    def _key_at(self, i):
+        o = i * KEY_FMT.size
+        return self._keys[o:o + KEY_LEN]
+
+    def _range(self, token):
+        # [lo, hi) — ключи, начинающиеся с префикса token
+        q = _key(token); n = len(q)
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            m = (lo + hi) // 2
+            if self._key_at(m) < q: lo = m + 1
+            else: hi = m
+        start, hi = lo, self.n_keys
+        while lo < hi:
+            m = (lo + hi) // 2
+            if self._key_at(m)[:n] <= q: lo = m + 1
+            else: hi = m
+        return start, lo
+
+    def _prefix_ids(self, token, rng, cap):
+        # -> {rid: слово совпало целиком}; диапазон шире cap режется по населению, а не по порядку байт
+        lo, hi = rng
+        if hi - lo > cap and token in self._top:
+            off, n = self._top[token]
+            return {v & ~EXACT: bool(v & EXACT) for v in struct.unpack_from(f"<{n}I", self._top_bin, off * 4)}
+        out = {}
+        exact = _key(token).ljust(KEY_LEN, b"\0")
+        for i in range(lo, hi):
+            k, rid = KEY_FMT.unpack_from(self._keys, i * KEY_FMT.size)
+            out[rid] = out.get(rid, False) or k == exact
+        if len(out) > cap:
+            out = dict(heapq.nlargest(cap, out.items(), key=lambda c: (c[1], self._population(c[0]))))
+        return out
+
+    def _population(self, rid):
+        return REC_FMT.unpack_from(self._recs, rid * REC_FMT.size)[4]
+
+    def record(self, rid):
+        off, ln, lat, lon, pop, cc = REC_FMT.unpack_from(self._recs, rid * REC_FMT.size)
+        return {"name": self._names[off:off + ln].decode("utf-8", "replace"),
+                "country": cc.decode("ascii", "replace").strip(),
+                "lat": round(lat, 6), "lon": round(lon, 6), "population": pop}
+
+    def search(self, query: str, limit: int = 8, cap: int = 20000):
+        q = normalize(query)
+        if not q or not self.n_keys:
+            return []
+        ck = (q, limit)
+        with self._lock:
+            if ck in self._cache:
+                self._cache.move_to_end(ck); return self._cache[ck]
+        # база — самое избирательное слово; остальные проверяются по своим диапазонам ключей
+        # (включая альтернативные имена), а слишком широкие — по словам названия
+        rngs = sorted(((self._range(t), t) for t in set(q.split())), key=lambda r: r[0][1] - r[0][0])
+        (rng, base), rest = rngs[0], rngs[1:]
+        cands = self._prefix_ids(base, rng, cap)
+        loose = []
+        for rng, t in rest:
+            if rng[1] - rng[0] > cap:
+                loose.append(t); continue
+            other = self._prefix_ids(t, rng, cap)
+            cands = {rid: ex for rid, ex in cands.items() if rid in other}
+        # короткие префиксы дают тысячи кандидатов: дешёвый предотбор (целое слово, население)
+        if len(cands) > limit * 50:
+            cands = dict(heapq.nlargest(limit * 50, cands.items(),
+                                        key=lambda c: (c[1], self._population(c[0]))))
+        best = {}
+        long_toks = [t for t in q.split() if len(t.encode("utf-8")) > KEY_LEN]
+        for rid in cands:
+            r = self.record(rid)
+            nn = normalize(r["name"]); words = nn.split()
+            if not all(any(w.startswith(t) for w in words) for t in loose + long_toks):
+                continue
+            rank = 3 if nn == q else 2 if nn.startswith(q) else 1
+            score = rank * 100.0 + math.log10(r["population"] + 1) * 5.0 - len(nn) * 0.01
+            r["display"] = f"{r['name']}, {r['country']}" if r["country"] else r["name"]
+            r["score"] = round(score, 3)
+            best[rid] = r
+        res = sorted(best.values(), key=lambda r: -r["score"])[:limit]
+        with self._lock:
+            self._cache[ck] = res
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return res
+
+    def close(self):
+        for m in (self._keys, self._recs, self._names):
+            if isinstance(m, mmap.mmap): m.close()
+        for f in self._files:
+            f.close()
+
+# ---------- remote fallback ----------
+class RateLimiter:
+    def __init__(self, min_interval: float = 1.0):
+        self.min_interval = min_interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, max_wait: float = 5.0) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            if at - now > max_wait:
+                return False
+            self._next = at + self.min_interval
+        time.sleep(max(0.0, at - now))
+        return True
+
+class ResultCache:
+    # постоянный LRU-кэш результатов (SQLite), общий для всех источников
+    def __init__(self, path, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results(q TEXT PRIMARY KEY, result TEXT, used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results(used)")
+
+    def get(self, q):
+        with self._lock:
+            row = self._db.execute("SELECT result FROM results WHERE q=?", (q,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE results SET used=? WHERE q=?", (time.time(), q))
+        return json.loads(row[0])
+
+    def put(self, q, result):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES(?,?,?)",
+                             (q, json.dumps(result, ensure_ascii=False), time.time()))
+            n = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if n > self.max_entries:
+                self._db.execute("DELETE FROM results WHERE q IN (SELECT q FROM results"
+                                 " ORDER BY used LIMIT ?)", (n - self.max_entries,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class Geocoder:
+    def __init__(self, index_dir, cache_path, remote: bool = True, url: str = NOMINATIM,
+                 min_interval: float = 1.0, timeout: float = 10.0):
+        self.index_dir = index_dir
+        self.local = LocalGeocoder.open(index_dir)
+        self.cache = ResultCache(cache_path)
+        self.remote = remote
+        self.url = url
+        self.timeout = timeout
+        self.limiter = RateLimiter(min_interval)
+
+    def suggest(self, query: str, limit: int = 8):
+        return self.local.search(query, limit) if self.local else []
+
+    def _remote(self, query, limit):
+        if not self.limiter.wait():
+            raise RuntimeError("remote geocoder rate limit, try again shortly")
+        qs = urllib.parse.urlencode({"format": "json", "q": query, "limit": limit})
+        req = urllib.request.Request(f"{self.url}?{qs}", headers={"User-Agent": USER_AGENT})
+        with urllib.request.urlopen(req, timeout=self.timeout) as r:
+            data = json.loads(r.read().decode("utf-8"))
+        return [{"name": d.get("name") or d.get("display_name", ""), "display": d.get("display_name", ""),
+                 "lat": float(d["lat"]), "lon": float(d["lon"]), "country": "", "population": 0}
+                for d in data]
+
+    def search(self, query: str, limit: int = 8):
+        # -> (results, source): local | cache | remote
+        res = self.suggest(query, limit)
+        if res or not self.remote or not normalize(query):
+            return res, "local"
+        ck = f"{normalize(query)}|{limit}"
+        cached = self.cache.get(ck)
+        if cached is not None:
+            return cached, "cache"
+        res = self._remote(query, limit)
+        self.cache.put(ck, res)
+        return res, "remote"
+
+    def close(self):
+        if self.local: self.local.close()
+        self.cache.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        t0 = time.perf_counter()
+        info = build_index(sys.argv[2], sys.argv[3])
+        print(f"{info['records']} records, {info['keys']} keys in {time.perf_counter() - t0:.1f} s")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "query":
+        g = LocalGeocoder(sys.argv[2])
+        for r in g.search(" ".join(sys.argv[3:])):
+            print(f"{r['display']}\t{r['lat']}\t{r['lon']}\t{r['population']}")
+    else:
+        print("usage: geochange_geocoder.py build <geonames.tsv> <out_dir>\n"
+              "       geochange_geocoder.py query <index_dir> <text>")
@@ -0,0 +1,97 @@
+# geochange_logs.py
+# Log pipeline for long-running tools: worker threads write into a bounded buffer,
+# the GUI drains it in batches on a timer. Строки с \r (прогресс) схлопываются в одну,
+# полный лог при желании пишется в файл с ротацией.
+
+import codecs, logging, logging.handlers, re, threading
+from collections import deque
+
+# виды записей: line — обычная строка; progress — заменяет предыдущую progress-строку;
+# final — последняя версия progress-строки (заменяет её и дальше не перезаписывается)
+LINE, PROGRESS, FINAL = "line", "progress", "final"
+
+class LogBuffer:
+    def __init__(self, maxlen: int = 10000, path=None, max_bytes: int = 5 << 20, backups: int = 3):
+        self.maxlen = maxlen
+        self.dropped = 0
+        self._q = deque()
+        self._lock = threading.Lock()
+        self._file = None
+        if path is not None:
+            self._file = logging.getLogger(f"geochange.log.{id(self)}")
+            self._file.propagate = False; self._file.setLevel(logging.INFO)
+            h = logging.handlers.RotatingFileHandler(str(path), maxBytes=max_bytes,
+                                                     backupCount=backups, encoding="utf-8")
+            h.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self._file.addHandler(h)
+
+    def write(self, text: str, kind: str = LINE):
+        with self._lock:
+            if kind != LINE and self._q and self._q[-1][1] == PROGRESS:
+                self._q[-1] = (text, kind)          # промежуточный кадр прогресса GUI не увидит
+            else:
+                if len(self._q) >= self.maxlen:
+                    self._q.popleft(); self.dropped += 1
+                self._q.append((text, kind))
+        if self._file is not None and kind != PROGRESS:
+            self._file.info(text)
+
+    def write_text(self, text: str):
+        # многострочный текст (вывод run_check и т.п.) — построчно
+        for line in text.splitlines() or [""]:
+            self.write(line)
+
+    def drain(self):
+        # -> ([(text, kind), ...], сколько строк выпало из-за переполнения)
+        with self._lock:
+            items, dropped = list(self._q), self.dropped
+            self._q.clear(); self.dropped = 0
+        return items, dropped
+
+    def close(self):
+        if self._file is not None:
+            for h in list(self._file.handlers):
+                h.close(); self._file.removeHandler(h)
+
+class LineDecoder:
+    # побайтовый вывод процесса -> записи LogBuffer; \r\n и \n — конец строки, одиночный \r — перезапись
+    _SPLIT = re.compile(r"(\r\n|\n|\r)")
+
+    def __init__(self, encoding: str = "utf-8"):
+        self._dec = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._pending = ""
+        self._after_cr = False
+
+    def feed(self, data: bytes, final: bool = False):
+        text = self._pending + self._dec.decode(data, final)
+        if text.endswith("\r") and not final:
+            text, self._pending = text[:-1], "\r"    # \r\n может прийти в двух кусках
+        else:
+            self._pending = ""
+        parts = self._SPLIT.split(text)
+        out = []
+        for i in range(0, len(parts) - 1, 2):
+            seg, sep = parts[i], parts[i + 1]
+            if sep == "\r":
+                if seg:
+                    out.append((seg, PROGRESS)); self._after_cr = True
+            else:
+                out.append((seg, FINAL if self._after_cr else LINE)); self._after_cr = False
+        self._pending = parts[-1] + self._pending
+        if final and self._pending:
+            out.append((self._pending, FINAL if self._after_cr else LINE))
+            self._pending = ""; self._after_cr = False
+        return out
+
+def pump(stream, sink, encoding: str = "utf-8", chunk: int = 4096):
+    # читает бинарный stdout до EOF; sink(text, kind) — обычно LogBuffer.write
+    dec = LineDecoder(encoding)
+    read = getattr(stream, "read1", stream.read)
+    while True:
+        data = read(chunk)
+        if not data:
+            break
+        for text, kind in dec.feed(data):
+            sink(text, kind)
+    for text, kind in dec.feed(b"", final=True):
+        sink(text, kind)
@@ -0,0 +1,196 @@
+# geochange_metrics.py
+# Latency instrumentation: per (operation, device) rolling histograms with p50/p95/p99 and
+# error counts, a span ring buffer exportable as JSON lines or Chrome trace (chrome://tracing,
+# Perfetto), and an opt-in watchdog that samples the GUI thread's stack while it is stalled.
+# Без Qt: используется ядром, консолью, CLI/демоном и окном.
+
+import functools, json, os, sys, threading, time, traceback
+from collections import Counter, deque
+
+WINDOW = 1024                   # последних замеров на операцию для перцентилей
+TRACE_MAX = 50000               # спанов в кольцевом буфере для экспорта
+
+def _pct(sorted_vals, q: float):
+    if not sorted_vals:
+        return None
+    i = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return round(sorted_vals[i], 2)
+
+class Histogram:
+    def __init__(self, window: int = WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0; self.errors = 0
+        self.total_ms = 0.0; self.max_ms = 0.0
+        self.last_error = ""
+
+    def add(self, ms: float, ok: bool = True, error: str = ""):
+        self.samples.append(ms)
+        self.count += 1; self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if not ok:
+            self.errors += 1; self.last_error = error
+
+    def summary(self):
+        vals = sorted(self.samples)
+        return {"count": self.count, "errors": self.errors,
+                "mean": round(self.total_ms / self.count, 2) if self.count else None,
+                "p50": _pct(vals, 0.50), "p95": _pct(vals, 0.95), "p99": _pct(vals, 0.99),
+                "max": round(self.max_ms, 2), "last_error": self.last_error}
+
+class _Span:
+    __slots__ = ("m", "op", "device", "args", "t0", "error")
+
+    def __init__(self, m, op, device, args):
+        self.m, self.op, self.device, self.args = m, op, device, args
+        self.error = None
+
+    def fail(self, error: str):
+        # ошибка без исключения (например, ненулевой код возврата)
+        self.error = error or "failed"
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, et, ev, tb):
+        err = self.error if et is None else (str(ev) or et.__name__)
+        self.m.record(self.op, (time.perf_counter() - self.t0) * 1000.0, self.device,
+                      not err, err or "", t0=self.t0, args=self.args)
+        return False
+
+class Metrics:
+    def __init__(self, window: int = WINDOW, trace_max: int = TRACE_MAX):
+        self.window = window
+        self.enabled = os.environ.get("GEOCHANGE_METRICS", "1") != "0"
+        self._hist = {}                             # (op, device) -> Histogram
+        self._trace = deque(maxlen=trace_max)       # (op, device, t0, ms, ok, tid, thread, args)
+        self._lock = threading.Lock()
+        self._epoch = time.time() - time.perf_counter()   # perf_counter -> время эпохи
+
+    def timer(self, op: str, device: str = "", **args) -> _Span:
+        return _Span(self, op, device or "", args or None)
+
+    def record(self, op: str, ms: float, device: str = "", ok: bool = True, error: str = "",
+               t0: float = None, args=None):
+        if not self.enabled:
+            return
+        t = threading.current_thread()
+        if t0 is None:
+            t0 = time.perf_counter() - ms / 1000.0
+        with self._lock:
+            h = self._hist.get((op, device or ""))
+            if h is None:
+                h = self._hist[(op, device or "")] = Histogram(self.window)
+            h.add(ms, ok, error)
+            self._trace.append((op, device or "", t0, ms, ok, t.ident, t.name,
+                                dict(args or {}, error=error) if error else args))
+
+    def snapshot(self):
+        with self._lock:
+            items = [(k, h.summary()) for k, h in self._hist.items()]
+        return [dict(op=op, device=dev, **s) for (op, dev), s in sorted(items)]
+
+    def reset(self):
+        with self._lock:
+            self._hist.clear(); self._trace.clear()
+
+    def spans(self):
+        with self._lock:
+            return list(self._trace)
+
+    # --- export
+    def export_jsonl(self, path):
+        # спаны по строке, затем строка сводки на каждую операцию
+        with open(path, "w", encoding="utf-8") as f:
+            for op, dev, t0, ms, ok, tid, tname, args in self.spans():
+                rec = {"type": "span", "ts": round(self._epoch + t0, 6), "op": op, "device": dev,
+                       "ms": round(ms, 3), "ok": ok, "thread": tname}
+                if args:
+                    rec["args"] = args
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            for s in self.snapshot():
+                f.write(json.dumps(dict(type="stats", **s), ensure_ascii=False) + "\n")
+
+    def export_chrome_trace(self, path):
+        # Trace Event Format: полные события "X" в микросекундах + имена потоков
+        pid = os.getpid(); events = []; names = {}
+        for op, dev, t0, ms, ok, tid, tname, args in self.spans():
+            names[tid] = tname
+            a = dict(args or {}); a["ok"] = ok
+            if dev:
+                a["device"] = dev
+            events.append({"name": f"{op} {dev}" if dev else op, "cat": op.split(".", 1)[0].split(" ", 1)[0],
+                           "ph": "X", "ts": round(t0 * 1e6, 1), "dur": round(ms * 1000.0, 1),
+                           "pid": pid, "tid": tid, "args": a})
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": n}}
+                   for tid, n in names.items()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+METRICS = Metrics()
+
+def instrument(op: str, metrics: Metrics = None):
+    # декоратор: каждый вызов — спан op (исключение считается ошибкой и пробрасывается)
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            with (metrics or METRICS).timer(op):
+                return fn(*a, **kw)
+        return wrapper
+    return deco
+
+# ---------- GUI stall watchdog ----------
+class StallWatchdog:
+    # GUI-поток вызывает beat() по таймеру; если пульса нет дольше threshold_ms, сторожевой
+    # поток снимает стек GUI-потока каждые interval_ms (сэмплирующий профайлер) до конца зависания
+    def __init__(self, thread_id: int, threshold_ms: float = 200.0, interval_ms: float = 20.0,
+                 metrics: Metrics = None, on_stall=None):
+        self.thread_id = thread_id
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.metrics = metrics or METRICS
+        self.on_stall = on_stall                    # on_stall(info) из потока сторожа
+        self.stalls = 0
+        self._last = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def beat(self):
+        self._last = time.perf_counter()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stall-watchdog", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return None
+        return tuple(f"{os.path.basename(fs.filename)}:{fs.lineno} {fs.name}"
+                     for fs in traceback.extract_stack(frame)[-12:])
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            last = self._last
+            if time.perf_counter() - last < self.threshold:
+                continue
+            # зависание: сэмплируем, пока GUI-поток не отметится снова
+            leaves, stacks = Counter(), Counter()
+            while self._last == last and not self._stop.wait(self.interval):
+                st = self._sample()
+                if st:
+                    stacks[st] += 1; leaves[st[-1]] += 1
+            ms = (time.perf_counter() - last) * 1000.0
+            self.stalls += 1
+            top = stacks.most_common(1)
+            info = {"ms": round(ms, 1), "samples": sum(stacks.values()),
+                    "hot": [f"{n}x {leaf}" for leaf, n in leaves.most_common(5)],
+                    "stack": list(top[0][0]) if top else []}
+            self.metrics.record("gui.stall", ms, ok=True, t0=last, args=info)
+            if self.on_stall:
+                self.on_stall(info)
@@ -0,0 +1,294 @@
+# geochange_profiles.py
+# Host-aware emulator launch profiles: one cached host probe (cores, RAM, GPU, display,
+# hardware acceleration), per-profile -cores/-memory/-gpu/window/boot-animation/snapshot
+# flags, matching AVD config.ini keys and per-profile startup/steady-state resource records.
+# Без Qt. Зонд хоста дорогой (запуск `emulator -accel-check`) — результат кэшируется в JSON.
+
+import glob, json, os, platform, subprocess, sys, threading, time
+from pathlib import Path
+
+from geochange_farm import host_memory_mb, ProcSampler, psutil
+
+HOST_CACHE = "host_profile.json"
+STATS_FILE = "profile_stats.jsonl"
+MIN_CORES, MIN_MEM_MB = 2, 2048
+NET_ARGS = ["-netdelay", "none", "-netspeed", "full"]
+
+# доли ресурсов хоста на один экземпляр; snapshot: nosave — -no-snapshot-save (быстрый
+# старт из снимка geochange_ready), none — -no-snapshot (всегда холодный, без записи на диск; CI)
+PROFILES = {
+    "performance": {"cores_frac": 0.5, "max_cores": 8, "mem_frac": 0.25, "max_mem_mb": 8192,
+                    "boot_anim": False, "snapshot": "nosave"},
+    "balanced":    {"cores_frac": 0.25, "max_cores": 4, "mem_frac": 1 / 6, "max_mem_mb": 4096,
+                    "boot_anim": False, "snapshot": "nosave"},
+    "light":       {"cores_frac": 0.0, "max_cores": 2, "mem_frac": 0.0, "max_mem_mb": 2048,
+                    "boot_anim": False, "snapshot": "nosave"},
+    "ci":          {"cores_frac": 0.0, "max_cores": 2, "mem_frac": 0.0, "max_mem_mb": 2048,
+                    "boot_anim": False, "snapshot": "none"},
+}
+PROFILE_NAMES = ("auto", *PROFILES)
+
+# ---------- host probe ----------
+_host = None
+_host_lock = threading.Lock()
+
+def _headless() -> bool:
+    v = os.environ.get("GEOCHANGE_HEADLESS")
+    if v is not None:
+        return v not in ("", "0")
+    if sys.platform.startswith("linux"):
+        return not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+    return False
+
+def _gpu() -> bool:
+    # Linux: render-узел DRM; Windows/macOS — драйвер дисплея есть всегда
+    if sys.platform.startswith("linux"):
+        return bool(glob.glob("/dev/dri/renderD*"))
+    return True
+
+def _accel(emulator):
+    # -> (ok | None, текст) по `emulator -accel-check`; если эмулятора нет — по /dev/kvm
+    if emulator:
+        try:
+            p = subprocess.run([str(emulator), "-accel-check"], capture_output=True, text=True, timeout=20)
+            lines = [l.strip() for l in (p.stdout + p.stderr).splitlines() if l.strip() and l.strip() != "accel:"]
+            return p.returncode == 0, " ".join(l for l in lines if not l.isdigit())
+        except subprocess.TimeoutExpired as e:
+            return None, str(e)
+        except OSError:
+            pass
+    if sys.platform.startswith("linux"):
+        ok = os.access("/dev/kvm", os.R_OK | os.W_OK)
+        return ok, "/dev/kvm usable" if ok else "/dev/kvm missing or not accessible"
+    return None, "unknown"
+
+def _host_key(emulator):
+    total, _ = host_memory_mb()
+    return {"node": platform.node(), "platform": sys.platform, "cpus": os.cpu_count(), "mem_total_mb": total,
+            "emulator": str(emulator or "")}
+
+def probe_host(emulator=None, cache_path=None, refresh: bool = False):
+    # -> dict; кэш в памяти и (если задан cache_path) на диске, пока не сменились хост/эмулятор.
+    # headless и свободная память не кэшируются — они меняются между сеансами
+    global _host
+    key = _host_key(emulator)
+    with _host_lock:
+        host = _host if _host is not None and _host["key"] == key and not refresh else None
+        if host is None and cache_path and not refresh:
+            try:
+                cached = json.loads(Path(cache_path).read_text(encoding="utf-8"))
+                host = cached if cached.get("key") == key else None
+            except (OSError, ValueError):
+                pass
+        if host is None:
+            t0 = time.perf_counter()
+            ok, info = _accel(emulator)
+            host = {"key": key, "cpus": key["cpus"] or 2, "mem_total_mb": key["mem_total_mb"], "gpu": _gpu(),
+                    "accel": ok, "accel_info": info, "probed": time.time(),
+                    "probe_ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+            if cache_path:
+                try:
+                    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+                    Path(cache_path).write_text(json.dumps(host, indent=1), encoding="utf-8")
+                except OSError:
+                    pass
+        _host = host
+    _, avail = host_memory_mb()
+    return dict(host, headless=_headless(), mem_avail_mb=avail)
+
+# ---------- plans ----------
+def auto_profile(host) -> str:
+    mem = host.get("mem_total_mb") or 0
+    if host["cpus"] >= 8 and mem >= 16384:
+        return "performance"
+    if host["cpus"] >= 4 and mem >= 8192:
+        return "balanced"
+    return "light"
+
+def make_plan(profile: str, host, instances: int = 1):
+    # -> {"profile", "cores", "memory_mb", "gpu", "window", "boot_anim", "snapshot", "args", "config", "notes"}
+    name = profile if profile in PROFILES else auto_profile(host)
+    p = PROFILES[name]; instances = max(1, int(instances)); notes = []
+    cpus = host["cpus"]; total = host.get("mem_total_mb") or 0
+    cores = max(MIN_CORES, min(p["max_cores"], int(cpus * p["cores_frac"])))
+    cores = max(1, min(cores, cpus // instances or 1))
+    mem = max(MIN_MEM_MB, min(p["max_mem_mb"], int(total * p["mem_frac"])))
+    if total:
+        mem = max(MIN_MEM_MB, min(mem, (total - 2048) // instances))
+    mem -= mem % 256
+    if host.get("mem_avail_mb") and host["mem_avail_mb"] < mem * instances:
+        notes.append(f"only {host['mem_avail_mb']} MB free for {instances} x {mem} MB")
+    window = not host.get("headless")
+    if not window:
+        gpu = "swiftshader_indirect"; notes.append("headless host: -no-window, software GPU")
+    elif not host.get("gpu"):
+        gpu = "swiftshader_indirect"; notes.append("no GPU render node: software GPU")
+    else:
+        gpu = "host"
+    if host.get("accel") is False:
+        notes.append(f"no hardware acceleration ({host.get('accel_info') or 'unknown'}): boot will be very slow")
+    args = [*NET_ARGS, "-cores", str(cores), "-memory", str(mem), "-gpu", gpu]
+    if not window: args.append("-no-window")
+    if not p["boot_anim"]: args.append("-no-boot-anim")
+    args += {"nosave": ["-no-snapshot-save"], "none": ["-no-snapshot"]}.get(p["snapshot"], [])
+    config = {"hw.cpu.ncore": str(cores), "hw.ramSize": str(mem), "hw.gpu.enabled": "yes", "hw.gpu.mode": gpu,
+              "fastboot.forceColdBoot": "yes" if p["snapshot"] == "none" else "no"}
+    return {"profile": name, "requested": profile, "instances": instances, "cores": cores, "memory_mb": mem,
+            "gpu": gpu, "window": window, "boot_anim": p["boot_anim"], "snapshot": p["snapshot"],
+            "args": args, "config": config, "notes": notes}
+
+def _ini_value(k, v):
+    # hw.ramSize пишется и как "2048", и как "2048M"/"2G"; yes/no — в любом регистре
+    v = v.strip().lower()
+    if k == "hw.ramSize" and v[-1:] in ("m", "g") and v[:-1].isdigit():
+        return str(int(v[:-1]) * (1024 if v[-1] == "g" else 1))
+    return v
+
+def apply_config(avd_dir, plan):
+    # config.ini AVD под профиль; -> список изменённых ключей (порядок строк и комментарии сохраняются).
+    # Смена hw.ramSize/ncore делает снимок быстрого старта непригодным — решает вызывающий
+    path = Path(avd_dir) / "config.ini"
+    try:
+        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return []
+    want, changed, seen = plan["config"], [], set()
+    for i, line in enumerate(lines):
+        k, sep, v = line.partition("=")
+        k = k.strip()
+        if sep and k in want:
+            seen.add(k)
+            if _ini_value(k, v) != _ini_value(k, want[k]):
+                lines[i] = f"{k}={want[k]}"; changed.append(k)
+    for k, v in want.items():
+        if k not in seen:
+            lines.append(f"{k}={v}"); changed.append(k)
+    if changed:
+        tmp = path.with_name("config.ini.part")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp.replace(path)
+    return changed
+
+# ---------- resource records ----------
+_stats_lock = threading.Lock()
+
+def _tree(pid):
+    # emulator — лаунчер, основная нагрузка в дочернем qemu-system-*
+    if psutil is None:
+        return [pid]
+    try:
+        return [pid] + [c.pid for c in psutil.Process(pid).children(recursive=True)]
+    except Exception:
+        return [pid]
+
+class ResourceRecorder:
+    # фазы: startup (от запуска до ready()) и steady (steady_s секунд после); итог — строка JSONL
+    def __init__(self, pid: int, plan, path=None, name: str = "", steady_s: float = 60.0, interval: float = 1.0,
+                 on_done=None):
+        self.pid, self.plan, self.path, self.name = pid, plan, path, name
+        self.steady_s, self.interval, self.on_done = steady_s, interval, on_done
+        self._sampler = ProcSampler()
+        self._phase = "startup"; self._t0 = time.monotonic(); self._ready_at = None; self._boot_s = None
+        self._samples = {"startup": [], "steady": []}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"res-{pid}", daemon=True)
+
+    def start(self):
+        self._thread.start(); return self
+
+    def ready(self, boot_s: float = None):
+        now = time.monotonic()
+        self._boot_s = round(now - self._t0, 1) if boot_s is None else round(boot_s, 1)
+        self._ready_at = now; self._phase = "steady"
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def steady(self) -> bool:
+        return self._ready_at is not None
+
+    def _sample(self):
+        cpu = rss = None
+        for pid in _tree(self.pid):
+            c, r = self._sampler.sample(pid)
+            if c is not None: cpu = (cpu or 0.0) + c
+            if r is not None: rss = (rss or 0) + r
+        return cpu, rss
+
+    def _run(self):
+        alive = True
+        while not self._stop.wait(self.interval):
+            cpu, rss = self._sample()
+            if rss is None:
+                alive = False; break           # процесс завершился
+            self._samples[self._phase].append((cpu, rss))
+            if self._ready_at is not None and time.monotonic() - self._ready_at >= self.steady_s:
+                break
+        row = self.summary(complete=alive and not self._stop.is_set())
+        if self.path:
+            with _stats_lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+        if self.on_done:
+            self.on_done(row)
+
+    @staticmethod
+    def _agg(samples):
+        cpu = [c for c, _ in samples if c is not None]; rss = [r for _, r in samples]
+        return {"samples": len(samples), "cpu_avg": round(sum(cpu) / len(cpu), 1) if cpu else None,
+                "cpu_max": max(cpu, default=None), "rss_avg_mb": round(sum(rss) / len(rss)) if rss else None,
+                "rss_max_mb": max(rss, default=None)}
+
+    def summary(self, complete: bool = False):
+        p = self.plan
+        return {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "profile": p["profile"], "name": self.name,
+                "cores": p["cores"], "memory_mb": p["memory_mb"], "gpu": p["gpu"], "window": p["window"],
+                "instances": p["instances"], "boot_s": self._boot_s, "complete": complete,
+                "startup": self._agg(self._samples["startup"]), "steady": self._agg(self._samples["steady"])}
+
+class FleetRecorder:
+    # подписчик EmulatorFarm.subscribe: по регистратору на экземпляр (booting -> running -> stopped)
+    def __init__(self, plan, path=None, steady_s: float = 60.0):
+        self.plan, self.path, self.steady_s = plan, path, steady_s
+        self._recs = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, instances):
+        with self._lock:
+            for i in instances:
+                rec = self._recs.get(i["name"])
+                if rec is not None and rec.pid != i["pid"]:
+                    rec.stop(); rec = None          # перезапуск экземпляра
+                if rec is None and i["pid"] and i["state"] == "booting":
+                    rec = self._recs[i["name"]] = ResourceRecorder(i["pid"], self.plan, self.path, i["name"],
+                                                                   self.steady_s).start()
+                if rec is None:
+                    continue
+                if i["state"] == "running" and not rec.steady:
+                    rec.ready(i["boot_s"])
+                elif i["state"] in ("failed", "stopping", "stopped"):
+                    rec.stop(); self._recs.pop(i["name"], None)
+
+def load_stats(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(l) for l in f if l.strip()]
+    except (OSError, ValueError):
+        return []
+
+def summarize(rows):
+    # -> строки по (профиль, cores, memory, gpu): запуски, медиана загрузки, средние CPU/RSS по фазам
+    groups = {}
+    for r in rows:
+        groups.setdefault((r["profile"], r["cores"], r["memory_mb"], r["gpu"]), []).append(r)
+    out = []
+    for (profile, cores, mem, gpu), rs in sorted(groups.items()):
+        boots = sorted(r["boot_s"] for r in rs if r.get("boot_s") is not None)
+        def avg(phase, k):
+            v = [r[phase][k] for r in rs if r[phase].get(k) is not None]
+            return round(sum(v) / len(v), 1) if v else None
+        out.append({"profile": profile, "cores": cores, "memory_mb": mem, "gpu": gpu, "runs": len(rs),
+                    "boot_s_p50": boots[len(boots) // 2] if boots else None,
+                    "startup_cpu_avg": avg("startup", "cpu_avg"), "startup_rss_max_mb": avg("startup", "rss_max_mb"),
+                    "steady_cpu_avg": avg("steady", "cpu_avg"), "steady_rss_avg_mb": avg("steady", "rss_avg_mb")})
+    return out
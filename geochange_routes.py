@@ -0,0 +1,367 @@
+# geochange_routes.py
+# GPX/KML/GeoJSON track parsing (streaming) and timed route playback.
+# Точки хранятся компактно в array('d'); планировщик на monotonic-часах без дрейфа.
+
+import json, math, threading, time
+import xml.etree.ElementTree as ET
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+
+EARTH_R = 6371008.8
+MIN_RATE_HZ, MAX_RATE_HZ = 1.0, 20.0
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1; dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_R * math.asin(min(1.0, math.sqrt(a)))
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dl = math.radians(lon2 - lon1)
+    y = math.sin(dl) * math.cos(p2)
+    x = math.cos(p1) * math.sin(p2) - math.sin(p1) * math.cos(p2) * math.cos(dl)
+    return (math.degrees(math.atan2(y, x)) + 360.0) % 360.0
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+# ---------- parsers (generators of (lat, lon)) ----------
+def _iter_xml(fp, handle):
+    # обработанные элементы удаляются из родителя — память не растёт с длиной трека
+    stack = []
+    for ev, el in ET.iterparse(fp, events=("start", "end")):
+        if ev == "start":
+            stack.append(el); continue
+        stack.pop()
+        pts = handle(el, stack[-1] if stack else None)
+        if pts is not None:
+            yield from pts
+            if stack:
+                stack[-1].remove(el)
+
+def iter_gpx_points(fp):
+    def handle(el, parent):
+        if _local(el.tag) in ("trkpt", "rtept"):
+            return [(float(el.get("lat")), float(el.get("lon")))]
+        return None
+    yield from _iter_xml(fp, handle)
+
+def _kml_coords(text):
+    for tup in text.split():
+        parts = tup.split(",")
+        if len(parts) >= 2:
+            yield float(parts[1]), float(parts[0])
+
+def iter_kml_points(fp):
+    def handle(el, parent):
+        tag = _local(el.tag)
+        if tag == "coordinates":
+            # точки Placemark/Point — не часть трека
+            if el.text and parent is not None and _local(parent.tag) == "LineString":
+                return list(_kml_coords(el.text))
+            return []
+        if tag == "coord" and el.text:            # gx:Track: "lon lat alt"
+            parts = el.text.split()
+            return [(float(parts[1]), float(parts[0]))]
+        return None
+    yield from _iter_xml(fp, handle)
+
+def iter_geojson_features(fp, chunk: int = 1 << 16):
+    # FeatureCollection читается по одному feature (raw_decode по буферу);
+    # одиночный Feature/Geometry без "features" разбирается целиком
+    dec = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = fp.read(chunk)
+        if not data:
+            eof = True
+        buf = buf[pos:] + data; pos = 0
+
+    scan = 0
+    while True:
+        i = buf.find('"features"', scan)
+        if i >= 0:
+            pos = i + len('"features"'); break
+        if eof:
+            doc = json.loads(buf)
+            if doc.get("type") == "FeatureCollection":
+                yield from doc.get("features") or []
+            elif doc.get("type") == "Feature":
+                yield doc
+            else:
+                yield {"type": "Feature", "geometry": doc, "properties": {}}
+            return
+        scan = max(0, len(buf) - len('"features"'))
+        fill()
+
+    expect = ":["
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        if pos >= len(buf):
+            if eof: raise ValueError("truncated GeoJSON")
+            fill(); continue
+        c = buf[pos]
+        if expect:
+            if c != expect[0]:
+                raise ValueError("malformed GeoJSON features array")
+            expect = expect[1:]; pos += 1; continue
+        if c == "]":
+            return
+        if c == ",":
+            pos += 1; continue
+        try:
+            obj, end = dec.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof: raise
+            fill(); continue
+        pos = end
+        yield obj
+
+def _geometry_lines(geom):
+    t = (geom or {}).get("type"); c = (geom or {}).get("coordinates") or []
+    if t == "LineString":
+        yield c
+    elif t == "MultiLineString":
+        yield from c
+    elif t == "GeometryCollection":
+        for g in geom.get("geometries") or []:
+            yield from _geometry_lines(g)
+
+def iter_geojson_points(fp):
+    for feat in iter_geojson_features(fp):
+        for line in _geometry_lines(feat.get("geometry")):
+            for xy in line:
+                yield float(xy[1]), float(xy[0])
+
+def iter_route_points(path):
+    ext = Path(path).suffix.lower()
+    if ext == ".gpx":
+        with open(path, "rb") as fp: yield from iter_gpx_points(fp)
+    elif ext == ".kml":
+        with open(path, "rb") as fp: yield from iter_kml_points(fp)
+    elif ext in (".geojson", ".json"):
+        with open(path, "r", encoding="utf-8") as fp: yield from iter_geojson_points(fp)
+    else:
+        raise ValueError(f"unsupported route format: {ext or path}")
+
+# ---------- route ----------
+class Route:
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.lat = array("d"); self.lon = array("d"); self.cum = array("d")
+
+    @classmethod
+    def from_points(cls, points, name: str = ""):
+        r = cls(name)
+        for lat, lon in points:
+            r.add(lat, lon)
+        if len(r) < 2:
+            raise ValueError("route needs at least two distinct points")
+        return r
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_points(iter_route_points(path), Path(path).name)
+
+    def add(self, lat: float, lon: float):
+        if self.lat:
+            d = haversine_m(self.lat[-1], self.lon[-1], lat, lon)
+            if d <= 0.0:
+                return
+            self.cum.append(self.cum[-1] + d)
+        else:
+            self.cum.append(0.0)
+        self.lat.append(lat); self.lon.append(lon)
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def length(self) -> float:
+        return self.cum[-1] if self.cum else 0.0
+
+    def position_at(self, dist: float):
+        # -> (lat, lon, bearing, index сегмента)
+        dist = min(max(dist, 0.0), self.length)
+        i = min(max(bisect_right(self.cum, dist) - 1, 0), len(self) - 2)
+        seg = self.cum[i + 1] - self.cum[i]
+        f = (dist - self.cum[i]) / seg if seg else 0.0
+        la1, lo1, la2, lo2 = self.lat[i], self.lon[i], self.lat[i + 1], self.lon[i + 1]
+        return (la1 + (la2 - la1) * f, lo1 + (lo2 - lo1) * f,
+                bearing_deg(la1, lo1, la2, lo2), i)
+
+    def simplified(self, max_points: int = 2000):
+        # для отрисовки на странице: прореживание + доля пройденного пути на точку
+        n = len(self); step = max(1, math.ceil(n / max_points))
+        idx = list(range(0, n, step))
+        if idx[-1] != n - 1:
+            idx.append(n - 1)
+        L = self.length or 1.0
+        return [[round(self.lat[i], 6), round(self.lon[i], 6), round(self.cum[i] / L, 6)]
+                for i in idx]
+
+# ---------- playback ----------
+class RoutePlayer:
+    # send(lat, lon, bearing, speed_mps) вызывается из потока плеера;
+    # on_progress(state: dict) — после каждой отправки
+    def __init__(self, send, on_progress=None, speed_mps: float = 13.9, rate_hz: float = 5.0):
+        self.send = send
+        self.on_progress = on_progress
+        self.route = None
+        self.speed = speed_mps
+        self.rate = rate_hz
+        self.loop = False
+        self.stats = {}
+        self._dist = 0.0
+        self._anchor = None          # monotonic-время начала текущего отрезка воспроизведения
+        self._kick = None            # разовое событие на паузе: "send" — отправка позиции (seek), "state" — только состояние
+        self._cv = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    # --- controls (потокобезопасны)
+    def load(self, route: Route):
+        with self._cv:
+            self.route = route; self._dist = 0.0; self._anchor = None
+            self.stats = {"ticks": 0, "late": 0, "max_late_ms": 0.0, "send_ms": 0.0, "errors": 0}
+            self._cv.notify()
+
+    @property
+    def playing(self) -> bool:
+        return self._anchor is not None
+
+    def _distance(self, now: float) -> float:
+        if self._anchor is None:
+            return self._dist
+        return self._dist + (now - self._anchor) * self.speed
+
+    def play(self):
+        with self._cv:
+            if self.route is None or self._anchor is not None:
+                return
+            if self._dist >= self.route.length:
+                self._dist = 0.0
+            self._anchor = time.monotonic()
+            self._ensure_thread()
+            self._cv.notify()
+
+    def pause(self):
+        with self._cv:
+            if self._anchor is not None:
+                # поток плеера сообщит playing=false, иначе страница считает маршрут играющим
+                self._kick = self._kick or "state"
+            self._dist = self._distance(time.monotonic()); self._anchor = None
+            self._cv.notify()
+
+    def seek(self, fraction: float):
+        with self._cv:
+            if self.route is None:
+                return
+            self._dist = min(max(fraction, 0.0), 1.0) * self.route.length
+            if self._anchor is not None:
+                self._anchor = time.monotonic()
+            else:
+                self._kick = "send"
+                self._ensure_thread()
+            self._cv.notify()
+
+    def set_loop(self, loop: bool):
+        with self._cv:
+            self.loop = bool(loop)
+
+    def set_speed(self, speed_mps: float):
+        with self._cv:
+            now = time.monotonic()
+            self._dist = self._distance(now)
+            if self._anchor is not None:
+                self._anchor = now
+            self.speed = max(0.0, float(speed_mps))
+
+    def set_rate(self, rate_hz: float):
+        with self._cv:
+            self.rate = min(max(float(rate_hz), MIN_RATE_HZ), MAX_RATE_HZ)
+            self._cv.notify()
+
+    def close(self):
+        with self._cv:
+            self._closed = True; self._anchor = None
+            self._cv.notify()
+
+    # --- internals
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="route-player", daemon=True)
+            self._thread.start()
+
+    def _state(self, send=False):
+        with self._cv:
+            r = self.route
+            if r is None:
+                return None
+            now = time.monotonic()
+            d = self._distance(now)
+            if d >= r.length:
+                if self.loop and self._anchor is not None:
+                    d %= r.length
+                    self._dist, self._anchor = d, now
+                else:
+                    d = r.length
+                    self._dist, self._anchor = d, None
+            lat, lon, brg, i = r.position_at(d)
+            st = {"lat": lat, "lon": lon, "bearing": round(brg, 1), "index": i,
+                  "dist": round(d, 1), "length": round(r.length, 1),
+                  "fraction": d / r.length if r.length else 0.0,
+                  "playing": self._anchor is not None, "loop": self.loop,
+                  "speed": self.speed, "rate": self.rate}
+        if send:
+            t = time.perf_counter()
+            try:
+                self.send(lat, lon, brg, self.speed if st["playing"] else 0.0)
+                st["ok"] = True
+            except Exception as e:
+                st["ok"] = False; st["error"] = str(e)
+                self.stats["errors"] = self.stats.get("errors", 0) + 1
+            st["send_ms"] = round((time.perf_counter() - t) * 1000.0, 2)
+        return st
+
+    def _emit(self, st):
+        if st is not None and self.on_progress:
+            self.on_progress(st)
+
+    def _run(self):
+        deadline = time.monotonic()
+        while True:
+            with self._cv:
+                while self._anchor is None and not self._kick and not self._closed:
+                    self._cv.wait()
+                    deadline = time.monotonic()
+                if self._closed:
+                    return
+                kick, self._kick = self._kick, None
+                period = 1.0 / self.rate
+            if kick and self._anchor is None:
+                self._emit(self._state(send=kick == "send")); continue
+            now = time.monotonic()
+            if deadline > now:
+                with self._cv:
+                    self._cv.wait(deadline - now)   # пробуждение раньше срока — на pause/seek
+                continue
+            late = now - deadline
+            st = self._state(send=True)
+            s = self.stats
+            s["ticks"] += 1
+            s["send_ms"] += st.get("send_ms", 0.0) if st else 0.0
+            if late > period * 0.5:
+                s["late"] += 1
+            s["max_late_ms"] = max(s["max_late_ms"], round(late * 1000.0, 2))
+            self._emit(st)
+            # абсолютные сроки: задержка отправки не накапливается; пропущенные тики не догоняем
+            deadline += period
+            now = time.monotonic()
+            if deadline <= now:
+                deadline += math.ceil((now - deadline) / period) * period
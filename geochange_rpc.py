@@ -0,0 +1,163 @@
+# geochange_rpc.py
+# Local JSON-RPC 2.0 daemon around geochange_core.Core: one request/response per line
+# over TCP on 127.0.0.1. Соединения с консолями эмуляторов и adb-трекер живут в демоне
+# между вызовами; клиент держит одно соединение и может слать пачки (batch).
+
+import inspect, json, os, socket, socketserver, threading, time
+
+from geochange_core import Core
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = int(os.environ.get("GEOCHANGE_DAEMON_PORT", "47800"))
+METHODS = ("ping", "devices", "teleport", "teleport_all", "locations", "save_location", "delete_location",
+           "goto_location", "import_locations", "export_locations", "route_play", "route_pause", "route_resume",
+           "route_stop", "route_status", "metrics")
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+# ---------- server ----------
+def _error(rid, code, message):
+    return {"jsonrpc": "2.0", "id": rid, "error": {"code": code, "message": message}}
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            try:
+                req = json.loads(raw)
+            except ValueError:
+                resp = _error(None, -32700, "parse error")
+            else:
+                if req == []:
+                    resp = _error(None, -32600, "invalid request")     # пустая пачка — по спецификации
+                elif isinstance(req, list):
+                    resp = [r for r in (self.server.dispatch(q) for q in req) if r is not None] or None
+                else:
+                    resp = self.server.dispatch(req)
+            if resp is not None:
+                self.wfile.write(json.dumps(resp, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+class RpcServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, core: Core, host: str = DAEMON_HOST, port: int = DAEMON_PORT):
+        super().__init__((host, port), _Handler)
+        self.core = core
+        self.started = time.time()
+        self.calls = 0
+
+    def dispatch(self, req):
+        if not isinstance(req, dict) or not isinstance(req.get("method"), str):
+            return _error(None, -32600, "invalid request")
+        rid, method, params = req.get("id"), req["method"], req.get("params") or {}
+        self.calls += 1
+        if method == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            result = {"stopping": True}
+        elif method not in METHODS:
+            return _error(rid, -32601, f"unknown method {method}") if "id" in req else None
+        else:
+            fn = self.ping if method == "ping" else getattr(self.core, method)
+            # -32602 — только если аргументы не легли на сигнатуру; TypeError изнутри метода — это -32000
+            try:
+                sig = inspect.signature(fn)
+                args = sig.bind(*params) if isinstance(params, list) else sig.bind(**params)
+            except TypeError as e:
+                return _error(rid, -32602, str(e)) if "id" in req else None
+            try:
+                result = fn(*args.args, **args.kwargs)
+            except Exception as e:
+                return _error(rid, -32000, str(e) or e.__class__.__name__) if "id" in req else None
+        # без id — уведомление: выполняем, но не отвечаем
+        return {"jsonrpc": "2.0", "id": rid, "result": result} if "id" in req else None
+
+    def ping(self):
+        return {"pong": True, "pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1),
+                "calls": self.calls, "sdk": str(self.core.sdk_root())}
+
+def serve(core: Core, host: str = DAEMON_HOST, port: int = DAEMON_PORT):
+    srv = RpcServer(core.start(), host, port)
+    try:
+        srv.serve_forever()
+    finally:
+        srv.server_close(); core.close()
+
+# ---------- client ----------
+class RpcClient:
+    def __init__(self, host: str = DAEMON_HOST, port: int = DAEMON_PORT, timeout: float = 60.0):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._rf = self._sock.makefile("rb")
+        self._n = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, host: str = DAEMON_HOST, port: int = DAEMON_PORT, timeout: float = 60.0):
+        # None, если демон не запущен
+        try:
+            return cls(host, port, timeout)
+        except OSError:
+            return None
+
+    def _roundtrip(self, payload):
+        self._sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        line = self._rf.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        return json.loads(line)
+
+    @staticmethod
+    def _unwrap(resp):
+        if "error" in resp:
+            raise RpcError(resp["error"]["code"], resp["error"]["message"])
+        return resp["result"]
+
+    def call(self, method: str, **params):
+        with self._lock:
+            self._n += 1
+            return self._unwrap(self._roundtrip({"jsonrpc": "2.0", "id": self._n, "method": method,
+                                                 "params": params}))
+
+    def batch(self, calls):
+        # calls: [(method, params), ...] -> результаты или RpcError в том же порядке
+        if not calls:
+            return []                           # пустая пачка для сервера — invalid request
+        with self._lock:
+            reqs = []
+            for method, params in calls:
+                self._n += 1
+                reqs.append({"jsonrpc": "2.0", "id": self._n, "method": method, "params": params})
+            by_id = {r.get("id"): r for r in self._roundtrip(reqs)}
+        out = []
+        for q in reqs:
+            try:
+                out.append(self._unwrap(by_id[q["id"]]))
+            except RpcError as e:
+                out.append(e)
+        return out
+
+    def close(self):
+        for h in (self._rf, self._sock):
+            try: h.close()
+            except OSError: pass
+
+class LocalClient:
+    # тот же интерфейс, но ядро в текущем процессе (демон не запущен)
+    def __init__(self, core: Core):
+        self.core = core
+
+    def call(self, method: str, **params):
+        if method not in METHODS:
+            raise RpcError(-32601, f"unknown method {method}")
+        if method == "ping":
+            return {"pong": True, "pid": os.getpid(), "local": True}
+        return getattr(self.core, method)(**params)
+
+    def close(self):
+        self.core.close()
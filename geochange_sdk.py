@@ -0,0 +1,213 @@
+# geochange_sdk.py
+# SDK install pipeline: streaming, resumable (HTTP Range), checksum-verified downloads,
+# checksums from the official repository manifest, a local package cache and one
+# batched sdkmanager run. Без Qt: прогресс и лог — через колбэки.
+
+import hashlib, os, re, shutil, socket, subprocess, sys, tarfile, threading, time, urllib.error, urllib.request
+import xml.etree.ElementTree as ET
+from http.client import HTTPException
+from pathlib import Path
+
+from geochange_logs import pump
+
+REPO_BASE = os.environ.get("GEOCHANGE_SDK_REPO", "https://dl.google.com/android/repository/")
+REPO_XML  = "repository2-3.xml"
+CMDLINE_TOOLS_BUILD = "11076708"
+CMDLINE_TOOLS_OS = {"win32": "win", "darwin": "mac"}.get(sys.platform, "linux")
+CMDLINE_TOOLS_ZIP = f"commandlinetools-{CMDLINE_TOOLS_OS}-{CMDLINE_TOOLS_BUILD}_latest.zip"
+USER_AGENT = "GeoChange/1.0 (Android emulator location tool)"
+CHUNK = 1 << 16
+
+class DownloadError(Exception):
+    pass
+
+class ChecksumError(DownloadError):
+    pass
+
+def file_digest(path, algo: str = "sha1") -> str:
+    h = hashlib.new(algo)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+# ---------- download ----------
+def download(url, dest, checksum=None, algo: str = "sha1", size=None, on_progress=None,
+             cancel=None, retries: int = 5, timeout: float = 30.0):
+    # качаем в dest.part кусками; обрыв — докачка с того же места (Range), в конце проверка хэша
+    dest = Path(dest); part = dest.with_name(dest.name + ".part")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    h = hashlib.new(algo)
+    have = part.stat().st_size if part.exists() else 0
+    if have:
+        with open(part, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    total, last, attempt = size, 0.0, 0
+    while True:
+        if cancel is not None and cancel.is_set():
+            raise DownloadError("download cancelled")
+        req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        if have:
+            req.add_header("Range", f"bytes={have}-")
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as r:
+                if have and r.status != 206:
+                    # сервер не умеет Range — начинаем заново
+                    have = 0; h = hashlib.new(algo)
+                length = r.headers.get("Content-Length")
+                if length is not None:
+                    total = have + int(length)
+                with open(part, "ab" if have else "wb") as f:
+                    while True:
+                        if cancel is not None and cancel.is_set():
+                            raise DownloadError("download cancelled")
+                        block = r.read(CHUNK)
+                        if not block:
+                            break
+                        f.write(block); h.update(block); have += len(block)
+                        now = time.monotonic()
+                        if on_progress and now - last >= 0.1:
+                            last = now; on_progress(have, total or 0)
+            if total is not None and have < total:
+                raise DownloadError(f"connection closed at {have} of {total} bytes")
+            break
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and have and (size is None or have >= size):
+                break                                   # .part уже полный
+            if e.code < 500 and e.code != 429:
+                raise DownloadError(f"{url}: HTTP {e.code}") from e
+            err = e
+        except (urllib.error.URLError, socket.timeout, ConnectionError, HTTPException, DownloadError) as e:
+            if isinstance(e, DownloadError) and "cancelled" in str(e):
+                raise
+            err = e
+        attempt += 1
+        if attempt > retries:
+            raise DownloadError(f"{url}: {err}") from err
+        time.sleep(min(2.0 ** attempt, 30.0))
+    if on_progress:
+        on_progress(have, total or have)
+    if size is not None and have != size:
+        part.unlink(missing_ok=True)
+        raise ChecksumError(f"{dest.name}: size {have}, expected {size}")
+    if checksum and h.hexdigest().lower() != checksum.lower():
+        part.unlink(missing_ok=True)
+        raise ChecksumError(f"{dest.name}: {algo} {h.hexdigest()}, expected {checksum}")
+    part.replace(dest)
+    return dest
+
+# ---------- repository manifest ----------
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def archive_info(name: str, base: str = REPO_BASE, timeout: float = 30.0):
+    # -> {"checksum", "algo", "size"} для архива name из repository2-3.xml, либо None
+    req = urllib.request.Request(base + REPO_XML, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        for _, el in ET.iterparse(r):
+            if _local(el.tag) != "complete":
+                continue
+            fields = {_local(c.tag): c for c in el}
+            url = fields.get("url")
+            if url is not None and (url.text or "").strip().rsplit("/", 1)[-1] == name:
+                ck, sz = fields.get("checksum"), fields.get("size")
+                return {"checksum": (ck.text or "").strip() if ck is not None else None,
+                        "algo": ck.get("type", "sha1") if ck is not None else "sha1",
+                        "size": int(sz.text) if sz is not None else None}
+            el.clear()
+    return None
+
+# ---------- local package cache ----------
+def package_dir(sdk: Path, pkg: str) -> Path:
+    return Path(sdk).joinpath(*pkg.split(";"))
+
+def is_installed(sdk: Path, pkg: str) -> bool:
+    # sdkmanager пишет package.xml в каталог пакета после установки
+    return (package_dir(sdk, pkg) / "package.xml").exists()
+
+class PackageCache:
+    # каталог (можно общий сетевой): загруженные архивы + снимки установленных пакетов
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _archive(self, pkg: str) -> Path:
+        return self.root / "packages" / (re.sub(r"[^A-Za-z0-9._-]+", "_", pkg) + ".tar.gz")
+
+    def file(self, name: str, checksum=None, algo: str = "sha1"):
+        # -> путь к файлу в кэше, если он есть и совпадает с checksum
+        p = self.root / name
+        if not p.is_file():
+            return None
+        if checksum and file_digest(p, algo).lower() != checksum.lower():
+            p.unlink(missing_ok=True)
+            return None
+        return p
+
+    def fetch(self, name: str, base: str = REPO_BASE, info=None, **kw) -> Path:
+        info = info or {}
+        hit = self.file(name, info.get("checksum"), info.get("algo", "sha1"))
+        if hit is not None:
+            return hit
+        return download(base + name, self.root / name, info.get("checksum"),
+                        info.get("algo", "sha1"), info.get("size"), **kw)
+
+    def has(self, pkg: str) -> bool:
+        return self._archive(pkg).is_file()
+
+    def restore(self, pkg: str, sdk: Path) -> bool:
+        src = self._archive(pkg)
+        if not src.is_file():
+            return False
+        target = package_dir(sdk, pkg)
+        tmp = target.with_name(target.name + ".restore")
+        shutil.rmtree(tmp, ignore_errors=True); tmp.mkdir(parents=True)
+        with tarfile.open(src, "r:*") as t:
+            if hasattr(tarfile, "data_filter"):
+                t.extractall(tmp, filter="data")
+            else:
+                t.extractall(tmp)
+        shutil.rmtree(target, ignore_errors=True)
+        tmp.replace(target)
+        return True
+
+    def store(self, pkg: str, sdk: Path):
+        src = package_dir(sdk, pkg)
+        dst = self._archive(pkg); dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(dst.name + ".part")
+        with tarfile.open(tmp, "w:gz", compresslevel=1) as t:
+            for p in sorted(src.iterdir()):
+                t.add(p, arcname=p.name)
+        tmp.replace(dst)
+        return dst
+
+# ---------- sdkmanager ----------
+_PCT = re.compile(r"^\[[=\s]*\]\s*(\d{1,3})%")
+
+def sdkmanager_install(sdkmanager, sdk, packages, env=None, on_line=None, on_percent=None) -> int:
+    # один запуск JVM на все пакеты; лицензии принимаются через stdin
+    args = [str(sdkmanager), "--sdk_root=" + str(sdk), *packages]
+    if on_line:
+        on_line("> " + " ".join(args))
+    p = subprocess.Popen(args, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         stderr=subprocess.STDOUT)
+
+    def feed():
+        try:
+            p.stdin.write(b"y\n" * 64); p.stdin.close()
+        except OSError:
+            pass
+    threading.Thread(target=feed, daemon=True).start()
+    last = [-1]
+
+    def sink(line, kind):
+        # строки прогресса sdkmanager ("[===   ] 45% ...", перезапись через \r) — только в процент
+        m = _PCT.search(line)
+        if m:
+            pct = min(int(m.group(1)), 100)
+            if pct != last[0] and on_percent:
+                last[0] = pct; on_percent(pct)
+        elif line.strip() and on_line:
+            on_line(line.rstrip())
+    pump(p.stdout, sink)
+    return p.wait()
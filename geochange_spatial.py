@@ -0,0 +1,192 @@
+# geochange_spatial.py
+# Spatial index over saved locations: Web-Mercator grid pyramid with per-cell
+# aggregates (viewport clustering) and best-first k-nearest search.
+# Уровни хранятся через один (0, 2, ..., LEAF); в листовых ячейках — имена точек.
+
+import heapq, math, threading
+
+from geochange_routes import haversine_m
+
+LEAF      = 16              # ячейка листа ~600 м на экваторе
+LEVELS    = range(0, LEAF, 2)
+MAX_LAT   = 85.05112878
+
+def merc_xy(lat: float, lon: float):
+    lat = min(max(lat, -MAX_LAT), MAX_LAT)
+    s = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+def merc_lat(y: float) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+def _key(cx, cy):
+    return (cx << 32) | cy
+
+def _cell(x, y, level):
+    n = 1 << level
+    return int(x * n), int(y * n)
+
+class SpatialIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pos = {}                                  # name -> (lat, lon)
+        self._agg = {l: {} for l in LEVELS}             # level -> key -> [count, sum_lat, sum_lon]
+        self._leaf = {}                                 # key -> set(names)
+
+    def __len__(self):
+        return len(self._pos)
+
+    # --- updates
+    def insert(self, name, lat, lon):
+        with self._lock:
+            if name in self._pos:
+                self._remove(name)
+            self._pos[name] = (lat, lon)
+            x, y = merc_xy(lat, lon)
+            for l in LEVELS:
+                a = self._agg[l].setdefault(_key(*_cell(x, y, l)), [0, 0.0, 0.0])
+                a[0] += 1; a[1] += lat; a[2] += lon
+            self._leaf.setdefault(_key(*_cell(x, y, LEAF)), set()).add(name)
+
+    def remove(self, name):
+        with self._lock:
+            if name in self._pos:
+                self._remove(name)
+
+    def _remove(self, name):
+        lat, lon = self._pos.pop(name)
+        x, y = merc_xy(lat, lon)
+        for l in LEVELS:
+            k = _key(*_cell(x, y, l)); a = self._agg[l][k]
+            a[0] -= 1; a[1] -= lat; a[2] -= lon
+            if a[0] <= 0:
+                del self._agg[l][k]
+        k = _key(*_cell(x, y, LEAF)); names = self._leaf[k]
+        names.discard(name)
+        if not names:
+            del self._leaf[k]
+
+    def apply(self, changes):
+        # совместимо с LocationStore.subscribe
+        for op, name, lat, lon in changes:
+            if op == "remove":
+                self.remove(name)
+            else:
+                self.insert(name, lat, lon)
+
+    def load(self, items):
+        for it in items:
+            self.insert(it["name"], it["lat"], it["lon"])
+
+    # --- helpers
+    def _children(self, level, cx, cy):
+        # дочерние ячейки следующего хранимого уровня (4x4)
+        nl = level + 2
+        table = self._leaf if nl >= LEAF else self._agg[nl]
+        for dx in range(4):
+            for dy in range(4):
+                ccx, ccy = cx * 4 + dx, cy * 4 + dy
+                if _key(ccx, ccy) in table:
+                    yield nl, ccx, ccy
+
+    def _single(self, level, cx, cy):
+        # имя единственной точки ячейки: спуск по непустым потомкам
+        while level < LEAF:
+            level, cx, cy = next(self._children(level, cx, cy))
+        return next(iter(self._leaf[_key(cx, cy)]))
+
+    def _cells_in(self, table, level, x0, x1, y0, y1):
+        n = 1 << level
+        cx0, cx1 = int(x0 * n), min(int(x1 * n), n - 1)
+        cy0, cy1 = int(y0 * n), min(int(y1 * n), n - 1)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(table):
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    v = table.get(_key(cx, cy))
+                    if v is not None:
+                        yield cx, cy, v
+        else:
+            mask = (1 << 32) - 1
+            for k, v in table.items():
+                cx, cy = k >> 32, k & mask
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    yield cx, cy, v
+
+    @staticmethod
+    def _lon_ranges(west, east):
+        span = east - west
+        if span >= 360.0:
+            return [(-180.0, 180.0)]
+        west = (west + 180.0) % 360.0 - 180.0; east = west + span
+        if east > 180.0:
+            return [(west, 180.0), (-180.0, east - 360.0)]
+        return [(west, east)]
+
+    # --- queries
+    def viewport(self, south, west, north, east, zoom, max_items: int = 4000):
+        # кластеры ~64-128 px: уровень сетки = zoom + 2 (вниз до чётного)
+        level = max(0, min(LEAF, (int(zoom) + 2) & ~1))
+        points, clusters, total = [], [], 0
+        with self._lock:
+            for w, e in self._lon_ranges(west, east):
+                x0, y0 = merc_xy(north, w); x1, y1 = merc_xy(south, e)
+                if level >= LEAF:
+                    for _, _, names in self._cells_in(self._leaf, LEAF, x0, x1, y0, y1):
+                        for name in names:
+                            lat, lon = self._pos[name]
+                            if south <= lat <= north and w <= lon <= e:
+                                points.append([name, lat, lon])
+                    continue
+                for cx, cy, (cnt, slat, slon) in self._cells_in(self._agg[level], level, x0, x1, y0, y1):
+                    if cnt == 1:
+                        name = self._single(level, cx, cy)
+                        lat, lon = self._pos[name]
+                        points.append([name, lat, lon])
+                    else:
+                        clusters.append([round(slat / cnt, 6), round(slon / cnt, 6), cnt])
+                    if len(points) + len(clusters) >= max_items:
+                        break
+            total = len(points) + sum(c[2] for c in clusters)
+        return {"zoom": zoom, "level": level, "total": total,
+                "points": points[:max_items], "clusters": clusters}
+
+    def _cell_bounds(self, level, cx, cy):
+        n = float(1 << level)
+        return (merc_lat((cy + 1) / n), merc_lat(cy / n),           # south, north
+                cx / n * 360.0 - 180.0, (cx + 1) / n * 360.0 - 180.0)
+
+    def _min_dist(self, lat, lon, level, cx, cy):
+        # нижняя оценка расстояния до ячейки (с учётом перехода через 180°)
+        s, n, w, e = self._cell_bounds(level, cx, cy)
+        if w <= lon <= e:
+            return haversine_m(lat, lon, min(max(lat, s), n), lon)
+        dw, de = (w - lon) % 360.0, (lon - e) % 360.0
+        edge, dl = (w, dw) if dw <= de else (e, de)
+        if dl >= 90.0:
+            return haversine_m(lat, lon, min(max(lat, s), n), edge)
+        # ближайшая точка меридиана edge лежит на широте atan(tan(lat)/cos(dl))
+        best = math.degrees(math.atan(math.tan(math.radians(lat)) / math.cos(math.radians(dl))))
+        return haversine_m(lat, lon, min(max(best, s), n), edge)
+
+    def nearest(self, lat, lon, k: int = 5):
+        # best-first по пирамиде: ячейки в куче по нижней оценке расстояния
+        out = []
+        with self._lock:
+            heap = [(self._min_dist(lat, lon, 0, cx, cy), 1, 0, cx, cy, None)
+                    for cx, cy, _ in self._cells_in(self._agg[0], 0, 0.0, 1.0, 0.0, 1.0)]
+            heapq.heapify(heap)
+            while heap and len(out) < k:
+                d, is_cell, level, cx, cy, name = heapq.heappop(heap)
+                if not is_cell:
+                    p = self._pos[name]
+                    out.append({"name": name, "lat": p[0], "lon": p[1], "dist_m": round(d, 1)})
+                elif level >= LEAF:
+                    for nm in self._leaf[_key(cx, cy)]:
+                        p = self._pos[nm]
+                        heapq.heappush(heap, (haversine_m(lat, lon, p[0], p[1]), 0, 0, 0, 0, nm))
+                else:
+                    for nl, ccx, ccy in self._children(level, cx, cy):
+                        heapq.heappush(heap, (self._min_dist(lat, lon, nl, ccx, ccy), 1, nl, ccx, ccy, None))
+        return out
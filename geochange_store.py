@@ -0,0 +1,192 @@
+# geochange_store.py
+# Saved-location store: SQLite (WAL) on disk + in-memory name index.
+# Индекс загружается один раз; save/delete — одна строка в БД, без перезаписи файла.
+
+import json, sqlite3, threading
+from collections import deque
+from pathlib import Path
+
+class LocationStore:
+    def __init__(self, path, legacy_json=None):
+        self.path = Path(path)
+        self.legacy_error = None                   # текст ошибки разбора saved_locations.json (для лога окна/CLI)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS locations("
+                         "name TEXT NOT NULL UNIQUE, lat REAL NOT NULL, lon REAL NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)")
+        # name -> (lat, lon); порядок dict = порядок rowid (пересохранение уходит в конец)
+        self._index = {n: (la, lo) for n, la, lo in
+                       self._db.execute("SELECT name, lat, lon FROM locations ORDER BY rowid")}
+        if legacy_json is not None:
+            self._import_legacy(Path(legacy_json))
+
+    def _import_legacy(self, src: Path):
+        if not src.exists() or self._meta("imported_json"):
+            return
+        try:
+            items = json.loads(src.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            # файл не отмечается импортированным: исправленный подхватится при следующем старте
+            self.legacy_error = f"{src} not imported: {e}"
+            return
+        # как прежний load_items: битые записи пропускаются, старт окна не ломается
+        rows = []
+        for i in items if isinstance(items, list) else []:
+            if not isinstance(i, dict):
+                continue
+            name = str(i.get("name", "")).strip()
+            try:
+                lat, lon = float(i.get("lat")), float(i.get("lon"))
+            except (TypeError, ValueError):
+                continue
+            if name and -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0:
+                rows.append((name, lat, lon))
+        self.put_many(rows, _meta=("imported_json", str(src)))
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # --- read (только память)
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def get(self, name):
+        p = self._index.get(name)
+        return None if p is None else {"name": name, "lat": p[0], "lon": p[1]}
+
+    def items(self):
+        with self._lock:
+            return [{"name": n, "lat": la, "lon": lo} for n, (la, lo) in self._index.items()]
+
+    def names(self):
+        with self._lock:
+            return list(self._index)
+
+    def iter_rows(self):
+        # потоковое чтение (экспорт): отдельное соединение — снимок WAL, запись не блокируется
+        db = sqlite3.connect(str(self.path))
+        try:
+            yield from db.execute("SELECT name, lat, lon FROM locations ORDER BY rowid")
+        finally:
+            db.close()
+
+    # --- write
+    def subscribe(self, fn):
+        # fn(changes): changes = [(op, name, lat, lon), ...], op in add/update/remove
+        self._listeners.append(fn)
+
+    def _notify(self, changes):
+        if changes:
+            for fn in list(self._listeners):
+                fn(changes)
+
+    def _upsert(self, name, lat, lon):
+        self._db.execute("DELETE FROM locations WHERE name=?", (name,))
+        self._db.execute("INSERT INTO locations(name, lat, lon) VALUES(?,?,?)", (name, lat, lon))
+        op = "update" if self._index.pop(name, None) is not None else "add"
+        self._index[name] = (lat, lon)
+        return (op, name, lat, lon)
+
+    def put(self, name: str, lat: float, lon: float) -> str:
+        name = name.strip()
+        if not name:
+            raise ValueError("location name is empty")
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                ch = self._upsert(name, float(lat), float(lon))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK"); self._reload(); raise
+        self._notify([ch])
+        return ch[0]
+
+    def put_many(self, rows, _meta=None):
+        # одна транзакция на пачку; rows: [(name, lat, lon), ...]
+        changes = []
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for name, lat, lon in rows:
+                    name = str(name).strip()
+                    if name:
+                        changes.append(self._upsert(name, float(lat), float(lon)))
+                if _meta:
+                    self._db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES(?,?)", _meta)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK"); self._reload(); raise
+        self._notify(changes)
+        return changes
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            p = self._index.pop(name, None)
+            if p is None:
+                return False
+            self._db.execute("DELETE FROM locations WHERE name=?", (name,))
+        self._notify([("remove", name, p[0], p[1])])
+        return True
+
+    def _reload(self):
+        self._index = {n: (la, lo) for n, la, lo in
+                       self._db.execute("SELECT name, lat, lon FROM locations ORDER BY rowid")}
+
+    def close(self):
+        with self._lock:
+            try:
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+            self._db.close()
+
+class ChangeFeed:
+    # версионированная лента изменений: снимок + дельты с номерами;
+    # клиент, пропустивший версию, догоняется из истории или новым снимком
+    def __init__(self, store: LocationStore, history: int = 256, max_delta: int = 5000):
+        self.store = store
+        self.seq = 0
+        self.max_delta = max_delta
+        self._log = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._listeners = []
+        store.subscribe(self._on_changes)
+
+    def subscribe(self, fn):
+        self._listeners.append(fn)
+
+    def snapshot(self):
+        with self._lock:
+            return {"type": "snapshot", "seq": self.seq,
+                    "items": [[i["name"], i["lat"], i["lon"]] for i in self.store.items()]}
+
+    def since(self, seq: int):
+        # -> список пропущенных сообщений или None (нужен снимок)
+        with self._lock:
+            if seq == self.seq:
+                return []
+            if seq > self.seq or not self._log or self._log[0]["base"] > seq:
+                return None
+            msgs = [m for m in self._log if m["seq"] > seq]
+        return None if any(m["type"] == "resync" for m in msgs) else msgs
+
+    def _on_changes(self, changes):
+        with self._lock:
+            self.seq += 1
+            if len(changes) > self.max_delta:
+                msg = {"type": "resync", "seq": self.seq, "base": self.seq - 1}
+            else:
+                msg = {"type": "delta", "seq": self.seq, "base": self.seq - 1,
+                       "ops": [list(c) for c in changes]}
+            self._log.append(msg)
+        for fn in list(self._listeners):
+            fn(msg)
@@ -0,0 +1,128 @@
+# geochange_teleport.py
+# Per-device teleport workers: bounded pending queue, latest-wins coalescing.
+# GUI-поток только ставит координаты в очередь; отправка идёт в потоке устройства.
+
+import math, threading, time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from geochange_metrics import METRICS
+
+def offset_point(lat: float, lon: float, east_m: float, north_m: float):
+    # малые смещения в метрах (локальная касательная плоскость)
+    dlat = north_m / 111320.0
+    dlon = east_m / (111320.0 * max(math.cos(math.radians(lat)), 1e-6))
+    return lat + dlat, lon + dlon
+
+class TeleportWorker:
+    # send(serial, lat, lon) -> str (канал: "console"/"adb"), исключение = ошибка
+    def __init__(self, serial: str, send, maxlen: int = 4):
+        self.serial = serial
+        self.send = send
+        self.maxlen = max(1, maxlen)
+        self.sent = 0
+        self.dropped = 0
+        self._pending = deque()
+        self._cv = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f"teleport-{serial}", daemon=True)
+        self._thread.start()
+
+    def submit(self, lat: float, lon: float) -> Future:
+        fut = Future()
+        with self._cv:
+            if self._stopped:
+                raise RuntimeError(f"teleport worker for {self.serial} is stopped")
+            if len(self._pending) >= self.maxlen:
+                self._drop(self._pending.popleft())
+            self._pending.append((float(lat), float(lon), time.perf_counter(), fut))
+            self._cv.notify()
+        return fut
+
+    def pending(self) -> int:
+        with self._cv:
+            return len(self._pending)
+
+    def _result(self, lat, lon, t0, **kw):
+        res = {"serial": self.serial, "lat": lat, "lon": lon, "ok": False,
+               "superseded": False, "via": "", "error": "",
+               "latency_ms": round((time.perf_counter() - t0) * 1000.0, 2)}
+        res.update(kw)
+        return res
+
+    def _drop(self, item):
+        lat, lon, t0, fut = item
+        self.dropped += 1
+        fut.set_result(self._result(lat, lon, t0, superseded=True))
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._pending and not self._stopped:
+                    self._cv.wait()
+                if self._stopped and not self._pending:
+                    return
+                # уходит только последняя точка, всё более старое — устарело
+                item = self._pending.pop()
+                while self._pending:
+                    self._drop(self._pending.popleft())
+            lat, lon, t0, fut = item
+            t_send = time.perf_counter()
+            try:
+                via = self.send(self.serial, lat, lon)
+                res = self._result(lat, lon, t0, ok=True, via=via or "")
+            except Exception as e:
+                res = self._result(lat, lon, t0, error=str(e) or e.__class__.__name__)
+            res["send_ms"] = round((time.perf_counter() - t_send) * 1000.0, 2)
+            # от постановки в очередь до ответа устройства
+            METRICS.record("teleport", res["latency_ms"], self.serial, res["ok"], res["error"], t0=t0)
+            self.sent += 1
+            fut.set_result(res)
+
+    def stop(self, wait: float = 0.0):
+        with self._cv:
+            self._stopped = True
+            self._cv.notify()
+        if wait:
+            self._thread.join(wait)
+
+class TeleportDispatcher:
+    def __init__(self, send, maxlen: int = 4):
+        self.send = send
+        self.maxlen = maxlen
+        self._workers = {}
+        self._lock = threading.Lock()
+
+    def worker(self, serial: str) -> TeleportWorker:
+        with self._lock:
+            w = self._workers.get(serial)
+            if w is None:
+                w = self._workers[serial] = TeleportWorker(serial, self.send, self.maxlen)
+            return w
+
+    def submit(self, serial: str, lat: float, lon: float) -> Future:
+        return self.worker(serial).submit(lat, lon)
+
+    def fan_out(self, targets, timeout: float = 5.0):
+        # targets: [(serial, lat, lon), ...]; у каждого устройства свой поток,
+        # так что общее время ~ одна самая долгая отправка, а не сумма
+        t0 = time.perf_counter()
+        futs = [(serial, lat, lon, self.submit(serial, lat, lon)) for serial, lat, lon in targets]
+        deadline = time.monotonic() + timeout
+        results = []
+        for serial, lat, lon, fut in futs:
+            try:
+                results.append(fut.result(max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                results.append({"serial": serial, "lat": float(lat), "lon": float(lon),
+                                "ok": False, "superseded": False, "via": "",
+                                "error": f"timeout after {timeout:g} s",
+                                "latency_ms": round((time.perf_counter() - t0) * 1000.0, 2)})
+        return {"results": results, "ok": sum(1 for r in results if r["ok"]),
+                "total": len(results), "wall_ms": round((time.perf_counter() - t0) * 1000.0, 2)}
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers.values()); self._workers.clear()
+        for w in workers:
+            w.stop()
@@ -0,0 +1,261 @@
+# geochange_tiles.py
+# Offline map tiles: MBTiles (SQLite) storage with size-bounded LRU eviction,
+# on-demand fetch and background region/corridor prefetch.
+# Кэш отдаёт тайлы странице через схему geotile: (см. TileSchemeHandler в geochange_app).
+# Массовая докачка с серверов OSM запрещена их tile usage policy — только со своего сервера.
+
+import math, os, sqlite3, threading, time, urllib.parse, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from geochange_metrics import METRICS
+
+TILE_URL   = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+# источник для Prefetch view/route: свой тайл-сервер или коммерческий с разрешённой докачкой
+PREFETCH_URL = os.environ.get("GEOCHANGE_PREFETCH_TILE_URL", "")
+USER_AGENT = "GeoChange/1.0 (Android emulator location tool)"
+MAX_ZOOM   = 19
+
+def is_osm_url(url: str) -> bool:
+    host = (urllib.parse.urlsplit(url).hostname or "").lower()
+    return host == "openstreetmap.org" or host.endswith(".openstreetmap.org")
+
+def tile_xy(lat: float, lon: float, z: int):
+    lat = min(max(lat, -85.05112878), 85.05112878)
+    n = 1 << z
+    x = int((lon + 180.0) / 360.0 * n)
+    s = math.sin(math.radians(lat))
+    y = int((0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def tiles_for_bbox(south, west, north, east, zmin, zmax):
+    for z in range(zmin, zmax + 1):
+        x0, y0 = tile_xy(north, west, z); x1, y1 = tile_xy(south, east, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+def count_bbox(south, west, north, east, zmin, zmax) -> int:
+    total = 0
+    for z in range(zmin, zmax + 1):
+        x0, y0 = tile_xy(north, west, z); x1, y1 = tile_xy(south, east, z)
+        total += (x1 - x0 + 1) * (y1 - y0 + 1)
+    return total
+
+def tiles_for_corridor(points, radius_m, zmin, zmax):
+    # тайлы вдоль маршрута в полосе ±radius_m; точки — [(lat, lon), ...]
+    pts = list(points)
+    step = max(radius_m, 50.0)
+    for z in range(zmin, zmax + 1):
+        seen = set()
+        for i, (lat, lon) in enumerate(pts):
+            samples = [(lat, lon)]
+            if i + 1 < len(pts):
+                la2, lo2 = pts[i + 1]
+                d = math.hypot((la2 - lat) * 111320.0, (lo2 - lon) * 111320.0 * math.cos(math.radians(lat)))
+                k = int(d // step)
+                samples += [(lat + (la2 - lat) * j / (k + 1), lon + (lo2 - lon) * j / (k + 1))
+                            for j in range(1, k + 1)]
+            for la, lo in samples:
+                dlat = radius_m / 111320.0
+                dlon = radius_m / (111320.0 * max(math.cos(math.radians(la)), 1e-6))
+                for t in tiles_for_bbox(la - dlat, lo - dlon, la + dlat, lo + dlon, z, z):
+                    if t not in seen:
+                        seen.add(t); yield t
+
+class TileCache:
+    def __init__(self, path, max_bytes: int = 1 << 30, url: str = TILE_URL, timeout: float = 10.0):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.url = url
+        self.timeout = timeout
+        self.stats = {"hits": 0, "misses": 0, "fetched": 0, "fetch_errors": 0,
+                      "evictions": 0, "bytes": 0, "tiles": 0}
+        self._lock = threading.RLock()
+        self._touched = {}                          # отложенные обновления last_used
+        self._inflight = {}                         # (z,x,y) -> Event, чтобы не качать тайл дважды
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS metadata(name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tiles(zoom_level INTEGER, tile_column INTEGER,"
+                         " tile_row INTEGER, tile_data BLOB,"
+                         " PRIMARY KEY(zoom_level, tile_column, tile_row))")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tile_lru(zoom_level INTEGER, tile_column INTEGER,"
+                         " tile_row INTEGER, size INTEGER, last_used REAL,"
+                         " PRIMARY KEY(zoom_level, tile_column, tile_row))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS tile_lru_used ON tile_lru(last_used)")
+        for k, v in (("name", "geochange"), ("format", "png"), ("type", "baselayer")):
+            self._db.execute("INSERT OR IGNORE INTO metadata(name, value) VALUES(?,?)", (k, v))
+        n, b = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tile_lru").fetchone()
+        self.stats["tiles"], self.stats["bytes"] = n, b
+
+    @staticmethod
+    def _key(z, x, y):
+        return z, x, (1 << z) - 1 - y           # MBTiles хранит строки в схеме TMS
+
+    def get(self, z, x, y):
+        k = self._key(z, x, y)
+        with self._lock:
+            row = self._db.execute("SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=?"
+                                   " AND tile_row=?", k).fetchone()
+            if row is None:
+                return None
+            self._touched[k] = time.time()
+            if len(self._touched) >= 256:
+                self._flush_touched()
+        return bytes(row[0])
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany("UPDATE tile_lru SET last_used=? WHERE zoom_level=? AND tile_column=?"
+                                 " AND tile_row=?", [(t, *k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def put(self, z, x, y, data: bytes):
+        k = self._key(z, x, y)
+        with self._lock:
+            old = self._db.execute("SELECT size FROM tile_lru WHERE zoom_level=? AND tile_column=?"
+                                   " AND tile_row=?", k).fetchone()
+            self._db.execute("BEGIN")
+            self._db.execute("INSERT OR REPLACE INTO tiles VALUES(?,?,?,?)", (*k, sqlite3.Binary(data)))
+            self._db.execute("INSERT OR REPLACE INTO tile_lru VALUES(?,?,?,?,?)", (*k, len(data), time.time()))
+            self._db.execute("COMMIT")
+            self.stats["bytes"] += len(data) - (old[0] if old else 0)
+            self.stats["tiles"] += 0 if old else 1
+            if self.stats["bytes"] > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # удаляем давно не использованные, пока не опустимся до 90% лимита
+        self._flush_touched()
+        target = int(self.max_bytes * 0.9)
+        self._db.execute("BEGIN")
+        while self.stats["bytes"] > target:
+            rows = self._db.execute("SELECT zoom_level, tile_column, tile_row, size FROM tile_lru"
+                                    " ORDER BY last_used LIMIT 256").fetchall()
+            if not rows:
+                break
+            for z, c, r, size in rows:
+                self._db.execute("DELETE FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", (z, c, r))
+                self._db.execute("DELETE FROM tile_lru WHERE zoom_level=? AND tile_column=? AND tile_row=?", (z, c, r))
+                self.stats["bytes"] -= size; self.stats["tiles"] -= 1; self.stats["evictions"] += 1
+                if self.stats["bytes"] <= target:
+                    break
+        self._db.execute("COMMIT")
+
+    def download(self, z, x, y, url: str = None) -> bytes:
+        req = urllib.request.Request((url or self.url).format(z=z, x=x, y=y), headers={"User-Agent": USER_AGENT})
+        with METRICS.timer("tile.download"), urllib.request.urlopen(req, timeout=self.timeout) as r:
+            return r.read()
+
+    def fetch(self, z, x, y, url: str = None):
+        # из кэша, иначе из сети (с сохранением); None — тайла нет и сети нет; url — другой источник (докачка)
+        data = self.get(z, x, y)
+        if data is not None:
+            self.stats["hits"] += 1
+            return data
+        key = (z, x, y)
+        with self._lock:
+            ev = self._inflight.get(key)
+            owner = ev is None
+            if owner:
+                ev = self._inflight[key] = threading.Event()
+        if not owner:
+            ev.wait(self.timeout + 1.0)
+            data = self.get(z, x, y)
+            self.stats["hits" if data is not None else "misses"] += 1
+            return data
+        self.stats["misses"] += 1
+        try:
+            data = self.download(z, x, y, url)
+            self.put(z, x, y, data)
+            self.stats["fetched"] += 1
+            return data
+        except Exception:
+            self.stats["fetch_errors"] += 1
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            ev.set()
+
+    def has(self, z, x, y) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM tile_lru WHERE zoom_level=? AND tile_column=?"
+                                    " AND tile_row=?", self._key(z, x, y)).fetchone() is not None
+
+    def snapshot_stats(self):
+        st = dict(self.stats)
+        looked = st["hits"] + st["misses"]
+        st["hit_rate"] = round(st["hits"] / looked, 4) if looked else 0.0
+        st["max_bytes"] = self.max_bytes
+        return st
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.close()
+
+class Prefetcher:
+    # фоновая докачка региона; одновременно не больше concurrency запросов; url — источник докачки
+    def __init__(self, cache: TileCache, concurrency: int = 2, max_tiles: int = 20000, url: str = PREFETCH_URL):
+        self.cache = cache
+        self.url = url
+        self.concurrency = max(1, concurrency)
+        self.max_tiles = max_tiles
+        self._cancel = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, tiles, total: int = 0, on_progress=None):
+        if not self.url or is_osm_url(self.url):
+            raise ValueError("bulk prefetch from tile.openstreetmap.org is not allowed by the OSM tile usage "
+                             "policy; set GEOCHANGE_PREFETCH_TILE_URL to your own tile server")
+        if self.running:
+            raise RuntimeError("prefetch already running")
+        if total > self.max_tiles:
+            raise ValueError(f"{total} tiles requested, limit is {self.max_tiles}")
+        self._cancel.clear()
+        self._thread = threading.Thread(target=self._run, args=(tiles, total, on_progress),
+                                        name="tile-prefetch", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self, tiles, total, on_progress):
+        st = {"done": 0, "cached": 0, "fetched": 0, "failed": 0, "total": total,
+              "finished": False, "cancelled": False}
+        sem = threading.BoundedSemaphore(self.concurrency)
+        lock = threading.Lock()
+        last = [0.0]
+
+        def report(force=False):
+            now = time.monotonic()
+            if on_progress and (force or now - last[0] >= 0.25):
+                last[0] = now; on_progress(dict(st))
+
+        def one(t):
+            try:
+                ok = self.cache.fetch(*t, url=self.url) is not None
+                with lock:
+                    st["fetched" if ok else "failed"] += 1; st["done"] += 1
+            finally:
+                sem.release()
+            report()
+
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="tile") as pool:
+            for n, t in enumerate(tiles):
+                if self._cancel.is_set() or n >= self.max_tiles:
+                    break
+                if self.cache.has(*t):
+                    with lock:
+                        st["cached"] += 1; st["done"] += 1
+                    report(); continue
+                sem.acquire()
+                pool.submit(one, t)
+        st["cancelled"] = self._cancel.is_set(); st["finished"] = True
+        report(force=True)
@@ -0,0 +1,140 @@
+# geochange_toolchain.py
+# Cached SDK toolchain: adb, emulator, sdkmanager and avdmanager resolved once per SDK root
+# for the host OS (.exe/.bat on Windows, bare names elsewhere), package versions from
+# source.properties and one prepared environment for all subprocesses.
+# Кэш сверяется со штампом (mtime каталогов инструментов) не чаще раза в CHECK_S секунд;
+# смена корня SDK или установка/обновление пакетов его сбрасывает.
+
+import os, shutil, stat, subprocess, sys, threading, time
+from pathlib import Path
+
+from geochange_metrics import METRICS
+
+WINDOWS = sys.platform == "win32"
+CHECK_S = 2.0
+# инструмент -> (каталоги относительно корня SDK по приоритету, расширение на Windows)
+TOOLS = {
+    "adb":        (("platform-tools",), ".exe"),
+    "emulator":   (("emulator",), ".exe"),
+    "sdkmanager": (("cmdline-tools/latest/bin", "tools/bin"), ".bat"),
+    "avdmanager": (("cmdline-tools/latest/bin", "tools/bin"), ".bat"),
+}
+PACKAGES = {"platform-tools": "platform-tools", "emulator": "emulator", "cmdline-tools": "cmdline-tools/latest"}
+
+class ToolchainError(Exception):
+    pass
+
+def default_root() -> Path:
+    # рабочий каталог приложения: GEOCHANGE_ROOT, иначе C:\geochange на Windows и ~/.geochange на Linux/macOS
+    env = os.environ.get("GEOCHANGE_ROOT")
+    if env:
+        return Path(env)
+    return Path(r"C:\geochange") if WINDOWS else Path.home() / ".geochange"
+
+def tool_name(tool: str) -> str:
+    return tool + (TOOLS[tool][1] if WINDOWS else "")
+
+def expected_path(sdk, tool: str) -> Path:
+    # где инструмент должен появиться после установки (для install_sdk/create_avd)
+    return Path(sdk) / TOOLS[tool][0][0] / tool_name(tool)
+
+def detached() -> dict:
+    # аргументы Popen для процесса, который переживает окно (эмулятор)
+    if WINDOWS:
+        return {"creationflags": subprocess.DETACHED_PROCESS}
+    return {"start_new_session": True}
+
+def make_executable(root):
+    # zipfile не сохраняет права: после распаковки cmdline-tools на Linux/macOS bin/* не запускаются
+    if WINDOWS:
+        return
+    for p in Path(root).rglob("*"):
+        if p.is_file() and (p.parent.name == "bin" or p.suffix in ("", ".sh")):
+            p.chmod(p.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+def _revision(pkg_dir: Path):
+    try:
+        for line in (pkg_dir / "source.properties").read_text(encoding="utf-8", errors="replace").splitlines():
+            k, _, v = line.partition("=")
+            if k.strip() == "Pkg.Revision":
+                return v.strip()
+    except OSError:
+        pass
+    return None
+
+def _stamp(sdk: Path):
+    # дешёвая проверка «ничего не поменялось»: mtime корня и каталогов инструментов
+    out = []
+    for rel in ("", *{d for dirs, _ in TOOLS.values() for d in dirs}):
+        try:
+            out.append((sdk / rel).stat().st_mtime_ns)
+        except OSError:
+            out.append(None)
+    return tuple(out)
+
+class Toolchain:
+    def __init__(self, sdk, avd_home):
+        self.sdk = Path(sdk); self.avd_home = Path(avd_home)
+        self.stamp = _stamp(self.sdk)
+        self.tools = {}                     # инструмент -> путь внутри SDK или None
+        for tool, (dirs, _) in TOOLS.items():
+            self.tools[tool] = next((str(self.sdk / d / tool_name(tool)) for d in dirs
+                                     if (self.sdk / d / tool_name(tool)).is_file()), None)
+        self.versions = {pkg: _revision(self.sdk / rel) for pkg, rel in PACKAGES.items()}
+        env = os.environ.copy()
+        env["ANDROID_SDK_ROOT"] = str(self.sdk)
+        env["ANDROID_HOME"] = str(self.sdk)
+        env["ANDROID_AVD_HOME"] = str(self.avd_home)
+        env["PATH"] = os.pathsep.join([str(self.sdk / "platform-tools"), str(self.sdk / "emulator"),
+                                       str(self.sdk / "cmdline-tools" / "latest" / "bin"), env.get("PATH", "")])
+        self.env = env                      # общий для всех вызовов: не изменять
+        self._path_env = env["PATH"]
+        self._fallback = {}
+
+    def has(self, tool: str) -> bool:
+        return self.tools.get(tool) is not None
+
+    def path(self, tool: str) -> str:
+        # из SDK; если его там нет — из PATH (adb из platform-tools системы), иначе просто имя
+        p = self.tools.get(tool)
+        if p is None:
+            if tool not in self._fallback:
+                self._fallback[tool] = shutil.which(tool_name(tool), path=self._path_env) or tool_name(tool)
+            p = self._fallback[tool]
+        return p
+
+    def require(self, tool: str) -> str:
+        p = self.tools.get(tool)
+        if p is None:
+            raise ToolchainError(f"{tool_name(tool)} not found in {self.sdk} (install the SDK first)")
+        return p
+
+    def info(self):
+        return {"sdk": str(self.sdk), "avd_home": str(self.avd_home), "platform": sys.platform,
+                "tools": {t: self.tools[t] or f"{self.path(t)} (not in SDK)" for t in TOOLS},
+                "versions": self.versions}
+
+_cache = {}
+_lock = threading.Lock()
+
+def resolve(sdk, avd_home) -> Toolchain:
+    # -> Toolchain из кэша; штамп перепроверяется не чаще CHECK_S, при изменении — новый разбор
+    key = (str(sdk), str(avd_home))
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and now - hit[1] < CHECK_S:
+            return hit[0]
+    tc = hit[0] if hit is not None else None
+    if tc is None or _stamp(tc.sdk) != tc.stamp:
+        with METRICS.timer("toolchain.resolve"):
+            tc = Toolchain(sdk, avd_home)
+    with _lock:
+        _cache[key] = (tc, now)
+    return tc
+
+def invalidate(sdk=None):
+    # после установки пакетов: следующий resolve() разбирает SDK заново
+    with _lock:
+        for key in [k for k in _cache if sdk is None or k[0] == str(sdk)]:
+            del _cache[key]